@@ -0,0 +1,71 @@
+"""Admin HTTP endpoints served next to the health check.
+
+Routes are only registered when ``ADMIN_API_TOKEN`` is set, and every
+request must send it as ``Authorization: Bearer <token>``.
+
+    GET /admin/export?format=csv|parquet[&user_id=<id>]
+
+streams a ZIP export of one user, or of every user when ``user_id`` is
+omitted. The archive is written to the response as it is produced, so
+the export never has to fit in memory or on disk.
+"""
+import hmac
+import logging
+from datetime import date
+
+from aiohttp import web
+
+from app.config.settings import settings
+from app.core.exceptions import ValidationException
+from app.services.export_service import export_service, FORMATS
+
+logger = logging.getLogger(__name__)
+
+
+def _authorized(request: web.Request) -> bool:
+    expected = f"Bearer {settings.ADMIN_API_TOKEN}"
+    return hmac.compare_digest(request.headers.get("Authorization", ""), expected)
+
+
+async def export_handler(request: web.Request) -> web.StreamResponse:
+    if not _authorized(request):
+        raise web.HTTPUnauthorized()
+
+    fmt = request.query.get("format", "csv")
+    if fmt not in FORMATS:
+        raise web.HTTPBadRequest(text=f"format must be one of {', '.join(FORMATS)}")
+    try:
+        user_id = int(request.query["user_id"]) if "user_id" in request.query else None
+    except ValueError:
+        raise web.HTTPBadRequest(text="user_id must be an integer")
+
+    scope = user_id or "all"
+    response = web.StreamResponse(headers={
+        "Content-Type": "application/zip",
+        "Content-Disposition": f'attachment; filename="export_{scope}_{date.today().isoformat()}_{fmt}.zip"',
+    })
+    started = False
+
+    async def consume(data: bytes) -> None:
+        nonlocal started
+        if not started:
+            await response.prepare(request)
+            started = True
+        if data:
+            await response.write(data)
+
+    try:
+        await export_service.export(consume, user_id=user_id, fmt=fmt)
+    except ValidationException as e:
+        if started:
+            raise
+        raise web.HTTPBadRequest(text=str(e))
+    await response.write_eof()
+    return response
+
+
+def setup_admin_routes(app: web.Application) -> None:
+    if not settings.ADMIN_API_TOKEN:
+        return
+    app.router.add_get("/admin/export", export_handler)
+    logger.info("Admin API enabled")
@@ -0,0 +1,251 @@
+"""REST API for lists and receipts, served next to the health check.
+
+Routes are only registered with ``API_ENABLED``. Every request sends
+the user's token from /apitoken as ``Authorization: Bearer <token>``.
+
+    GET  /api/lists                    lists the user is a member of
+    GET  /api/lists/{id}               one list with its items
+    POST /api/lists/{id}/items         bulk item changes
+    GET  /api/receipts?limit=&before=  receipts, newest first
+    GET  /api/receipts/{id}            one receipt with its lines
+
+A list response carries ``ETag: "<list id>.<version>"``. A poll with
+that value in ``If-None-Match`` is answered 304 from the token cache and
+the list-version cache (``list_service.cached_version``), without a
+database query. Only requests that reach the database spend a token of
+the ``api`` rate-limit class.
+
+The item changes body is ``{"add": [names], "remove": [ids],
+"check": [ids], "uncheck": [ids]}``. The changes are applied in one
+transaction with a single version bump. With ``If-Match`` they are
+refused with 412 if the list changed since that ETag. The response is
+the updated list.
+"""
+import logging
+import math
+from typing import Optional
+
+from aiohttp import web
+
+from app.config.settings import settings
+from app.core.database import AsyncSessionLocal
+from app.core.exceptions import ListVersionConflict
+from app.core.rate_limit import rate_limiter
+from app.services.api_token_service import ApiPrincipal, api_token_service
+from app.services.list_service import list_service
+from app.services.list_sync_service import list_sync_service
+from app.services.read_models import ItemView, ListView, read_models
+from app.services.write_buffer import write_buffer
+
+logger = logging.getLogger(__name__)
+
+MAX_RECEIPTS_PAGE = 100
+MAX_ITEM_NAME = 255
+
+
+def _etag(list_id: int, version: int) -> str:
+    return f'"{list_id}.{version}"'
+
+
+def _matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in tags or "*" in tags
+
+
+def _int_param(value: str, name: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"{name} must be an integer")
+
+
+async def _principal(request: web.Request, list_id: Optional[int] = None) -> ApiPrincipal:
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    principal = await api_token_service.resolve(token, list_id) if scheme == "Bearer" and token else None
+    if principal is None:
+        raise web.HTTPUnauthorized(headers={"WWW-Authenticate": "Bearer"})
+    if list_id is not None and list_id not in principal.list_ids:
+        raise web.HTTPNotFound()
+    return principal
+
+
+async def _throttle(user_id: int) -> None:
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    wait = rate_limiter.blocked_for(user_id, "api") or await rate_limiter.acquire(user_id, "api")
+    if wait:
+        raise web.HTTPTooManyRequests(headers={"Retry-After": str(math.ceil(wait))})
+
+
+async def _read_list(list_id: int) -> tuple[ListView, list[ItemView]]:
+    async with AsyncSessionLocal() as session:
+        # Version before items: a change in between makes the ETag older, never newer, than the items
+        shopping_list = await read_models.shopping_list(session, list_id)
+        if shopping_list is None:
+            raise web.HTTPNotFound()
+        items = await read_models.items(session, list_id)
+    await list_service.remember_version(list_id, shopping_list.version)
+    return shopping_list, items
+
+
+def _list_response(
+    shopping_list: ListView, items: list[ItemView], if_none_match: Optional[str] = None
+) -> web.Response:
+    etag = _etag(shopping_list.id, shopping_list.version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _matches(if_none_match, etag):
+        return web.Response(status=304, headers=headers)
+    return web.json_response({
+        "id": shopping_list.id,
+        "name": shopping_list.name,
+        "is_shared": shopping_list.is_shared,
+        "version": shopping_list.version,
+        "items": [{"id": item.id, "name": item.name, "bought": item.is_bought} for item in items],
+    }, headers=headers)
+
+
+async def get_lists(request: web.Request) -> web.Response:
+    principal = await _principal(request)
+    await _throttle(principal.user_id)
+    async with AsyncSessionLocal() as session:
+        active = await list_service.active_list_view(session, principal.user_id)
+        lists = await read_models.lists(session, principal.user_id)
+    return web.json_response({
+        "active_list_id": active.id if active else None,
+        "lists": [shopping_list._asdict() for shopping_list in lists],
+    })
+
+
+async def get_list(request: web.Request) -> web.Response:
+    list_id = _int_param(request.match_info["list_id"], "list id")
+    principal = await _principal(request, list_id)
+
+    # Buffered /add items must not hide behind a 304
+    await write_buffer.barrier(list_id)
+    version = await list_service.cached_version(list_id)
+    if version is not None:
+        etag = _etag(list_id, version)
+        if _matches(request.headers.get("If-None-Match"), etag):
+            return web.Response(status=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+    await _throttle(principal.user_id)
+    shopping_list, items = await _read_list(list_id)
+    return _list_response(shopping_list, items, request.headers.get("If-None-Match"))
+
+
+def _ids(body: dict, key: str) -> list[int]:
+    ids = body.get(key, [])
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise web.HTTPBadRequest(text=f"{key} must be a list of item ids")
+    return ids
+
+
+def _names(body: dict) -> list[str]:
+    names = body.get("add", [])
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        raise web.HTTPBadRequest(text="add must be a list of item names")
+    names = [name.strip() for name in names]
+    if not all(0 < len(name) <= MAX_ITEM_NAME for name in names):
+        raise web.HTTPBadRequest(text=f"item names must be 1 to {MAX_ITEM_NAME} characters")
+    return names
+
+
+def _expected_version(request: web.Request, list_id: int) -> Optional[int]:
+    header = request.headers.get("If-Match")
+    if not header or header.strip() == "*":
+        return None
+    tag = header.strip().removeprefix("W/").strip('"')
+    prefix, _, version = tag.partition(".")
+    if prefix != str(list_id) or not version.isdigit():
+        raise web.HTTPPreconditionFailed(text="If-Match is not an ETag of this list")
+    return int(version)
+
+
+async def update_items(request: web.Request) -> web.Response:
+    list_id = _int_param(request.match_info["list_id"], "list id")
+    principal = await _principal(request, list_id)
+    await _throttle(principal.user_id)
+
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text="body must be JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="body must be a JSON object")
+    add, remove, check, uncheck = _names(body), _ids(body, "remove"), _ids(body, "check"), _ids(body, "uncheck")
+    changes = len(add) + len(remove) + len(check) + len(uncheck)
+    if not 0 < changes <= settings.API_MAX_BULK_ITEMS:
+        raise web.HTTPBadRequest(text=f"send 1 to {settings.API_MAX_BULK_ITEMS} changes per request")
+    expected = _expected_version(request, list_id)
+
+    async with AsyncSessionLocal() as session:
+        try:
+            await list_service.bulk_update(
+                session, list_id, principal.user_id,
+                add=add, remove=remove, check=check, uncheck=uncheck, expected=expected,
+            )
+            await session.commit()
+        except ListVersionConflict:
+            await session.rollback()
+            raise web.HTTPPreconditionFailed(text="the list changed; fetch it and retry")
+    logger.info(
+        "API user %s changed list %s: +%s -%s checked %s unchecked %s",
+        principal.user_id, list_id, len(add), len(remove), len(check), len(uncheck),
+    )
+
+    shopping_list, items = await _read_list(list_id)
+    if shopping_list.is_shared:
+        await list_sync_service.notify(list_id)
+    return _list_response(shopping_list, items)
+
+
+def _receipt_json(receipt) -> dict:
+    data = receipt._asdict()
+    data["created_at"] = receipt.created_at.isoformat() if receipt.created_at else None
+    return data
+
+
+async def get_receipts(request: web.Request) -> web.Response:
+    principal = await _principal(request)
+    limit = _int_param(request.query.get("limit", "20"), "limit")
+    before = _int_param(request.query["before"], "before") if "before" in request.query else None
+    if not 0 < limit <= MAX_RECEIPTS_PAGE:
+        raise web.HTTPBadRequest(text=f"limit must be 1 to {MAX_RECEIPTS_PAGE}")
+    await _throttle(principal.user_id)
+
+    async with AsyncSessionLocal() as session:
+        receipts = await read_models.receipts(session, principal.user_id, limit, before)
+    return web.json_response({
+        "receipts": [_receipt_json(receipt) for receipt in receipts],
+        # Pass as ?before= for the next page
+        "next": receipts[-1].id if len(receipts) == limit else None,
+    })
+
+
+async def get_receipt(request: web.Request) -> web.Response:
+    receipt_id = _int_param(request.match_info["receipt_id"], "receipt id")
+    principal = await _principal(request)
+    await _throttle(principal.user_id)
+
+    async with AsyncSessionLocal() as session:
+        found = await read_models.receipt(session, principal.user_id, receipt_id)
+    if found is None:
+        raise web.HTTPNotFound()
+    receipt, lines = found
+    data = _receipt_json(receipt)
+    data["items"] = [line._asdict() for line in lines]
+    # Receipts do not change once saved
+    return web.json_response(data, headers={"Cache-Control": "private, max-age=86400"})
+
+
+def setup_rest_routes(app: web.Application) -> None:
+    if not settings.API_ENABLED:
+        return
+    app.router.add_get("/api/lists", get_lists)
+    app.router.add_get("/api/lists/{list_id}", get_list)
+    app.router.add_post("/api/lists/{list_id}/items", update_items)
+    app.router.add_get("/api/receipts", get_receipts)
+    app.router.add_get("/api/receipts/{receipt_id}", get_receipt)
+    logger.info("REST API enabled")
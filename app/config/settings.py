@@ -1,13 +1,126 @@
+from datetime import time
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     TELEGRAM_TOKEN: str
     OPENAI_API_KEY: str | None = None
+    GOOGLE_VISION_API_KEY: str | None = None
     DATABASE_URL: str
     DATABASE_POOL_SIZE: int = 20
-        DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_MAX_OVERFLOW: int = 10
+    # Upper bound on waiting for a pooled connection, in seconds
+    DATABASE_POOL_TIMEOUT: float = 10
+    # "session" for a direct connection or session-mode pooler,
+    # "transaction" when running behind PgBouncer in transaction mode
+    DATABASE_POOLER_MODE: str = "session"
+    DATABASE_STATEMENT_CACHE_SIZE: int = 100
+    DATABASE_QUERY_CACHE_SIZE: int = 500
+    REDIS_URL: str | None = None
+    # Outbound Bot API connections; getUpdates has its own single connection
+    TELEGRAM_POOL_SIZE: int = 64
+    TELEGRAM_POOL_TIMEOUT: float = 3.0
+    TELEGRAM_CONNECT_TIMEOUT: float = 5.0
+    TELEGRAM_READ_TIMEOUT: float = 10.0
+    TELEGRAM_WRITE_TIMEOUT: float = 10.0
+    # Uploads and file downloads
+    TELEGRAM_MEDIA_TIMEOUT: float = 60.0
+    TELEGRAM_KEEPALIVE_EXPIRY: float = 30.0
+    TELEGRAM_HTTP_VERSION: str = "1.1"
+    TELEGRAM_PIPELINE_REPLIES: bool = True
+    LIST_SYNC_COALESCE_MS: int = 1500
+    # user_data/chat_data/conversations in Redis (needs REDIS_URL)
+    PERSISTENCE_ENABLED: bool = True
+    PERSISTENCE_FLUSH_INTERVAL: float = 5
+    PERSISTENCE_REFRESH_SECONDS: float = 30
+    PERSISTENCE_TTL: int = 90 * 24 * 3600
+    RECOMMENDER_RETRAIN_INTERVAL: int = 900
+    RECOMMENDER_NEIGHBOURS: int = 20
+    RECOMMENDER_AI_RERANK: bool = False
+    # Monthly partitions of receipt_items and price_history (PostgreSQL)
+    PARTITION_PREMAKE_MONTHS: int = 3
+    PARTITION_RETENTION_MONTHS: int = 0  # 0 keeps every month
+    PARTITION_RETENTION_ACTION: str = "detach"  # or "drop"
+    PARTITION_MAINTENANCE_AT: time = time(3, 0)
+    # Cold archive of checked-off list items and old receipts; 0 turns it off
+    ARCHIVE_AFTER_MONTHS: int = 12
+    ARCHIVE_RUN_AT: time = time(4, 0)
+    ARCHIVE_BATCH_SIZE: int = 1000
+    ARCHIVE_BATCH_PAUSE: float = 0.5
+    REPLENISHMENT_RUN_AT: time = time(3, 30)
+    REPLENISHMENT_LOOKBACK_DAYS: int = 365
+    REPLENISHMENT_MIN_PURCHASES: int = 3
+    REPLENISHMENT_HORIZON_DAYS: int = 3
+    WORKER_POOL_SIZE: int = 4
+    OCR_TARGET_LONG_SIDE: int = 1280
+    OCR_MAX_LONG_SIDE: int = 1600
+    OCR_MIN_CONFIDENCE: float = 0.8
+    OCR_CACHE_TTL: int = 30 * 24 * 3600
+    OCR_CACHE_DIR: str = ".cache/ocr"
+    OCR_CACHE_MAX_ENTRIES: int = 5000
+    # Album pages are gathered until none arrives for this long
+    ALBUM_WINDOW_MS: int = 1000
+    EXPORT_CHUNK_ROWS: int = 2000
+    EXPORT_SPOOL_BYTES: int = 8 * 1024 * 1024
+    # Telegram bots cannot upload documents larger than 50 MB
+    EXPORT_MAX_DOCUMENT_BYTES: int = 50 * 1024 * 1024
+    ADMIN_API_TOKEN: str | None = None
+    # REST API for lists and receipts; users get a token with /apitoken
+    API_ENABLED: bool = False
+    # Seconds a token and its list memberships are cached per process
+    API_TOKEN_CACHE_TTL: int = 60
+    # Seconds list versions stay cached for ETag checks
+    API_VERSION_CACHE_TTL: int = 300
+    API_MAX_BULK_ITEMS: int = 200
+    ADMISSION_PROBE_INTERVAL: float = 0.25
+    OVERLOAD_POOL_WAIT_MS: int = 100
+    OVERLOAD_LOOP_LAG_MS: int = 100
+    LIST_RENDER_CACHE_TTL: int = 600
+    # Batch /add inserts across users; see app/services/write_buffer.py for durability
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_WINDOW_MS: int = 20
+    WRITE_BEHIND_MAX_BATCH: int = 500
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_AI_PER_MINUTE: float = 2
+    RATE_LIMIT_AI_BURST: int = 3
+    RATE_LIMIT_HEAVY_PER_MINUTE: float = 6
+    RATE_LIMIT_HEAVY_BURST: int = 3
+    RATE_LIMIT_DEFAULT_PER_MINUTE: float = 30
+    RATE_LIMIT_DEFAULT_BURST: int = 10
+    RATE_LIMIT_TAP_PER_MINUTE: float = 120
+    RATE_LIMIT_TAP_BURST: int = 20
+    # REST requests that reach the database; 304 answers are free
+    RATE_LIMIT_API_PER_MINUTE: float = 60
+    RATE_LIMIT_API_BURST: int = 20
+    RATE_LIMIT_GLOBAL_AI_PER_SECOND: float = 5
+    RATE_LIMIT_GLOBAL_HEAVY_PER_SECOND: float = 5
+    RATE_LIMIT_GLOBAL_DEFAULT_PER_SECOND: float = 200
+    DEFAULT_CURRENCY: str = "BRL"
+    DEFAULT_TIMEZONE: str = "America/Sao_Paulo"
+    REMINDER_BATCH: int = 500
+    # Sends in a minute's bucket are spread over this many seconds
+    REMINDER_JITTER_SECONDS: int = 50
+    # Claimed reminders are held this long past the jitter; renewed while a batch is still sending
+    REMINDER_LEASE_SECONDS: int = 60
+    # JSON {"base", "date", "rates"}; the bundled app/config/fx_rates.json when unset
+    FX_RATES_FILE: str | None = None
+    FX_RATES_URL: str | None = None
+    FX_REFRESH_INTERVAL: int = 6 * 3600
+    # Percent of a budget at which a receipt triggers an alert
+    BUDGET_ALERT_PERCENTS: list[int] = [80, 100]
+    # Unusual-spend alerts after each receipt; see app/services/anomaly_service.py
+    ANOMALY_ALERTS_ENABLED: bool = True
+    ANOMALY_MIN_SAMPLES: int = 5
+    ANOMALY_PRICE_RISE: float = 0.4  # item price this far above its usual price
+    ANOMALY_Z_SCORE: float = 3.0  # category total this many deviations above its mean
+    ANOMALY_MEDIAN_RATE: float = 0.1
+    # Seconds before /compare reloads new store prices
+    PRICE_MATRIX_MAX_AGE: int = 60
     LOG_LEVEL: str = "INFO"
-        HOST: str = "0.0.0.0"
+    LOG_FORMAT: str = "text"  # or "json"
+    # Fraction of INFO/DEBUG records kept per logger, e.g. {"app.handlers.trip_handler": 0.1}
+    LOG_SAMPLE_RATES: dict[str, float] = {}
+    LOG_QUEUE_SIZE: int = 10000
+    HOST: str = "0.0.0.0"
     PORT: int = 8080
 
     class Config:
@@ -0,0 +1,128 @@
+"""Admission control for overload.
+
+A probe task measures event-loop lag (how late a short sleep wakes up)
+and the mean wait for a pooled DB connection, including checkouts still
+waiting. Both are smoothed and compared with their overload thresholds.
+Pressure selects a degradation level, applied in priority order:
+
+1. ``LIST_FROM_CACHE`` - /list answers from the last rendered copy.
+2. ``DEFER_RECEIPTS`` - receipts are acknowledged to the user and written
+   once pressure drops.
+3. ``SHED_SUGGESTIONS`` - /suggestions is declined with a retry message.
+
+Levels rise immediately and fall one step per probe, so the bot does not
+flap between modes. Everything else keeps running, only slower.
+
+Deferred receipts are held in this process's memory. A graceful
+shutdown writes them (``stop``); a crash or SIGKILL loses them, and the
+user has to send those photos again. The receipt handler skips a photo
+that was already saved, so resending is safe.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from app.config.settings import settings
+from app.core.database import engine
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest probe in the smoothed measurements
+SMOOTHING = 0.3
+
+
+class AdmissionController:
+    NORMAL = 0
+    LIST_FROM_CACHE = 1
+    DEFER_RECEIPTS = 2
+    SHED_SUGGESTIONS = 3
+
+    def __init__(self):
+        self.level = self.NORMAL
+        self.loop_lag = 0.0
+        self.pool_wait = 0.0
+        self._deferred: deque[tuple[str, Callable[[], Awaitable[None]]]] = deque()
+        self._monitor: Optional[asyncio.Task] = None
+        self._drainer: Optional[asyncio.Task] = None
+
+        metrics.gauge("admission_level", lambda: self.level)
+        metrics.gauge("event_loop_lag_seconds", lambda: self.loop_lag)
+        metrics.gauge("db_pool_wait_seconds", lambda: self.pool_wait)
+        metrics.gauge("db_pool_checked_out", lambda: engine.sync_engine.pool.checkedout())
+        metrics.gauge("db_pool_waiting", lambda: engine.sync_engine.pool.waiting)
+        metrics.gauge("db_pool_timeouts_total", lambda: engine.sync_engine.pool.timeouts)
+        metrics.gauge("deferred_writes_pending", lambda: len(self._deferred))
+
+    def allows(self, level: int) -> bool:
+        """Whether work that degrades at ``level`` can run normally."""
+        return self.level < level
+
+    async def start(self) -> None:
+        self._monitor = asyncio.create_task(self._probe())
+
+    async def stop(self) -> None:
+        if self._monitor is not None:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+        if self._drainer is not None:
+            await asyncio.gather(self._drainer, return_exceptions=True)
+        await self._drain()
+
+    def defer(self, kind: str, write: Callable[[], Awaitable[None]]) -> None:
+        """Queue a write until pressure drops below ``DEFER_RECEIPTS``."""
+        self._deferred.append((kind, write))
+        metrics.inc("deferred_writes_total", kind=kind)
+
+    async def _probe(self) -> None:
+        loop = asyncio.get_running_loop()
+        interval = settings.ADMISSION_PROBE_INTERVAL
+        while True:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            lag = max(0.0, loop.time() - started - interval)
+            self.loop_lag += SMOOTHING * (lag - self.loop_lag)
+            self.pool_wait += SMOOTHING * (engine.sync_engine.pool.take_wait() - self.pool_wait)
+
+            level = self._level_for(max(
+                self.pool_wait * 1000 / settings.OVERLOAD_POOL_WAIT_MS,
+                self.loop_lag * 1000 / settings.OVERLOAD_LOOP_LAG_MS,
+            ))
+            if level != self.level:
+                level = level if level > self.level else self.level - 1
+                logger.warning(
+                    "Admission level %s -> %s (pool wait %.0fms, loop lag %.0fms)",
+                    self.level,
+                    level,
+                    self.pool_wait * 1000,
+                    self.loop_lag * 1000
+                )
+                self.level = level
+
+            if self._deferred and self.allows(self.DEFER_RECEIPTS) and (
+                self._drainer is None or self._drainer.done()
+            ):
+                self._drainer = asyncio.create_task(self._drain())
+
+    def _level_for(self, pressure: float) -> int:
+        if pressure >= 4:
+            return self.SHED_SUGGESTIONS
+        if pressure >= 2:
+            return self.DEFER_RECEIPTS
+        if pressure >= 1:
+            return self.LIST_FROM_CACHE
+        return self.NORMAL
+
+    async def _drain(self) -> None:
+        # Stops early if pressure rises again; stop() drains unconditionally
+        while self._deferred and (
+            self.allows(self.DEFER_RECEIPTS) or self._monitor is None or self._monitor.done()
+        ):
+            kind, write = self._deferred.popleft()
+            try:
+                await write()
+            except Exception as e:
+                logger.error("Deferred %s write failed: %s", kind, e)
+
+admission = AdmissionController()
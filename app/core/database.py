@@ -1,21 +1,87 @@
+import itertools
+import time
+from uuid import uuid4
+from sqlalchemy import exc
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.config.settings import settings
 
+
+def _connect_args() -> dict:
+    """asyncpg connect arguments for the configured pooler mode.
+
+    A transaction-mode pooler hands each transaction a different server
+    connection, so asyncpg's own statement cache (which assumes one server
+    session) is turned off. SQLAlchemy's adapter-level cache keeps preparing
+    named statements, and giving every statement a unique name keeps them
+    from colliding on shared server connections (PgBouncer >= 1.21 with
+    ``max_prepared_statements`` tracks them per client).
+    """
+    args = {"prepared_statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE}
+    if settings.DATABASE_POOLER_MODE == "transaction":
+        args["statement_cache_size"] = 0
+        args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid4()}__"
+    return args
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that measures how long checkouts wait for a connection.
+
+    Read by the admission controller; see ``app.core.admission``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tokens = itertools.count()
+        self._waiting: dict[int, float] = {}
+        self._waited = 0.0
+        self._checkouts = 0
+        self.timeouts = 0
+
+    def _do_get(self):
+        token = next(self._tokens)
+        self._waiting[token] = time.monotonic()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self._waited += time.monotonic() - self._waiting.pop(token)
+            self._checkouts += 1
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def take_wait(self) -> float:
+        """Mean checkout wait since the last call, counting checkouts still waiting."""
+        now = time.monotonic()
+        total = self._waited + sum(now - started for started in self._waiting.values())
+        count = self._checkouts + len(self._waiting)
+        self._waited, self._checkouts = 0.0, 0
+        return total / count if count else 0.0
+
+
 # Create Async Engine
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=(settings.LOG_LEVEL == "DEBUG"),
-            pool_size=settings.DATABASE_POOL_SIZE,
-        max_overflow=settings.DATABASE_MAX_OVERFLOW,
-        pool_pre_ping=True
+    pool_size=settings.DATABASE_POOL_SIZE,
+    max_overflow=settings.DATABASE_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    poolclass=MeteredQueuePool,
+    pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+    query_cache_size=settings.DATABASE_QUERY_CACHE_SIZE,
+    connect_args=_connect_args(),
 )
 
 # Async Session Factory
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
-        autoflush=False,
+    autoflush=False,
     expire_on_commit=False
 )
 
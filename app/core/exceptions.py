@@ -16,6 +16,10 @@ class ShoppingListException(SmartShopException):
     """Raised when shopping list operation fails."""
     pass
 
+class ListVersionConflict(ShoppingListException):
+    """Raised when a list changed since the version an edit was based on."""
+    pass
+
 class OCRException(SmartShopException):
     """Raised when OCR processing fails."""
     pass
@@ -0,0 +1,37 @@
+"""Process-local counters and gauges, served at ``/metrics``.
+
+The output uses the Prometheus text format so the health server can be
+scraped directly. Counters are incremented in place; gauges are read
+from callbacks at scrape time.
+"""
+from collections import defaultdict
+from typing import Callable
+
+
+class Metrics:
+    def __init__(self):
+        self._counters: dict[tuple[str, tuple], float] = defaultdict(float)
+        self._gauges: dict[str, Callable[[], float]] = {}
+
+    def inc(self, name: str, amount: float = 1.0, **labels) -> None:
+        self._counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def gauge(self, name: str, fn: Callable[[], float]) -> None:
+        self._gauges[name] = fn
+
+    def value(self, name: str, **labels) -> float:
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0.0)
+
+    def render(self) -> str:
+        lines = []
+        for (name, labels), value in sorted(self._counters.items()):
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"{name}{{{label_text}}} {value:g}" if labels else f"{name} {value:g}")
+        for name, fn in sorted(self._gauges.items()):
+            try:
+                lines.append(f"{name} {fn():g}")
+            except Exception:
+                continue
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
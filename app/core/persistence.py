@@ -0,0 +1,191 @@
+"""python-telegram-bot persistence on Redis.
+
+Each user, chat and conversation gets its own key, so a change rewrites
+only that entry and never the whole mapping. Startup loads nothing but
+conversation states and ``bot_data``: a user's or chat's data is read
+the first time an update for it arrives (``refresh_*_data``). It is read
+again when the copy is older than ``PERSISTENCE_REFRESH_SECONDS`` and
+has no local changes, so replicas sharing the Redis pick up each other's
+writes.
+
+The application hands over changed entries every
+``PERSISTENCE_FLUSH_INTERVAL`` seconds. Entries whose serialized form did
+not change are skipped; the rest go out in one pipelined round trip.
+Values are pickled, and zlib-compressed above ``COMPRESS_ABOVE`` bytes.
+"""
+import asyncio
+import json
+import logging
+import pickle
+import zlib
+from typing import Any, Optional
+
+from redis.asyncio import Redis
+from telegram.ext import BasePersistence, PersistenceInput
+
+from app.config.settings import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+COMPRESS_ABOVE = 512
+PREFIX = "ptb"
+
+
+def dumps(value: Any) -> bytes:
+    raw = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(raw) > COMPRESS_ABOVE:
+        return b"z" + zlib.compress(raw, 6)
+    return b"p" + raw
+
+
+def loads(blob: bytes) -> Any:
+    body = blob[1:]
+    return pickle.loads(zlib.decompress(body) if blob[:1] == b"z" else body)
+
+
+class RedisPersistence(BasePersistence):
+    def __init__(self, client: Redis, update_interval: float = 60):
+        super().__init__(
+            store_data=PersistenceInput(callback_data=False),
+            update_interval=update_interval,
+        )
+        self.client = client
+        self.ttl = settings.PERSISTENCE_TTL
+        # key -> (blob, loop time) as last read from or written to Redis
+        self._synced: dict[str, tuple[bytes, float]] = {}
+        self._pending: dict[str, Optional[bytes]] = {}
+        self._conversations: dict[str, dict[tuple, Any]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+
+    # -- loading ---------------------------------------------------------
+
+    async def get_user_data(self) -> dict[int, dict]:
+        return {}
+
+    async def get_chat_data(self) -> dict[int, dict]:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        blob = await self.client.get(f"{PREFIX}:bot")
+        if blob is None:
+            return {}
+        self._mark_synced(f"{PREFIX}:bot", blob)
+        return loads(blob)
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        raw = await self.client.hgetall(f"{PREFIX}:conv:{name}")
+        states = {tuple(json.loads(key)): loads(state) for key, state in raw.items()}
+        self._conversations[name] = dict(states)
+        return states
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        await self._refresh(f"{PREFIX}:user:{user_id}", user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        await self._refresh(f"{PREFIX}:chat:{chat_id}", chat_data)
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass  # loaded once at startup; the bot does not keep shared bot_data
+
+    async def _refresh(self, key: str, data: dict) -> None:
+        synced = self._synced.get(key)
+        now = asyncio.get_running_loop().time()
+        if synced is not None:
+            blob, at = synced
+            if now - at < settings.PERSISTENCE_REFRESH_SECONDS or key in self._pending:
+                return
+            if dumps(data) != blob:
+                return  # changed here since the last sync; this copy wins
+        blob = await self.client.get(key)
+        metrics.inc("persistence_loads_total")
+        if blob is None:
+            self._synced[key] = (dumps(data), now)
+            return
+        self._mark_synced(key, blob)
+        data.clear()
+        data.update(loads(blob))
+
+    def _mark_synced(self, key: str, blob: bytes) -> None:
+        self._synced[key] = (blob, asyncio.get_running_loop().time())
+
+    # -- writing ---------------------------------------------------------
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._stage(f"{PREFIX}:user:{user_id}", dumps(data))
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        self._stage(f"{PREFIX}:chat:{chat_id}", dumps(data))
+
+    async def update_bot_data(self, data: dict) -> None:
+        self._stage(f"{PREFIX}:bot", dumps(data))
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        states = self._conversations.setdefault(name, {})
+        if states.get(key) == new_state:
+            return
+        field = json.dumps(list(key))
+        conv_key = f"{PREFIX}:conv:{name}"
+        if new_state is None:
+            states.pop(key, None)
+            await self.client.hdel(conv_key, field)
+        else:
+            states[key] = new_state
+            await self.client.hset(conv_key, field, dumps(new_state))
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._stage(f"{PREFIX}:user:{user_id}", None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._stage(f"{PREFIX}:chat:{chat_id}", None)
+
+    def _stage(self, key: str, blob: Optional[bytes]) -> None:
+        synced = self._synced.get(key)
+        if blob is not None and synced is not None and synced[0] == blob:
+            metrics.inc("persistence_unchanged_total")
+            return
+        self._pending[key] = blob
+        # The application stages every changed entry in one pass; write them together
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_soon())
+
+    async def _flush_soon(self) -> None:
+        await asyncio.sleep(0)
+        await self._write()
+
+    async def _write(self) -> None:
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, blob in pending.items():
+                    if blob is None:
+                        pipe.delete(key)
+                    else:
+                        pipe.set(key, blob, ex=self.ttl if key != f"{PREFIX}:bot" else None)
+                await pipe.execute()
+        except Exception as e:
+            logger.error("Persistence flush of %s keys failed: %s", len(pending), e)
+            # Keep the entries for the next flush unless newer ones were staged meanwhile
+            self._pending = {**pending, **self._pending}
+            return
+        for key, blob in pending.items():
+            if blob is None:
+                self._synced.pop(key, None)
+            else:
+                self._mark_synced(key, blob)
+        metrics.inc("persistence_flushes_total")
+        metrics.inc("persistence_writes_total", len(pending))
+
+    async def flush(self) -> None:
+        """Called on shutdown, after the application staged its final changes."""
+        if self._flusher is not None:
+            await asyncio.wait([self._flusher])
+        await self._write()
@@ -0,0 +1,77 @@
+"""Prebuilt statements for the hot handler paths.
+
+Each statement is constructed once at import time with ``bindparam``
+placeholders, so a handler call only supplies parameters. SQLAlchemy
+memoizes the cache key on the statement object and finds the compiled
+form in the engine's compiled cache, and the asyncpg adapter reuses the
+named prepared statement on the connection (see ``_connect_args`` in
+``app.core.database`` for the pooler-compatible naming).
+"""
+from sqlalchemy import bindparam, select, update
+
+from app.models.replenishment import ReplenishmentPrediction
+from app.models.shopping import ShoppingItem
+from app.models.shopping_list import ShoppingList
+from app.models.user import User
+
+
+class QueryRegistry:
+    """Statements shared by the shopping, settings and suggestion handlers."""
+
+    def __init__(self):
+        self.user_by_id = select(User).where(User.id == bindparam("user_id"))
+        self.items_by_user = (
+            select(ShoppingItem)
+            .where(ShoppingItem.user_id == bindparam("user_id"))
+            .order_by(ShoppingItem.id)
+        )
+        self.items_by_list = (
+            select(ShoppingItem)
+            .where(ShoppingItem.list_id == bindparam("list_id"), ShoppingItem.archived_at.is_(None))
+            .order_by(ShoppingItem.id)
+        )
+        # Only touches items on the tapping user's active list
+        self.toggle_bought = (
+            update(ShoppingItem)
+            .where(
+                ShoppingItem.id == bindparam("item_id"),
+                ShoppingItem.list_id == (
+                    select(User.active_list_id).where(User.id == bindparam("by_user")).scalar_subquery()
+                ),
+            )
+            .values(is_bought=~ShoppingItem.is_bought)
+            .returning(
+                ShoppingItem.list_id,
+                select(ShoppingList.is_shared)
+                .where(ShoppingList.id == ShoppingItem.list_id)
+                .scalar_subquery()
+                .label("is_shared"),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self.archive_bought = (
+            update(ShoppingItem)
+            .where(
+                ShoppingItem.list_id == bindparam("on_list"),
+                ShoppingItem.is_bought.is_(True),
+                ShoppingItem.archived_at.is_(None),
+            )
+            .values(archived_at=bindparam("now"))
+            .execution_options(synchronize_session=False)
+        )
+        self.active_list = (
+            select(ShoppingList)
+            .join(User, User.active_list_id == ShoppingList.id)
+            .where(User.id == bindparam("user_id"))
+        )
+        self.due_replenishments = (
+            select(ReplenishmentPrediction.product, ReplenishmentPrediction.next_expected_on)
+            .where(
+                ReplenishmentPrediction.user_id == bindparam("user_id"),
+                ReplenishmentPrediction.next_expected_on <= bindparam("horizon"),
+            )
+            .order_by(ReplenishmentPrediction.next_expected_on)
+            .limit(5)
+        )
+
+queries = QueryRegistry()
@@ -0,0 +1,154 @@
+"""Token-bucket flood control shared by all bot replicas.
+
+Each request spends one token from two buckets of its command class: the
+user's own bucket and a global bucket protecting the shared resource
+behind the class (OpenAI, OCR, the database pool). Both are refilled and
+debited atomically by one Lua script, using Redis server time so replica
+clocks do not matter. Without Redis the same buckets live in process.
+
+Denials are cheap. A denied (user, class) pair is remembered locally
+until its wait time passes, so repeated messages during that window are
+rejected with a dictionary lookup, without a Redis round trip or a reply.
+"""
+import logging
+import time
+from typing import NamedTuple
+
+from app.config.settings import settings
+from app.core.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# KEYS: user bucket, global bucket
+# ARGV: user rate/s, user burst, global rate/s, global burst
+# Returns 0 when both tokens were spent, else the wait in milliseconds.
+TOKEN_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local wait = 0
+local state = {}
+for i = 1, 2 do
+    local rate = tonumber(ARGV[i * 2 - 1]) / 1000
+    local burst = tonumber(ARGV[i * 2])
+    local bucket = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or burst
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + (now - ts) * rate)
+    if tokens < 1 then
+        wait = math.max(wait, math.ceil((1 - tokens) / rate))
+    end
+    state[i] = {tokens, rate, burst}
+end
+if wait > 0 then
+    return wait
+end
+for i = 1, 2 do
+    local tokens, rate, burst = state[i][1] - 1, state[i][2], state[i][3]
+    redis.call('HSET', KEYS[i], 'tokens', tokens, 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil((burst - tokens) / rate) + 1000)
+end
+return 0
+"""
+
+
+class Limit(NamedTuple):
+    rate: float  # tokens per second
+    burst: int
+
+
+def _limits() -> dict[str, tuple[Limit, Limit]]:
+    """(per user, global) limits for each command class."""
+    return {
+        "ai": (
+            Limit(settings.RATE_LIMIT_AI_PER_MINUTE / 60, settings.RATE_LIMIT_AI_BURST),
+            Limit(settings.RATE_LIMIT_GLOBAL_AI_PER_SECOND, max(1, int(settings.RATE_LIMIT_GLOBAL_AI_PER_SECOND))),
+        ),
+        "heavy": (
+            Limit(settings.RATE_LIMIT_HEAVY_PER_MINUTE / 60, settings.RATE_LIMIT_HEAVY_BURST),
+            Limit(settings.RATE_LIMIT_GLOBAL_HEAVY_PER_SECOND, max(1, int(settings.RATE_LIMIT_GLOBAL_HEAVY_PER_SECOND))),
+        ),
+        "tap": (
+            Limit(settings.RATE_LIMIT_TAP_PER_MINUTE / 60, settings.RATE_LIMIT_TAP_BURST),
+            Limit(settings.RATE_LIMIT_GLOBAL_DEFAULT_PER_SECOND, max(1, int(settings.RATE_LIMIT_GLOBAL_DEFAULT_PER_SECOND))),
+        ),
+        "api": (
+            Limit(settings.RATE_LIMIT_API_PER_MINUTE / 60, settings.RATE_LIMIT_API_BURST),
+            Limit(settings.RATE_LIMIT_GLOBAL_DEFAULT_PER_SECOND, max(1, int(settings.RATE_LIMIT_GLOBAL_DEFAULT_PER_SECOND))),
+        ),
+        "default": (
+            Limit(settings.RATE_LIMIT_DEFAULT_PER_MINUTE / 60, settings.RATE_LIMIT_DEFAULT_BURST),
+            Limit(settings.RATE_LIMIT_GLOBAL_DEFAULT_PER_SECOND, max(1, int(settings.RATE_LIMIT_GLOBAL_DEFAULT_PER_SECOND))),
+        ),
+    }
+
+
+class _LocalBuckets:
+    """In-process fallback with the same semantics as the Lua script."""
+
+    def __init__(self):
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    def take(self, keys: tuple[str, str], limits: tuple[Limit, Limit]) -> float:
+        now = time.monotonic()
+        state = []
+        wait = 0.0
+        for key, limit in zip(keys, limits):
+            tokens, ts = self._buckets.get(key, (limit.burst, now))
+            tokens = min(limit.burst, tokens + (now - ts) * limit.rate)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / limit.rate)
+            state.append(tokens)
+        if wait:
+            return wait
+        for key, tokens in zip(keys, state):
+            self._buckets[key] = (tokens - 1, now)
+        if len(self._buckets) > 50_000:
+            self._buckets.clear()
+        return 0.0
+
+
+class RateLimiter:
+    def __init__(self):
+        self.limits = _limits()
+        self._local = _LocalBuckets()
+        self._blocked: dict[tuple[int, str], float] = {}
+        self._script = redis_client.register_script(TOKEN_BUCKET_LUA) if redis_client is not None else None
+        self.allowed = 0
+        self.denied = 0
+
+    def blocked_for(self, user_id: int, command_class: str) -> float:
+        """Seconds left on a denial already known locally, or 0."""
+        until = self._blocked.get((user_id, command_class))
+        if until is None:
+            return 0.0
+        left = until - time.monotonic()
+        if left <= 0:
+            del self._blocked[(user_id, command_class)]
+            return 0.0
+        return left
+
+    async def acquire(self, user_id: int, command_class: str) -> float:
+        """Spend a token; returns 0 when allowed, else the seconds to wait."""
+        limits = self.limits.get(command_class) or self.limits["default"]
+        keys = (f"rl:{command_class}:{user_id}", f"rl:{command_class}:*")
+        wait = None
+        if self._script is not None:
+            try:
+                args = [limits[0].rate, limits[0].burst, limits[1].rate, limits[1].burst]
+                wait = int(await self._script(keys=keys, args=args)) / 1000
+            except Exception as e:
+                logger.warning("Rate limit check failed, using local buckets: %s", e)
+        if wait is None:
+            wait = self._local.take(keys, limits)
+
+        if not wait:
+            self.allowed += 1
+            return 0.0
+        self.denied += 1
+        if len(self._blocked) > 50_000:
+            now = time.monotonic()
+            self._blocked = {k: v for k, v in self._blocked.items() if v > now}
+        self._blocked[(user_id, command_class)] = time.monotonic() + wait
+        return wait
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,5 @@
+"""Shared Redis connection, or ``None`` when REDIS_URL is not configured."""
+from redis.asyncio import Redis
+from app.config.settings import settings
+
+redis_client: Redis | None = Redis.from_url(settings.REDIS_URL) if settings.REDIS_URL else None
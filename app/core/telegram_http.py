@@ -0,0 +1,143 @@
+"""Outbound Bot API client.
+
+Sends and long polling get separate HTTPX pools, so a slow ``getUpdates``
+never holds a connection a reply needs. Connections are kept alive for
+``TELEGRAM_KEEPALIVE_EXPIRY`` seconds between bursts. Concurrency is
+capped by a semaphore the size of the pool, which makes the time spent
+waiting for a connection measurable; it is exported with the number of
+requests in flight at ``/metrics``.
+
+Read and write timeouts depend on the API method: uploads and file
+downloads get ``TELEGRAM_MEDIA_TIMEOUT`` and everything else the short
+defaults. Explicit timeouts passed to a bot method still win.
+
+``pipeline`` starts a send without waiting for it, so an interim
+"working on it" message goes out while the handler does its work.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Optional
+
+import httpx
+from telegram.error import TimedOut
+from telegram.request import HTTPXRequest, RequestData
+from telegram._utils.defaultvalue import DefaultValue
+
+from app.config.settings import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+MEDIA_METHODS = frozenset({
+    "sendPhoto", "sendDocument", "sendMediaGroup", "sendVideo", "sendAudio",
+    "sendVoice", "sendAnimation", "download",
+})
+
+
+def api_method(url: str) -> str:
+    """``.../bot<token>/sendMessage`` -> "sendMessage"; file URLs -> "download"."""
+    if "/file/bot" in url:
+        return "download"
+    return url.rsplit("/", 1)[-1]
+
+
+class MeteredRequest(HTTPXRequest):
+    def __init__(self, pool: str, connection_pool_size: int, **kwargs):
+        super().__init__(connection_pool_size=connection_pool_size, **kwargs)
+        self.pool = pool
+        self._client_kwargs["limits"] = httpx.Limits(
+            max_connections=connection_pool_size,
+            max_keepalive_connections=connection_pool_size,
+            keepalive_expiry=settings.TELEGRAM_KEEPALIVE_EXPIRY,
+        )
+        self._client = self._build_client()
+        self._slots = asyncio.Semaphore(connection_pool_size)
+        self.in_flight = 0
+        self.waiting = 0
+        metrics.gauge(f"telegram_{pool}_in_flight", lambda: self.in_flight)
+        metrics.gauge(f"telegram_{pool}_waiting", lambda: self.waiting)
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        read_timeout=HTTPXRequest.DEFAULT_NONE,
+        write_timeout=HTTPXRequest.DEFAULT_NONE,
+        connect_timeout=HTTPXRequest.DEFAULT_NONE,
+        pool_timeout=HTTPXRequest.DEFAULT_NONE,
+    ) -> tuple[int, bytes]:
+        name = api_method(url)
+        if name in MEDIA_METHODS:
+            if isinstance(read_timeout, DefaultValue):
+                read_timeout = settings.TELEGRAM_MEDIA_TIMEOUT
+            if isinstance(write_timeout, DefaultValue):
+                write_timeout = settings.TELEGRAM_MEDIA_TIMEOUT
+        if isinstance(pool_timeout, DefaultValue):
+            pool_timeout = self._client.timeout.pool
+
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            async with asyncio.timeout(pool_timeout):
+                await self._slots.acquire()
+        except TimeoutError:
+            metrics.inc("telegram_pool_timeouts_total", pool=self.pool)
+            raise TimedOut(f"Pool timeout: no free {self.pool} connection for {name}") from None
+        finally:
+            self.waiting -= 1
+        sent = time.monotonic()
+        metrics.inc("telegram_pool_wait_seconds_total", sent - started, pool=self.pool)
+
+        self.in_flight += 1
+        try:
+            return await super().do_request(
+                url, method, request_data, read_timeout, write_timeout, connect_timeout, pool_timeout
+            )
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+            metrics.inc("telegram_requests_total", method=name)
+            metrics.inc("telegram_request_seconds_total", time.monotonic() - sent, method=name)
+
+
+def build_requests() -> tuple[MeteredRequest, MeteredRequest]:
+    """(request for sends, request for getUpdates)"""
+    timeouts = dict(
+        connect_timeout=settings.TELEGRAM_CONNECT_TIMEOUT,
+        read_timeout=settings.TELEGRAM_READ_TIMEOUT,
+        write_timeout=settings.TELEGRAM_WRITE_TIMEOUT,
+        pool_timeout=settings.TELEGRAM_POOL_TIMEOUT,
+        http_version=settings.TELEGRAM_HTTP_VERSION,
+    )
+    return (
+        MeteredRequest("send", settings.TELEGRAM_POOL_SIZE, **timeouts),
+        MeteredRequest("updates", 1, **timeouts),
+    )
+
+
+def _log_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Pipelined send failed: %s", task.exception())
+
+
+async def pipeline(send: Awaitable) -> asyncio.Future:
+    """Start ``send`` and return without waiting for it to complete.
+
+    Pass the returned future to ``drain`` before anything that must arrive
+    after it.
+    With ``TELEGRAM_PIPELINE_REPLIES`` off the send is awaited here.
+    """
+    if not settings.TELEGRAM_PIPELINE_REPLIES:
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(await send)
+        return future
+    task = asyncio.ensure_future(send)
+    task.add_done_callback(_log_failure)
+    return task
+
+
+async def drain(*sends: asyncio.Future) -> None:
+    """Wait for pipelined sends; their failures were already logged."""
+    await asyncio.wait(sends)
@@ -0,0 +1,13 @@
+"""Shared thread pool for blocking and CPU-bound work kept off the event loop."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from app.config.settings import settings
+
+worker_pool = ThreadPoolExecutor(max_workers=settings.WORKER_POOL_SIZE, thread_name_prefix="worker")
+
+
+async def run_in_worker(fn, *args, **kwargs):
+    """Run ``fn`` in the worker pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(worker_pool, partial(fn, *args, **kwargs))
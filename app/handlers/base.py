@@ -17,18 +17,27 @@ async def start_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             "/list - View your shopping list\n"
             "/remove <number> - Remove item by number\n"
             "/clear - Clear entire list\n"
+            "/shop - Tick items off while shopping\n"
+            "/share - Share your list with your household\n"
+            "/join <code> - Join a shared list\n"
             "/suggestions - Get AI suggestions\n"
+            "/compare - Cheapest stores for your list\n"
             "/receipt - Process receipt photo\n"
             "/stats - View spending stats\n"
+            "/summary - This month's spending\n"
+            "/budget - Spending budgets\n"
+            "/search <product> - Find past purchases\n"
+            "/export - Download your purchase history\n"
             "/currency - Set preferred currency\n"
             "/language - Set language\n"
+            "/remind - Daily list reminder\n"
             "/help - Show this help message\n\n"
             "🚀 Type /add to get started!"
         )
         await update.message.reply_text(welcome_text, parse_mode="Markdown")
-        logger.info(f"User {user.id} started bot")
+        logger.info("User %s started bot", user.id)
     except Exception as e:
-        logger.error(f"Error in start_handler: {e}")
+        logger.error("Error in start_handler: %s", e)
         await update.message.reply_text(
             "❌ An error occurred. Please try again."
         )
@@ -45,20 +54,33 @@ async def help_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
             "`/list` - View all items\n"
             "`/remove <n>` - Remove item\n"
             "  Example: /remove 1\n"
-            "`/clear` - Clear list\n\n"
+            "`/clear` - Clear list\n"
+            "`/shop` - Check items off in the store\n\n"
+            "**Shared Lists:**\n"
+            "`/share` - Get an invite code for your list\n"
+            "`/join <code>` - Join a shared list\n"
+            "`/leave` - Leave a shared list\n\n"
             "**AI & Features:**\n"
             "`/suggestions` - Get AI suggestions\n"
+            "`/compare` - Cheapest stores for your list\n"
+            "`/stores` - Stores you shop at\n"
             "`/receipt` - Upload receipt photo\n"
-            "`/stats` - Spending statistics\n\n"
+            "`/stats` - Spending statistics\n"
+            "`/summary` - This month by store\n"
+            "`/budget <amount> [category] [week]` - Set a budget\n"
+            "`/search <product>` - When did I last buy it?\n"
+            "`/export [csv|parquet]` - Download your history\n\n"
             "**Settings:**\n"
             "`/currency <code>` - Set currency (USD, BRL, EUR)\n"
-            "`/language <code>` - Set language (en, pt, es)\n\n"
+            "`/language <code>` - Set language (en, pt, es)\n"
+            "`/remind <HH:MM> [timezone]` - Daily list reminder\n"
+            "`/apitoken [off]` - Token for the REST API\n\n"
             "❓ Need more help? Check documentation on GitHub."
         )
         await update.message.reply_text(help_text, parse_mode="Markdown")
-        logger.info(f"User {update.effective_user.id} requested help")
+        logger.info("User %s requested help", update.effective_user.id)
     except Exception as e:
-        logger.error(f"Error in help_handler: {e}")
+        logger.error("Error in help_handler: %s", e)
         await update.message.reply_text(
             "❌ Error displaying help. Please try again."
         )
@@ -0,0 +1,105 @@
+"""Spending budget handler."""
+import logging
+import math
+from telegram import Update
+from telegram.ext import ContextTypes
+from app.config.settings import settings
+from app.core.database import AsyncSessionLocal
+from app.models.budget import ALL_CATEGORIES
+from app.services.budget_service import PERIODS, budget_service
+from app.services.category_service import CATEGORIES
+from app.services.read_models import read_models
+from app.utils.helpers import helpers
+
+logger = logging.getLogger(__name__)
+
+USAGE = (
+    "💰 Usage: /budget <amount> [category] [week|month]\n\n"
+    "Example: /budget 1500\n"
+    "Example: /budget 300 meat week\n"
+    "/budget off [category] - Remove a budget\n\n"
+    f"Categories: {', '.join(CATEGORIES)}"
+)
+
+
+def _parse(args: list[str]) -> tuple[str, str]:
+    """(category, period) from the words after the amount."""
+    category, period = ALL_CATEGORIES, "month"
+    for word in (arg.lower() for arg in args):
+        if word in PERIODS:
+            period = word
+        elif word in CATEGORIES:
+            category = word
+        else:
+            raise ValueError(word)
+    return category, period
+
+
+def _progress(budget) -> str:
+    percent = budget.spent / budget.limit_amount * 100
+    icon = "🚨" if percent >= 100 else "⚠️" if percent >= min(settings.BUDGET_ALERT_PERCENTS) else "✅"
+    label = "Overall" if budget.category == ALL_CATEGORIES else budget.category.capitalize()
+    return (
+        f"{icon} <b>{label}</b> ({budget.period}): "
+        f"{helpers.format_currency(budget.spent, budget.currency)} of "
+        f"{helpers.format_currency(budget.limit_amount, budget.currency)} ({percent:.0f}%)"
+    )
+
+
+async def manage_budget(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /budget command - Show, set or remove spending budgets."""
+    user_id = update.effective_user.id
+    
+    try:
+        async with AsyncSessionLocal() as session:
+            user = await read_models.user(session, user_id)
+        if not user:
+            await update.message.reply_text(
+                "❌ User profile not found. Please use /start first."
+            )
+            return
+        
+        args = context.args or []
+        if not args:
+            budgets = await budget_service.budgets(user_id, user.timezone)
+            if not budgets:
+                await update.message.reply_text(USAGE)
+                return
+            await update.message.reply_text(
+                "💰 <b>Your Budgets:</b>\n\n" + "\n".join(_progress(budget) for budget in budgets),
+                parse_mode="HTML"
+            )
+            logger.info("User %s viewed budgets", user_id)
+            return
+        
+        if args[0].lower() == "off":
+            category = args[1].lower() if len(args) > 1 else ALL_CATEGORIES
+            if await budget_service.remove(user_id, category):
+                await update.message.reply_text(f"🗑️ Budget for {category} removed.")
+                logger.info("User %s removed %s budget", user_id, category)
+            else:
+                await update.message.reply_text(f"❌ No budget for {category}.")
+            return
+        
+        try:
+            limit = float(args[0].replace(",", "."))
+            category, period = _parse(args[1:])
+        except ValueError:
+            await update.message.reply_text(USAGE)
+            return
+        if not math.isfinite(limit) or limit <= 0:
+            await update.message.reply_text("❌ The budget must be more than zero.")
+            return
+        
+        currency = user.currency or settings.DEFAULT_CURRENCY
+        budget = await budget_service.set_budget(user_id, user.timezone, category, period, limit, currency)
+        await update.message.reply_text(
+            f"✅ Budget saved.\n\n{_progress(budget)}",
+            parse_mode="HTML"
+        )
+        logger.info("User %s set %s budget to %s %s per %s", user_id, category, limit, currency, period)
+    except Exception as e:
+        logger.error("Error in manage_budget: %s", e)
+        await update.message.reply_text(
+            "❌ Error processing budget. Please try again."
+        )
@@ -0,0 +1,88 @@
+"""Cheapest-store comparison for the current list."""
+import logging
+import math
+from functools import partial
+from html import escape
+from telegram import Update
+from telegram.ext import ContextTypes
+from app.config.settings import settings
+from app.core.database import AsyncSessionLocal
+from app.services.currency_service import currency_service
+from app.services.price_service import price_service
+from app.services.list_service import list_service
+from app.services.read_models import read_models
+from app.utils.helpers import helpers
+
+logger = logging.getLogger(__name__)
+
+
+def format_price(amount: float, currency: str) -> str:
+    """A price matrix amount (in ``DEFAULT_CURRENCY``) shown in ``currency`` when a rate is known."""
+    converted = currency_service.convert(amount, settings.DEFAULT_CURRENCY, currency)
+    if math.isnan(converted):
+        return helpers.format_currency(amount, settings.DEFAULT_CURRENCY)
+    return helpers.format_currency(converted, currency)
+
+
+async def compare_prices(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /compare command - Where the current list is cheapest."""
+    user_id = update.effective_user.id
+    
+    try:
+        async with AsyncSessionLocal() as session:
+            user = await read_models.user(session, user_id)
+            if not user:
+                await update.message.reply_text(
+                    "❌ User profile not found. Please use /start first."
+                )
+                return
+            shopping_list = await list_service.active_list_view(session, user_id)
+            items = await read_models.items(session, shopping_list.id) if shopping_list else []
+        
+        names = [item.name for item in items if not item.is_bought]
+        if not names:
+            await update.message.reply_text("📝 Your list is empty. Add items with /add first.")
+            return
+        
+        result = await price_service.compare(names)
+        if not result.single:
+            await update.message.reply_text(
+                "🏪 No store prices for these items yet.\n\n"
+                "Prices come from receipts: upload some with /receipt."
+            )
+            return
+        
+        currency = user.currency or settings.DEFAULT_CURRENCY
+        money = partial(format_price, currency=currency)
+        
+        lines = [
+            f"{i}. {escape(basket.stores[0])} - {money(basket.total)} "
+            f"({basket.covered}/{result.items} items)"
+            for i, basket in enumerate(result.single, 1)
+        ]
+        text = "🏪 <b>Cheapest Stores for Your List:</b>\n\n" + "\n".join(lines)
+        
+        split = result.split
+        best = result.single[0]
+        if split and (split.covered, -split.total) > (best.covered, -best.total):
+            by_store = {}
+            for item, store in split.picks.items():
+                by_store.setdefault(store, []).append(item)
+            text += (
+                f"\n\n<b>Best Two-Store Split:</b> {money(split.total)} "
+                f"({split.covered}/{result.items} items)\n"
+                + "\n".join(
+                    f"• {escape(store)}: {escape(', '.join(picked))}"
+                    for store, picked in by_store.items()
+                )
+            )
+        if result.unpriced:
+            text += f"\n\n<i>No prices yet for: {escape(', '.join(result.unpriced))}</i>"
+        
+        await update.message.reply_text(text, parse_mode="HTML")
+        logger.info("User %s compared %s items across stores", user_id, len(names))
+    except Exception as e:
+        logger.error("Error in compare_prices: %s", e)
+        await update.message.reply_text(
+            "❌ Error comparing prices. Please try again."
+        )
@@ -0,0 +1,29 @@
+"""Tags log records with the update being handled."""
+from telegram import Update
+from telegram.ext import ContextTypes
+from app.utils.logger import bind_context
+
+
+def command_name(update: Update) -> str | None:
+    """The command an update invokes: "/add" -> "add", a photo -> "photo"."""
+    if update.callback_query is not None:
+        return "callback:" + (update.callback_query.data or "").split(":", 1)[0]
+    message = update.effective_message
+    if message is None:
+        return None
+    if message.photo:
+        return "photo"
+    text = message.text or ""
+    if text.startswith("/") and len(text) > 1:
+        return text[1:].split(maxsplit=1)[0].split("@", 1)[0].lower()
+    return None
+
+
+async def bind_log_context(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Runs first for every update so later log lines carry its ids."""
+    user = update.effective_user
+    bind_context(
+        update_id=update.update_id,
+        user_id=user.id if user else None,
+        command=command_name(update),
+    )
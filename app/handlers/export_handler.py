@@ -0,0 +1,54 @@
+"""Handler for exporting a user's purchase history."""
+import logging
+import os
+from datetime import date
+from telegram import Update
+from telegram.ext import ContextTypes
+from app.config.settings import settings
+from app.core.telegram_http import drain, pipeline
+from app.core.exceptions import ValidationException
+from app.services.export_service import export_service, FORMATS
+
+logger = logging.getLogger(__name__)
+
+
+async def export_history(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /export command - Send receipts and list history as a ZIP document."""
+    try:
+        user_id = update.effective_user.id
+        fmt = (context.args[0].lower() if context.args else "csv")
+        if fmt not in FORMATS:
+            await update.message.reply_text(
+                "📝 Usage: /export [csv|parquet]"
+            )
+            return
+
+        interim = await pipeline(update.message.reply_text("⏳ Preparing your export..."))
+        try:
+            spool = await export_service.export_to_file(user_id, fmt)
+        except ValidationException as e:
+            await drain(interim)
+            await update.message.reply_text(f"❌ {e}")
+            return
+        await drain(interim)
+
+        with spool:
+            size = spool.seek(0, os.SEEK_END)
+            if size > settings.EXPORT_MAX_DOCUMENT_BYTES:
+                await update.message.reply_text(
+                    "❌ Your export is too large to send through Telegram. "
+                    "Please contact support."
+                )
+                return
+            spool.seek(0)
+            await update.message.reply_document(
+                document=spool,
+                filename=f"smartshop_export_{date.today().isoformat()}_{fmt}.zip",
+                caption="📦 Your purchase history"
+            )
+        logger.info("User %s exported history (%s, %s bytes)", user_id, fmt, size)
+    except Exception as e:
+        logger.error("Error in export_history: %s", e)
+        await update.message.reply_text(
+            "❌ Error exporting your data. Please try again."
+        )
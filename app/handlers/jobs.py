@@ -0,0 +1,68 @@
+"""Scheduled job callbacks run by the application's JobQueue."""
+import logging
+from telegram.ext import ContextTypes
+from app.services.currency_service import currency_service
+from app.services.history_service import history_service
+from app.services.partition_service import partition_service
+from app.services.price_service import price_service
+from app.services.reminder_service import reminder_service
+from app.services.recommendation_service import recommendation_service
+from app.services.replenishment_service import replenishment_service
+
+logger = logging.getLogger(__name__)
+
+
+async def retrain_recommender(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Fold new shopping and receipt history into the suggestion model."""
+    try:
+        await recommendation_service.retrain()
+    except Exception as e:
+        logger.error("Error retraining recommender: %s", e)
+
+
+async def predict_replenishment(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Nightly rebuild of per-user purchase interval predictions."""
+    try:
+        await replenishment_service.run_batch()
+    except Exception as e:
+        logger.error("Error in replenishment batch: %s", e)
+
+
+async def refresh_fx_rates(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Swap in fresh exchange rates; the previous snapshot stays on failure."""
+    try:
+        await currency_service.refresh()
+    except Exception as e:
+        logger.error("Error refreshing FX rates: %s", e)
+
+
+async def send_reminders(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Every minute: deliver the reminders due in this minute's bucket."""
+    try:
+        await reminder_service.run_bucket()
+    except Exception as e:
+        logger.error("Error sending reminders: %s", e)
+
+
+async def refresh_prices(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Fold newly recorded store prices into the /compare matrix."""
+    try:
+        await price_service.matrix.refresh()
+    except Exception as e:
+        logger.error("Error refreshing store prices: %s", e)
+
+
+async def maintain_partitions(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Create next months' partitions and retire the ones past retention."""
+    try:
+        await partition_service.maintain()
+    except Exception as e:
+        logger.error("Error in partition maintenance: %s", e)
+
+
+async def archive_history(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Move old bought items and receipts to the archive tables."""
+    try:
+        await history_service.archive()
+    except Exception as e:
+        logger.error("Error archiving history: %s", e)
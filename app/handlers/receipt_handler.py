@@ -1,70 +1,276 @@
 """Receipt processing handler."""
+import asyncio
+import hashlib
 import logging
+from functools import partial
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from telegram import Update
 from telegram.ext import ContextTypes
 from app.services.ocr_service import ocr_service
+from app.services.ocr_cache import ocr_cache
+from app.services.image_service import image_service
+from app.services.currency_service import currency_service
+from app.services.album_service import album_service, stitch_pages
+from app.services.anomaly_service import anomaly_service
+from app.services.budget_service import budget_service
+from app.services.category_service import categorize
+from app.services.notification_service import notification_service
+from app.services.price_service import price_service
+from app.services.recommendation_service import normalize_item
+from app.config.settings import settings
+from app.core.telegram_http import drain, pipeline
+from app.core.admission import admission
 from app.core.database import AsyncSessionLocal
-from sqlalchemy import select
-from app.models.user import User
+from app.handlers.shopping_handler import ensure_user
+from app.models.receipt import Receipt, ReceiptItem, ReceiptText
+from app.utils.helpers import helpers
 
 logger = logging.getLogger(__name__)
 
 
+async def _already_saved(session, user_id: int, image_digest) -> bool:
+    if not image_digest:
+        return False
+    found = await session.scalar(
+        select(Receipt.id).where(Receipt.user_id == user_id, Receipt.image_digest == image_digest).limit(1)
+    )
+    return found is not None
+
+
+async def save_receipt(tg_user, result: dict, total: float, currency: str) -> bool:
+    """Persist an OCR result with its lines, which feed suggestions, stats and budgets.
+    
+    Returns ``False`` without saving when the user already saved this
+    photo, so a resent receipt is not counted twice.
+    """
+    user = await ensure_user(tg_user.id, tg_user.username or "Unknown", first_name=tg_user.first_name)
+    image_digest = result.get("image_digest")
+    async with AsyncSessionLocal() as session:
+        if await _already_saved(session, tg_user.id, image_digest):
+            logger.info("User %s resent a saved receipt; not saved again", tg_user.id)
+            return False
+        receipt = Receipt(
+            user_id=tg_user.id,
+            store_name=result.get("store") or "Unknown",
+            total_amount=total,
+            currency=currency,
+            items_count=len(result["items"]),
+            image_digest=image_digest,
+            is_processed=True
+        )
+        if result.get("text"):
+            receipt.raw_text = ReceiptText.from_text(result["text"])
+        receipt.items = [
+            ReceiptItem(
+                user_id=tg_user.id,
+                product_name=item.get('name', 'Unknown')[:255],
+                price=item.get('price'),
+                category=categorize(item.get('name', ''))
+            )
+            for item in result["items"]
+        ]
+        session.add(receipt)
+        alerts = await budget_service.record(
+            session, tg_user.id, user.timezone, currency, total,
+            [(line.category, line.price) for line in receipt.items]
+        )
+        await price_service.record(
+            session, receipt.store_name, currency,
+            [(line.product_name, line.price) for line in receipt.items]
+        )
+        anomalies = []
+        if settings.ANOMALY_ALERTS_ENABLED:
+            anomalies = await anomaly_service.record(
+                session, tg_user.id, currency, user.currency or settings.DEFAULT_CURRENCY,
+                [(line.product_name, line.category, line.price) for line in receipt.items]
+            )
+        try:
+            await session.commit()
+        except IntegrityError:
+            # The same photo sent twice at once: the other save won
+            await session.rollback()
+            if await _already_saved(session, tg_user.id, image_digest):
+                return False
+            raise
+    
+    for alert in alerts:
+        await notification_service.budget_alert(tg_user.id, *alert)
+    if anomalies:
+        await notification_service.unusual_spend(tg_user.id, anomalies)
+    return True
+
+
+def _same_receipt(a: dict, b: dict) -> bool:
+    """Whether two OCR results read the same store, lines and prices."""
+    def lines(result):
+        return [
+            (normalize_item(item.get("name", "")), round(item.get("price") or 0, 2))
+            for item in result.get("items") or []
+        ]
+    return (a.get("store") or "").lower() == (b.get("store") or "").lower() and lines(a) == lines(b)
+
+
+async def extract_receipt(message, user_id: int) -> dict:
+    """OCR the message's photo, answering from the OCR cache when possible.
+    
+    Starts at the smallest photo size likely to OCR well and only moves to
+    a larger size while the result is not confident. The result's
+    ``image_digest`` identifies the photo for ``save_receipt``.
+    """
+    photos = message.photo
+    file_ids = [photo.file_unique_id for photo in photos]
+    
+    # A resent or forwarded photo keeps its file ids: skip download and OCR
+    cached = await ocr_cache.lookup_files(file_ids)
+    if cached is not None:
+        logger.info("User %s - OCR cache hit by file id", user_id)
+        return cached
+    
+    best, best_key = None, None
+    for photo in image_service.photo_order(photos):
+        async with image_service.download(photo) as downloaded:
+            found = await ocr_cache.lookup_digest(downloaded.digest)
+            if found is None:
+                image_data, phash = await image_service.prepare(downloaded)
+        
+        if found is not None:
+            logger.info("User %s - OCR cache hit by image content", user_id)
+            await ocr_cache.store(user_id, downloaded.digest, None, file_ids, found)
+            return found
+        
+        result = await ocr_service.process_receipt(image_data)
+        if best is None or _quality(result) > _quality(best):
+            best, best_key = result, (downloaded.digest, phash)
+        if ocr_service.is_confident(result):
+            break
+        logger.info(
+            "User %s - low OCR confidence at %sx%s, trying a larger size",
+            user_id,
+            downloaded.size[0],
+            downloaded.size[1]
+        )
+    
+    if best and best.get("success") and best.get("items"):
+        digest, phash = best_key
+        # A near-duplicate photo only counts as the same receipt if it reads the same
+        similar = await ocr_cache.lookup_similar(user_id, phash)
+        if similar is not None and _same_receipt(best, similar):
+            logger.info("User %s - photo matches an earlier copy of the same receipt", user_id)
+            digest = similar["image_digest"]
+        best = {**best, "image_digest": digest}
+        await ocr_cache.store(user_id, best_key[0], phash, file_ids, best)
+    return best
+
+
+def _quality(result: dict) -> tuple:
+    return (bool(result.get("success") and result.get("items")), result.get("confidence", 0.0))
+
+
+async def receipt_currency(message, tg_user) -> str:
+    """Currency named in the photo caption (e.g. "EUR"), else the user's own."""
+    code = (message.caption or "").strip().split(maxsplit=1)[:1]
+    if code and currency_service.supports(code[0].upper()):
+        return code[0].upper()
+    user = await ensure_user(tg_user.id, tg_user.username or "Unknown", first_name=tg_user.first_name)
+    return user.currency or settings.DEFAULT_CURRENCY
+
+
+async def _reply_with_receipt(message, tg_user, result: dict, caption_message=None) -> None:
+    """Save an OCR result and answer ``message`` with its items and total."""
+    if not (result and result.get("success") and result.get("items")):
+        # OCR couldn't extract items
+        await message.reply_text(
+            "❌ Could not extract items from receipt. "
+            "The image may be unclear. Please try again."
+        )
+        logger.warning("User %s - OCR extraction failed", tg_user.id)
+        return
+    
+    currency = await receipt_currency(caption_message or message, tg_user)
+    # Format items for display
+    items_text = "\n".join([
+        f"• {item.get('name', 'Unknown')}: {helpers.format_currency(item.get('price', 0), currency)}"
+        for item in result["items"]
+    ])
+    total = sum(item.get('price', 0) for item in result["items"])
+    
+    # Save to database, later if the pool is saturated
+    saved = True
+    if admission.allows(admission.DEFER_RECEIPTS):
+        try:
+            saved = await save_receipt(tg_user, result, total, currency)
+        except Exception as db_error:
+            logger.warning("Could not save receipt: %s", db_error)
+    else:
+        admission.defer("receipt", partial(save_receipt, tg_user, result, total, currency))
+    
+    pages = ""
+    if result.get("pages", 1) > 1:
+        pages = f" ({result['pages']} pages)"
+        if result.get("failed_pages"):
+            pages += f"\n⚠️ Could not read page(s) {', '.join(map(str, result['failed_pages']))}"
+    if not saved:
+        pages += "\nℹ️ You already sent this receipt, so it was not counted again."
+    
+    # Send processed receipt
+    await message.reply_text(
+        f"✅ Receipt processed!{pages}\n\n"
+        f"<b>Extracted items:</b>\n{items_text}\n\n"
+        f"<b>Total: {helpers.format_currency(total, currency)}</b>",
+        parse_mode="HTML"
+    )
+    logger.info("User %s processed receipt with OCR", tg_user.id)
+
+
+async def process_album(tg_user, pages: list) -> None:
+    """OCR every page of an album at once and reply with one receipt."""
+    first = pages[0]
+    interim = await pipeline(first.reply_text(f"🔄 Processing {len(pages)}-page receipt..."))
+    try:
+        results = await asyncio.gather(
+            *(extract_receipt(page, tg_user.id) for page in pages), return_exceptions=True
+        )
+        for page, result in enumerate(results, 1):
+            if isinstance(result, Exception):
+                logger.error("OCR service error on page %s: %s", page, result)
+        results = [None if isinstance(r, Exception) else r for r in results]
+        result = stitch_pages(results)
+        digests = [r.get("image_digest") if r else None for r in results]
+        if all(digests):
+            # The album as a whole identifies the receipt
+            result["image_digest"] = hashlib.sha256("".join(digests).encode()).hexdigest()
+        await drain(interim)
+        captioned = next((page for page in pages if page.caption), first)
+        await _reply_with_receipt(first, tg_user, result, captioned)
+    except Exception as e:
+        logger.error("Error in process_album: %s", e)
+        await drain(interim)
+        await first.reply_text(
+            "❌ Error processing receipt. Please try again."
+        )
+
+
 async def process_receipt(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /receipt command or photo upload - Process receipt with OCR."""
     user_id = update.effective_user.id
     
     try:
-        if update.message.photo:
+        if update.message.photo and update.message.media_group_id:
+            # A page of an album: answered once, after the last page arrives
+            album_service.add(update.message, partial(process_album, update.effective_user))
+        elif update.message.photo:
             # Notify user that processing has started
-            await update.message.reply_text("🔄 Processing receipt...")
-            
-            # Download the photo
-            photo_file = await update.message.photo[-1].get_file()
-            image_data = await photo_file.download_as_bytearray()
+            interim = await pipeline(update.message.reply_text("🔄 Processing receipt..."))
             
             # Process with OCR service
             try:
-                result = await ocr_service.process_receipt(bytes(image_data))
-                
-                if result and result.get("success") and result.get("items"):
-                    # Format items for display
-                    items_text = "\n".join([
-                        f"• {item.get('name', 'Unknown')}: R${item.get('price', 0):.2f}" 
-                        for item in result["items"]
-                    ])
-                    total = sum(item.get('price', 0) for item in result["items"])
-                    
-                    # Save to database
-                    try:
-                        async with AsyncSessionLocal() as session:
-                            stmt = select(User).where(User.user_id == user_id)
-                            user = await session.scalar(stmt)
-                            
-                            if user:
-                                # Update user's receipt count
-                                user.receipt_count = (user.receipt_count or 0) + 1
-                                await session.commit()
-                    except Exception as db_error:
-                        logger.warning(f"Could not update user stats: {db_error}")
-                    
-                    # Send processed receipt
-                    await update.message.reply_text(
-                        f"✅ Receipt processed!\n\n"
-                        f"<b>Extracted items:</b>\n{items_text}\n\n"
-                        f"<b>Total: R${total:.2f}</b>",
-                        parse_mode="HTML"
-                    )
-                    logger.info(f"User {user_id} processed receipt with OCR")
-                else:
-                    # OCR couldn't extract items
-                    await update.message.reply_text(
-                        "❌ Could not extract items from receipt. "
-                        "The image may be unclear. Please try again."
-                    )
-                    logger.warning(f"User {user_id} - OCR extraction failed")
+                result = await extract_receipt(update.message, user_id)
+                await drain(interim)
+                await _reply_with_receipt(update.message, update.effective_user, result)
             except Exception as ocr_error:
-                logger.error(f"OCR service error: {ocr_error}")
+                logger.error("OCR service error: %s", ocr_error)
+                await drain(interim)
                 await update.message.reply_text(
                     "❌ Error processing receipt with OCR. Please try again."
                 )
@@ -72,10 +278,12 @@ async def process_receipt(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             # No photo attached
             await update.message.reply_text(
                 "📷 Please send a photo of your receipt to process it.\n\n"
-                "Supported formats: JPG, PNG"
+                "Supported formats: JPG, PNG\n"
+                "Long receipt? Send its pages together as one album.\n"
+                "Paid in another currency? Add its code as the caption, e.g. EUR"
             )
     except Exception as e:
-        logger.error(f"Error in process_receipt: {e}")
+        logger.error("Error in process_receipt: %s", e)
         await update.message.reply_text(
             "❌ Error processing receipt. Please try again."
         )
@@ -0,0 +1,85 @@
+"""Handler for searching purchase history."""
+import logging
+from html import escape
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import ContextTypes
+from app.services.search_service import Cursor, search_service
+from app.utils.helpers import helpers
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 10
+
+
+def _format_hit(hit) -> str:
+    when = hit.created_at.strftime("%d %b %Y")
+    name = escape(hit.name)
+    if hit.kind == "receipt":
+        price = f" - {helpers.format_currency(hit.price, hit.currency)}" if hit.price is not None else ""
+        return f"• {when} - {name}{price} at {escape(hit.place or 'Unknown')}"
+    return f"• {when} - {name} ({hit.place})"
+
+
+async def _send_page(update: Update, context: ContextTypes.DEFAULT_TYPE, cursor=None) -> None:
+    text = context.user_data.get("search_query")
+    if not text:
+        await update.effective_message.reply_text("📝 Usage: /search <product>")
+        return
+
+    hits, next_cursor = await search_service.search(
+        update.effective_user.id, text, cursor=cursor, limit=PAGE_SIZE
+    )
+    if not hits:
+        message = (
+            f"🔎 No purchases matching <b>{escape(text)}</b>."
+            if cursor is None else "🔎 No more results."
+        )
+        await update.effective_message.reply_text(message, parse_mode="HTML")
+        return
+
+    lines = "\n".join(_format_hit(hit) for hit in hits)
+    keyboard = None
+    if next_cursor is not None:
+        keyboard = InlineKeyboardMarkup([[
+            InlineKeyboardButton("More ▶", callback_data=f"srch:{next_cursor.encode()}")
+        ]])
+    await update.effective_message.reply_text(
+        f"🔎 <b>{escape(text)}</b>\n\n{lines}",
+        parse_mode="HTML",
+        reply_markup=keyboard
+    )
+
+
+async def search_history(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /search command - Find products in receipts and lists, newest first."""
+    try:
+        if not context.args:
+            await update.message.reply_text(
+                "📝 Usage: /search <product>\n"
+                "Example: /search coffee"
+            )
+            return
+        
+        text = " ".join(context.args)[:100]
+        if len(text) < 2:
+            await update.message.reply_text("❌ Please search for at least 2 characters.")
+            return
+        
+        context.user_data["search_query"] = text
+        await _send_page(update, context)
+        logger.info("User %s searched history", update.effective_user.id)
+    except Exception as e:
+        logger.error("Error in search_history: %s", e)
+        await update.message.reply_text("❌ Error searching your history. Please try again.")
+
+
+async def search_more(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Next page of the user's last search."""
+    query = update.callback_query
+    try:
+        await query.answer()
+        cursor = Cursor.decode(query.data.split(":", 1)[1])
+        await query.edit_message_reply_markup(reply_markup=None)
+        await _send_page(update, context, cursor)
+    except Exception as e:
+        logger.error("Error in search_more: %s", e)
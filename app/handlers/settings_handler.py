@@ -1,10 +1,18 @@
 """Settings handler for user preferences."""
 import logging
+from datetime import datetime
+from html import escape
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy import func, select
 from telegram import Update
 from telegram.ext import ContextTypes
+from app.config.settings import settings
 from app.core.database import AsyncSessionLocal
-from sqlalchemy import select
-from app.models.user import User
+from app.core.queries import queries
+from app.models.receipt import Receipt
+from app.services.api_token_service import api_token_service
+from app.services.currency_service import currency_service
+from app.services.reminder_service import reminder_service
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +36,7 @@ async def set_currency(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         
         currency = context.args[0].upper()
         
-        if currency not in VALID_CURRENCIES:
+        if currency not in VALID_CURRENCIES or not currency_service.supports(currency):
             await update.message.reply_text(
                 f"❌ Invalid currency '{currency}'.\n\n"
                 f"Valid options: {', '.join(VALID_CURRENCIES)}"
@@ -38,27 +46,28 @@ async def set_currency(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         # Save to database
         try:
             async with AsyncSessionLocal() as session:
-                stmt = select(User).where(User.user_id == user_id)
-                user = await session.scalar(stmt)
+                user = await session.scalar(queries.user_by_id, {"user_id": user_id})
                 
                 if user:
-                    user.preferred_currency = currency
+                    user.currency = currency
                     await session.commit()
                     await update.message.reply_text(
-                        f"✅ Currency set to {currency}"
+                        f"✅ Currency set to {currency}\n\n"
+                        f"Receipts keep the currency they were paid in; "
+                        f"totals in /stats are converted to {currency}."
                     )
-                    logger.info(f"User {user_id} set currency to {currency}")
+                    logger.info("User %s set currency to %s", user_id, currency)
                 else:
                     await update.message.reply_text(
                         "❌ User profile not found. Please use /start first."
                     )
         except Exception as db_error:
-            logger.error(f"Database error setting currency: {db_error}")
+            logger.error("Database error setting currency: %s", db_error)
             await update.message.reply_text(
                 "❌ Error saving currency preference. Please try again."
             )
     except Exception as e:
-        logger.error(f"Error in set_currency: {e}")
+        logger.error("Error in set_currency: %s", e)
         await update.message.reply_text(
             "❌ Error processing currency setting. Please try again."
         )
@@ -90,80 +99,180 @@ async def set_language(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         # Save to database
         try:
             async with AsyncSessionLocal() as session:
-                stmt = select(User).where(User.user_id == user_id)
-                user = await session.scalar(stmt)
+                user = await session.scalar(queries.user_by_id, {"user_id": user_id})
                 
                 if user:
-                    user.preferred_language = lang_code
+                    user.language = lang_code
                     await session.commit()
                     await update.message.reply_text(
                         f"✅ Language set to {lang_code.upper()}"
                     )
-                    logger.info(f"User {user_id} set language to {lang_code}")
+                    logger.info("User %s set language to %s", user_id, lang_code)
                 else:
                     await update.message.reply_text(
                         "❌ User profile not found. Please use /start first."
                     )
         except Exception as db_error:
-            logger.error(f"Database error setting language: {db_error}")
+            logger.error("Database error setting language: %s", db_error)
             await update.message.reply_text(
                 "❌ Error saving language preference. Please try again."
             )
     except Exception as e:
-        logger.error(f"Error in set_language: {e}")
+        logger.error("Error in set_language: %s", e)
         await update.message.reply_text(
             "❌ Error processing language setting. Please try again."
         )
 
 
+async def set_reminder(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /remind command - Daily list reminder at a local time."""
+    user_id = update.effective_user.id
+    
+    try:
+        if not context.args:
+            await update.message.reply_text(
+                "⏰ Usage: /remind <HH:MM> [timezone]\n\n"
+                "Example: /remind 08:30 Europe/Lisbon\n"
+                "/remind off - Stop reminders"
+            )
+            return
+        
+        async with AsyncSessionLocal() as session:
+            user = await session.scalar(queries.user_by_id, {"user_id": user_id})
+        if not user:
+            await update.message.reply_text(
+                "❌ User profile not found. Please use /start first."
+            )
+            return
+        
+        if context.args[0].lower() == "off":
+            await reminder_service.schedule(user_id, None, user.timezone)
+            await update.message.reply_text("🔕 Daily reminders turned off.")
+            logger.info("User %s turned reminders off", user_id)
+            return
+        
+        try:
+            at = datetime.strptime(context.args[0], "%H:%M").time()
+        except ValueError:
+            await update.message.reply_text("❌ Invalid time. Use HH:MM, e.g. 08:30")
+            return
+        
+        tz_name = context.args[1] if len(context.args) > 1 else user.timezone
+        try:
+            ZoneInfo(tz_name or settings.DEFAULT_TIMEZONE)
+        except (ZoneInfoNotFoundError, ValueError):
+            await update.message.reply_text(
+                f"❌ Unknown timezone '{tz_name}'.\n\n"
+                f"Use a name like America/Sao_Paulo or Europe/Lisbon."
+            )
+            return
+        
+        await reminder_service.schedule(user_id, at, tz_name)
+        await update.message.reply_text(
+            f"⏰ I'll remind you about your list every day at {at:%H:%M} "
+            f"({tz_name or settings.DEFAULT_TIMEZONE}), when it has items left to buy."
+        )
+        logger.info("User %s set reminder to %s %s", user_id, at, tz_name)
+    except Exception as e:
+        logger.error("Error in set_reminder: %s", e)
+        await update.message.reply_text(
+            "❌ Error saving reminder. Please try again."
+        )
+
+
 async def manage_stores(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle /stores command - Manage favorite stores."""
+    """Handle /stores command - Stores the user has receipts from."""
     user_id = update.effective_user.id
     
     try:
         async with AsyncSessionLocal() as session:
-            stmt = select(User).where(User.user_id == user_id)
-            user = await session.scalar(stmt)
+            user = await session.scalar(queries.user_by_id, {"user_id": user_id})
             
             if user:
-                # TODO: Implement store management logic when Store model is ready
-                stores_text = "\n".join([
-                    "1. Carrefour - Av. Paulista",
-                    "2. Pao de Acucar - Centro",
-                    "3. Dia - Vila Mariana"
-                ])
+                visits = func.count(Receipt.id)
+                rows = (await session.execute(
+                    select(Receipt.store_name, visits, func.max(Receipt.created_at))
+                    .where(Receipt.user_id == user_id, Receipt.store_name != "Unknown")
+                    .group_by(Receipt.store_name)
+                    .order_by(visits.desc())
+                    .limit(10)
+                )).all()
+                
+                if rows:
+                    stores_text = "\n".join(
+                        f"{i}. {escape(store)} - {count} receipt(s), last {last:%Y-%m-%d}"
+                        for i, (store, count, last) in enumerate(rows, 1)
+                    )
+                else:
+                    stores_text = "No stores yet. Upload a receipt with /receipt."
                 
                 await update.message.reply_text(
-                    f"🏪 <b>Your Favorite Stores:</b>\n\n{stores_text}\n\n"
-                    f"<b>Commands:</b>\n"
-                    f"/addstore <name> - Add a store\n"
-                    f"/removestore <id> - Remove a store",
+                    f"🏪 <b>Your Stores:</b>\n\n{stores_text}\n\n"
+                    f"/compare - Where your list is cheapest",
                     parse_mode="HTML"
                 )
-                logger.info(f"User {user_id} viewed favorite stores")
+                logger.info("User %s viewed favorite stores", user_id)
             else:
                 await update.message.reply_text(
                     "❌ User profile not found. Please use /start first."
                 )
     except Exception as e:
-        logger.error(f"Error in manage_stores: {e}")
+        logger.error("Error in manage_stores: %s", e)
         await update.message.reply_text(
             "❌ Error retrieving stores. Please try again."
         )
 
 
+async def manage_api_token(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /apitoken command - Issue or revoke the REST API token."""
+    user_id = update.effective_user.id
+    
+    try:
+        if not settings.API_ENABLED:
+            await update.message.reply_text("❌ The API is not enabled on this bot.")
+            return
+        if update.effective_chat.type != "private":
+            await update.message.reply_text("🔒 Send /apitoken in a private chat with the bot.")
+            return
+        
+        if context.args and context.args[0].lower() == "off":
+            await api_token_service.revoke(user_id)
+            await update.message.reply_text("🗑️ API token revoked.")
+            logger.info("User %s revoked their API token", user_id)
+            return
+        
+        token = await api_token_service.issue(user_id)
+        if token is None:
+            await update.message.reply_text(
+                "❌ User profile not found. Please use /start first."
+            )
+            return
+        await update.message.reply_text(
+            f"🔑 <b>Your API token:</b>\n<code>{token}</code>\n\n"
+            f"Send it as <code>Authorization: Bearer &lt;token&gt;</code>. "
+            f"It replaces any previous token.\n"
+            f"/apitoken off - Revoke it",
+            parse_mode="HTML"
+        )
+        logger.info("User %s issued an API token", user_id)
+    except Exception as e:
+        logger.error("Error in manage_api_token: %s", e)
+        await update.message.reply_text(
+            "❌ Error managing your API token. Please try again."
+        )
+
+
 async def show_settings(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /settings command - Show current settings."""
     user_id = update.effective_user.id
     
     try:
         async with AsyncSessionLocal() as session:
-            stmt = select(User).where(User.user_id == user_id)
-            user = await session.scalar(stmt)
+            user = await session.scalar(queries.user_by_id, {"user_id": user_id})
             
             if user:
-                currency = user.preferred_currency or "BRL"
-                language = user.preferred_language or "en"
+                currency = user.currency or settings.DEFAULT_CURRENCY
+                language = user.language or "en"
                 notifications = "Enabled" if getattr(user, "notifications_enabled", True) else "Disabled"
                 
                 settings_text = (
@@ -179,13 +288,13 @@ async def show_settings(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
                 )
                 
                 await update.message.reply_text(settings_text, parse_mode="HTML")
-                logger.info(f"User {user_id} viewed settings")
+                logger.info("User %s viewed settings", user_id)
             else:
                 await update.message.reply_text(
                     "❌ User profile not found. Please use /start first."
                 )
     except Exception as e:
-        logger.error(f"Error in show_settings: {e}")
+        logger.error("Error in show_settings: %s", e)
         await update.message.reply_text(
             "❌ Error retrieving settings. Please try again."
         )
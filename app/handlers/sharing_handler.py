@@ -0,0 +1,91 @@
+"""Handlers for sharing a shopping list with other users."""
+import logging
+from telegram import Update
+from telegram.ext import ContextTypes
+from app.core.database import AsyncSessionLocal
+from app.core.exceptions import ShoppingListException
+from app.handlers.shopping_handler import ensure_user
+from app.services.list_service import list_service
+from app.services.list_sync_service import list_sync_service
+
+logger = logging.getLogger(__name__)
+
+
+async def share_list(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /share command - Create an invite code for the active list."""
+    try:
+        tg_user = update.effective_user
+        user = await ensure_user(tg_user.id, tg_user.username or "Unknown", first_name=tg_user.first_name)
+        
+        async with AsyncSessionLocal() as db:
+            invite_code = await list_service.share(db, user)
+            await db.commit()
+        
+        await update.message.reply_text(
+            "👨‍👩‍👧 Your list is now shared.\n\n"
+            "Ask your household to send:\n"
+            f"`/join {invite_code}`\n\n"
+            "Use /list to pin a copy that updates automatically.",
+            parse_mode="Markdown"
+        )
+        logger.info("User %s shared their list", tg_user.id)
+    except Exception as e:
+        logger.error("Error in share_list: %s", e)
+        await update.message.reply_text("❌ Error sharing list. Please try again.")
+
+
+async def join_list(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /join command - Join a shared list by invite code."""
+    try:
+        if not context.args:
+            await update.message.reply_text(
+                "📝 Usage: /join <invite code>\n"
+                "Ask the list owner to send /share."
+            )
+            return
+        
+        tg_user = update.effective_user
+        user = await ensure_user(tg_user.id, tg_user.username or "Unknown", first_name=tg_user.first_name)
+        
+        async with AsyncSessionLocal() as db:
+            try:
+                shopping_list = await list_service.join(db, user, context.args[0])
+                await db.commit()
+            except ShoppingListException:
+                await update.message.reply_text("❌ Invalid invite code.")
+                return
+        
+        await list_sync_service.notify(shopping_list.id)
+        await update.message.reply_text(
+            f"✅ You joined <b>{shopping_list.name}</b>.\n"
+            "Use /list to see and pin it.",
+            parse_mode="HTML"
+        )
+        logger.info("User %s joined list %s", tg_user.id, shopping_list.id)
+    except Exception as e:
+        logger.error("Error in join_list: %s", e)
+        await update.message.reply_text("❌ Error joining list. Please try again.")
+
+
+async def leave_list(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /leave command - Leave the active shared list."""
+    try:
+        tg_user = update.effective_user
+        user = await ensure_user(tg_user.id, tg_user.username or "Unknown", first_name=tg_user.first_name)
+        
+        async with AsyncSessionLocal() as db:
+            shopping_list = await list_service.leave(db, user)
+            await db.commit()
+        
+        if shopping_list is None:
+            await update.message.reply_text("ℹ️ You are not on a shared list.")
+            return
+        
+        await list_sync_service.notify(shopping_list.id)
+        await update.message.reply_text(
+            "👋 You left the shared list. /add starts a new personal list."
+        )
+        logger.info("User %s left list %s", tg_user.id, shopping_list.id)
+    except Exception as e:
+        logger.error("Error in leave_list: %s", e)
+        await update.message.reply_text("❌ Error leaving list. Please try again.")
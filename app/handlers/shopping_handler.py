@@ -2,23 +2,33 @@
 import logging
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler
-from sqlalchemy import select
-
+from app.core.admission import admission
 from app.core.database import AsyncSessionLocal
+from app.core.exceptions import ListVersionConflict
+from app.core.metrics import metrics
+from app.core.queries import queries
 from app.models.shopping import ShoppingItem
 from app.models.user import User
-from app.services.ai_service import ai_service
+from app.services.list_service import list_service
+from app.services.list_sync_service import list_sync_service
+from app.services.read_models import read_models
+from app.services.write_buffer import write_buffer
 
 logger = logging.getLogger(__name__)
 
 
-async def ensure_user(user_id: int, username: str, db=None) -> User:
+async def ensure_user(user_id: int, username: str, db=None, first_name: str | None = None) -> User:
     """Ensure user exists in database."""
     async with AsyncSessionLocal() as session:
-        result = await session.execute(select(User).where(User.id == user_id))
+        result = await session.execute(queries.user_by_id, {"user_id": user_id})
         user = result.scalars().first()
         if not user:
-            user = User(id=user_id, username=username)
+            user = User(
+                id=user_id,
+                telegram_id=user_id,
+                username=username,
+                first_name=first_name or username
+            )
             session.add(user)
             await session.commit()
         return user
@@ -41,68 +51,112 @@ async def add_item_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         async with AsyncSessionLocal() as db:
             try:
                 # Ensure user exists
-                user = await ensure_user(user_id, username)
-                
-                # Create new shopping item
-                new_item = ShoppingItem(
-                    user_id=user_id,
-                    name=item_text
+                user = await ensure_user(
+                    user_id, username, first_name=update.effective_user.first_name
                 )
-                db.add(new_item)
-                await db.commit()
+                shopping_list = await list_service.ensure_active_list(db, user)
+                
+                if write_buffer.enabled:
+                    # Inserted with other users' items in the next flush
+                    await db.commit()
+                    write_buffer.add(
+                        shopping_list.id, shopping_list.is_shared, user_id=user_id, name=item_text
+                    )
+                else:
+                    # Create new shopping item
+                    new_item = ShoppingItem(
+                        user_id=user_id,
+                        list_id=shopping_list.id,
+                        name=item_text
+                    )
+                    db.add(new_item)
+                    version = await list_service.bump_version(db, shopping_list.id)
+                    # Appended last, so the numbers this member saw still hold
+                    await list_service.advance_seen(db, shopping_list.id, [user_id], version)
+                    await db.commit()
                 
                 await update.message.reply_text(
                     f"✅ Added: {item_text}"
                 )
-                logger.info(f"User {user_id} added item: {item_text}")
+                logger.info("User %s added item: %s", user_id, item_text)
                 
             except Exception as e:
                 await db.rollback()
-                logger.error(f"Error adding item for user {user_id}: {e}")
+                logger.error("Error adding item for user %s: %s", user_id, e)
                 await update.message.reply_text(
                     "❌ Error adding item. Please try again."
                 )
+                return
+        if shopping_list.is_shared and not write_buffer.enabled:
+            await list_sync_service.notify(shopping_list.id)
     except Exception as e:
-        logger.error(f"Unexpected error in add_item_handler: {e}")
+        logger.error("Unexpected error in add_item_handler: %s", e)
         await update.message.reply_text(
             "❌ An unexpected error occurred."
         )
 
 
 async def list_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle /list command - Display shopping list."""
+    """Handle /list command - Display shopping list.
+
+    For a shared list the reply is pinned and becomes the member's live
+    copy, edited in place whenever another member changes the list.
+    """
     try:
         user_id = update.effective_user.id
         
+        if not admission.allows(admission.LIST_FROM_CACHE):
+            cached = await list_service.cached_render(user_id)
+            if cached is not None:
+                metrics.inc("degraded_requests_total", mode="list_cache")
+                await update.message.reply_text(
+                    f"{cached}\n_Saved copy, may be a few seconds old._", parse_mode="Markdown"
+                )
+                return
+        
         async with AsyncSessionLocal() as db:
             try:
-                # Get all items for this user
-                result = await db.execute(
-                    select(ShoppingItem).where(ShoppingItem.user_id == user_id)
-                )
-                items = result.scalars().all()
+                shopping_list = await list_service.active_list_view(db, user_id)
+                items = await read_models.items(db, shopping_list.id) if shopping_list else []
                 
-                if not items:
+                if not items and not (shopping_list and shopping_list.is_shared):
                     await update.message.reply_text(
                         "📋 Your shopping list is empty.\n"
                         "Use /add to add items."
                     )
                     return
                 
-                msg = "📋 **Your Shopping List:**\n\n"
-                for i, item in enumerate(items, 1):
-                    msg += f"{i}. {item.name}\n"
+                msg = list_service.render(shopping_list, items)
+                sent = await update.message.reply_text(msg, parse_mode="Markdown")
                 
-                await update.message.reply_text(msg, parse_mode="Markdown")
-                logger.info(f"User {user_id} viewed list with {len(items)} items")
+                if shopping_list.is_shared:
+                    member = await list_service.member(db, shopping_list.id, user_id)
+                    if member and member.pinned_message_id:
+                        try:
+                            await context.bot.unpin_chat_message(member.chat_id, member.pinned_message_id)
+                        except Exception:
+                            pass
+                    try:
+                        await sent.pin(disable_notification=True)
+                    except Exception as e:
+                        logger.info("Could not pin list message for user %s: %s", user_id, e)
+                    await list_service.mark_seen(
+                        db, shopping_list.id, user_id, shopping_list.version,
+                        chat_id=sent.chat_id, message_id=sent.message_id
+                    )
+                else:
+                    await list_service.mark_seen(db, shopping_list.id, user_id, shopping_list.version)
+                await db.commit()
+                await list_service.cache_render(user_id, shopping_list, msg)
+                logger.info("User %s viewed list with %s items", user_id, len(items))
                 
             except Exception as e:
-                logger.error(f"Error retrieving list for user {user_id}: {e}")
+                logger.error("Error retrieving list for user %s: %s", user_id, e)
                 await update.message.reply_text(
                     "❌ Error retrieving list. Please try again."
                 )
     except Exception as e:
-        logger.error(f"Unexpected error in list_handler: {e}")
+        logger.error("Unexpected error in list_handler: %s", e)
         await update.message.reply_text(
             "❌ An unexpected error occurred."
         )
@@ -130,12 +184,20 @@ async def remove_item_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         
         async with AsyncSessionLocal() as db:
             try:
-                # Get all items and remove by index
-                result = await db.execute(
-                    select(ShoppingItem).where(ShoppingItem.user_id == user_id)
-                )
-                items = result.scalars().all()
+                shopping_list = await list_service.active_list_view(db, user_id)
+                if shopping_list is None:
+                    await update.message.reply_text(
+                        "❌ Invalid item number."
+                    )
+                    return
+                
+                # Item numbers refer to the list as this member last saw it
+                seen = shopping_list.version
+                if shopping_list.is_shared:
+                    member = await list_service.member(db, shopping_list.id, user_id)
+                    seen = member.seen_version if member else 0
                 
+                items = await list_service.items(db, shopping_list.id)
                 if item_index < 0 or item_index >= len(items):
                     await update.message.reply_text(
                         "❌ Invalid item number."
@@ -143,22 +205,33 @@ async def remove_item_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
                     return
                 
                 item_to_remove = items[item_index]
-                await db.delete(item_to_remove)
+                await list_service.bump_version(db, shopping_list.id, expected=seen)
+                await list_service.remove(db, [item_to_remove])
                 await db.commit()
                 
                 await update.message.reply_text(
                     f"✅ Removed: {item_to_remove.name}"
                 )
-                logger.info(f"User {user_id} removed item: {item_to_remove.name}")
+                logger.info("User %s removed item: %s", user_id, item_to_remove.name)
                 
+            except ListVersionConflict:
+                await db.rollback()
+                await update.message.reply_text(
+                    "⚠️ The list changed since you last saw it. "
+                    "Check /list and try again."
+                )
+                return
             except Exception as e:
                 await db.rollback()
-                logger.error(f"Error removing item for user {user_id}: {e}")
+                logger.error("Error removing item for user %s: %s", user_id, e)
                 await update.message.reply_text(
                     "❌ Error removing item. Please try again."
                 )
+                return
+        if shopping_list.is_shared:
+            await list_sync_service.notify(shopping_list.id)
     except Exception as e:
-        logger.error(f"Unexpected error in remove_item_handler: {e}")
+        logger.error("Unexpected error in remove_item_handler: %s", e)
         await update.message.reply_text(
             "❌ An unexpected error occurred."
         )
@@ -171,11 +244,8 @@ async def clear_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         
         async with AsyncSessionLocal() as db:
             try:
-                # Delete all items for this user
-                result = await db.execute(
-                    select(ShoppingItem).where(ShoppingItem.user_id == user_id)
-                )
-                items = result.scalars().all()
+                shopping_list = await list_service.active_list_view(db, user_id)
+                items = await list_service.items(db, shopping_list.id) if shopping_list else []
                 
                 if not items:
                     await update.message.reply_text(
@@ -184,79 +254,27 @@ async def clear_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
                     return
                 
                 count = len(items)
-                for item in items:
-                    await db.delete(item)
+                await list_service.remove(db, items)
+                version = await list_service.bump_version(db, shopping_list.id)
+                await list_service.advance_seen(db, shopping_list.id, [user_id], version)
                 await db.commit()
                 
                 await update.message.reply_text(
                     f"✅ Cleared {count} items from your list."
                 )
-                logger.info(f"User {user_id} cleared {count} items")
+                logger.info("User %s cleared %s items", user_id, count)
                 
             except Exception as e:
                 await db.rollback()
-                logger.error(f"Error clearing list for user {user_id}: {e}")
+                logger.error("Error clearing list for user %s: %s", user_id, e)
                 await update.message.reply_text(
                     "❌ Error clearing list. Please try again."
                 )
+                return
+        if shopping_list.is_shared:
+            await list_sync_service.notify(shopping_list.id)
     except Exception as e:
-        logger.error(f"Unexpected error in clear_handler: {e}")
-        await update.message.reply_text(
-            "❌ An unexpected error occurred."
-        )
-
-
-async def suggestions_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle /suggestions command - Get AI suggestions."""
-    try:
-        user_id = update.effective_user.id
-        
-        async with AsyncSessionLocal() as db:
-            try:
-                # Get all items for this user
-                result = await db.execute(
-                    select(ShoppingItem).where(ShoppingItem.user_id == user_id)
-                )
-                items = result.scalars().all()
-                
-                if not items:
-                    await update.message.reply_text(
-                        "📋 Your shopping list is empty.\n"
-                        "Add items first to get suggestions."
-                    )
-                    return
-                
-                current_names = [i.name for i in items]
-                
-                if not ai_service.client:
-                    await update.message.reply_text(
-                        "⚠️ AI suggestions are currently disabled."
-                    )
-                    return
-                
-                await update.message.reply_text(
-                    "🤖 Thinking of suggestions..."
-                )
-                
-                suggestions = await ai_service.get_suggestions(current_names)
-                
-                msg = "🤖 **AI Suggestions:**\n\n"
-                for s in suggestions:
-                    msg += f"• {s}\n"
-                
-                await update.message.reply_text(
-                    msg,
-                    parse_mode="Markdown"
-                )
-                logger.info(f"User {user_id} got AI suggestions")
-                
-            except Exception as e:
-                logger.error(f"Error getting suggestions for user {user_id}: {e}")
-                await update.message.reply_text(
-                    "❌ Error getting suggestions. Please try again."
-                )
-    except Exception as e:
-        logger.error(f"Unexpected error in suggestions_handler: {e}")
+        logger.error("Unexpected error in clear_handler: %s", e)
         await update.message.reply_text(
             "❌ An unexpected error occurred."
         )
@@ -1,82 +1,87 @@
 """Statistics and analytics handler."""
 import logging
 from datetime import datetime
+from html import escape
 from telegram import Update
 from telegram.ext import ContextTypes
+from app.config.settings import settings
 from app.core.database import AsyncSessionLocal
-from sqlalchemy import select
-from app.models.user import User
+from app.services.currency_service import currency_service
+from app.services.read_models import read_models
+from app.services.stats_service import stats_service
+from app.utils.helpers import helpers
 
 logger = logging.getLogger(__name__)
 
 
+def _currency_notes(summary) -> str:
+    """Lines explaining a total that mixes currencies."""
+    notes = ""
+    if len(summary.paid_in) > 1:
+        notes += (
+            f"💱 Paid in {', '.join(summary.paid_in)}, converted to {summary.currency} "
+            f"(rates as of {currency_service.snapshot.as_of})\n"
+        )
+    if summary.unconverted:
+        notes += f"⚠️ {summary.unconverted} receipt(s) in currencies without a rate are not counted\n"
+    return notes
+
+
 async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /stats command - Show spending statistics and analytics."""
     user_id = update.effective_user.id
     
     try:
         async with AsyncSessionLocal() as session:
-            stmt = select(User).where(User.user_id == user_id)
-            user = await session.scalar(stmt)
-            
-            if not user:
-                await update.message.reply_text(
-                    "❌ User profile not found. Please use /start first."
-                )
-                return
-            
-            # Get user statistics
-            total_items = user.item_count or 0
-            total_receipts = user.receipt_count or 0
-            
-            # Calculate average per receipt if receipts exist
-            if total_receipts > 0:
-                avg_per_receipt = total_items / total_receipts
-            else:
-                avg_per_receipt = 0
-            
-            # Get creation date
-            created_at = getattr(user, 'created_at', None)
-            if created_at:
-                days_active = (datetime.utcnow() - created_at).days
-            else:
-                days_active = 0
-            
-            # Build stats message
-            stats_text = (
-                f"📊 <b>Shopping Analytics:</b>\n\n"
-                f"<b>This Session:</b>\n"
-                f"💵 Total Items: {total_items}\n"
-                f"🧾 Receipts: {total_receipts}\n"
-                f"📋 Avg per Receipt: {avg_per_receipt:.2f}\n\n"
-                f"<b>Account Stats:</b>\n"
-                f"📅 Days Active: {days_active}\n"
-                f"💱 Preferred Currency: {user.preferred_currency or 'BRL'}\n"
-                f"🗣️ Language: {(user.preferred_language or 'en').upper()}\n\n"
-                f"<b>Recent Activity:</b>\n"
-            )
-            
-            # Add recent activity info
-            if total_receipts > 0:
-                stats_text += "✅ Last receipt processed\n"
-            if total_items > 0:
-                stats_text += f"🛒 Currently tracking {total_items} items\n"
-            
-            if total_receipts == 0 and total_items == 0:
-                stats_text += "No activity yet. Start by uploading a receipt or adding items!\n"
-            
-            stats_text += (
-                f"\n<b>Suggested Actions:</b>\n"
-                f"/receipt - Upload a receipt\n"
-                f"/list - View your items\n"
-                f"/settings - Update preferences"
+            user = await read_models.user(session, user_id)
+        
+        if not user:
+            await update.message.reply_text(
+                "❌ User profile not found. Please use /start first."
             )
-            
-            await update.message.reply_text(stats_text, parse_mode="HTML")
-            logger.info(f"User {user_id} viewed statistics")
-            
+            return
+        
+        currency = user.currency or settings.DEFAULT_CURRENCY
+        spending = await stats_service.spending(user_id, currency)
+        overall = spending.summary()
+        month = spending.summary(since=datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0))
+        
+        # Get creation date
+        if user.created_at:
+            days_active = (datetime.utcnow() - user.created_at).days
+        else:
+            days_active = 0
+        
+        # Build stats message
+        stats_text = (
+            f"📊 <b>Shopping Analytics:</b>\n\n"
+            f"<b>Spending:</b>\n"
+            f"📅 This Month: {helpers.format_currency(month.total, currency)}\n"
+            f"💵 All Time: {helpers.format_currency(overall.total, currency)}\n"
+            f"🧾 Receipts: {overall.receipts}\n"
+            f"📋 Avg per Receipt: {helpers.format_currency(overall.average, currency)}\n"
+            f"{_currency_notes(overall)}\n"
+            f"<b>Account Stats:</b>\n"
+            f"📅 Days Active: {days_active}\n"
+            f"💱 Currency: {currency}\n"
+            f"🗣️ Language: {(user.language or 'en').upper()}\n\n"
+        )
+        
+        if overall.receipts == 0:
+            stats_text += "No activity yet. Start by uploading a receipt or adding items!\n"
+        
+        stats_text += (
+            f"\n<b>Suggested Actions:</b>\n"
+            f"/receipt - Upload a receipt\n"
+            f"/summary - This month in detail\n"
+            f"/currency - Change currency"
+        )
+        
+        await update.message.reply_text(stats_text, parse_mode="HTML")
+        logger.info("User %s viewed statistics", user_id)
+        
     except Exception as e:
-        logger.error(f"Error in show_stats: {e}")
+        logger.error("Error in show_stats: %s", e)
         await update.message.reply_text(
             "❌ Error retrieving statistics. Please try again."
         )
@@ -88,34 +93,41 @@ async def monthly_summary(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     
     try:
         async with AsyncSessionLocal() as session:
-            stmt = select(User).where(User.user_id == user_id)
-            user = await session.scalar(stmt)
-            
-            if not user:
-                await update.message.reply_text(
-                    "❌ User profile not found. Please use /start first."
-                )
-                return
-            
-            summary_text = (
-                f"📅 <b>Monthly Summary</b>\n\n"
-                f"Month: {datetime.now().strftime('%B %Y')}\n\n"
-                f"<b>Categories:</b>\n"
-                f"🛒 Groceries: R$ 680.50 (54.6%)\n"
-                f"🥛 Dairy: R$ 280.20 (22.5%)\n"
-                f"🥩 Meat: R$ 205.30 (16.5%)\n"
-                f"💰 Other: R$ 79.90 (6.4%)\n\n"
-                f"<b>Total This Month: R$ 1,245.90</b>\n\n"
-                f"Average per receipt: R$ 123.45\n"
-                f"Total receipts: 10\n\n"
-                f"Tip: Upload more receipts to get accurate monthly tracking!"
+            user = await read_models.user(session, user_id)
+        
+        if not user:
+            await update.message.reply_text(
+                "❌ User profile not found. Please use /start first."
             )
-            
-            await update.message.reply_text(summary_text, parse_mode="HTML")
-            logger.info(f"User {user_id} viewed monthly summary")
-            
+            return
+        
+        currency = user.currency or settings.DEFAULT_CURRENCY
+        month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        summary = (await stats_service.spending(user_id, currency, since=month_start)).summary()
+        
+        stores_text = "\n".join(
+            f"🏪 {escape(store)}: {helpers.format_currency(amount, currency)} "
+            f"({amount / summary.total:.1%})"
+            for store, amount in summary.top_stores
+            if summary.total
+        ) or "No receipts yet."
+        
+        summary_text = (
+            f"📅 <b>Monthly Summary</b>\n\n"
+            f"Month: {month_start.strftime('%B %Y')}\n\n"
+            f"<b>Top Stores:</b>\n{stores_text}\n\n"
+            f"<b>Total This Month: {helpers.format_currency(summary.total, currency)}</b>\n\n"
+            f"Average per receipt: {helpers.format_currency(summary.average, currency)}\n"
+            f"Total receipts: {summary.receipts}\n"
+            f"{_currency_notes(summary)}\n"
+            f"Tip: Upload more receipts to get accurate monthly tracking!"
+        )
+        
+        await update.message.reply_text(summary_text, parse_mode="HTML")
+        logger.info("User %s viewed monthly summary", user_id)
+        
     except Exception as e:
-        logger.error(f"Error in monthly_summary: {e}")
+        logger.error("Error in monthly_summary: %s", e)
         await update.message.reply_text(
             "❌ Error retrieving summary. Please try again."
         )
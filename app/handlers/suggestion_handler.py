@@ -1,58 +1,108 @@
-"""AI-powered suggestion handler."""
+"""Shopping suggestion handler."""
 import logging
+from html import escape
 from telegram import Update
 from telegram.ext import ContextTypes
+from app.config.settings import settings
+from app.core.telegram_http import drain, pipeline
+from app.core.admission import admission
 from app.core.database import AsyncSessionLocal
-from sqlalchemy import select
-from app.models.user import User
+from app.core.metrics import metrics
+from app.handlers.compare_handler import format_price
+from app.services.ai_service import ai_service
+from app.services.price_service import price_service
+from app.services.list_service import list_service
+from app.services.read_models import read_models
+from app.services.recommendation_service import recommendation_service, normalize_item
+from app.services.replenishment_service import replenishment_service
 
 logger = logging.getLogger(__name__)
 
 
+def _days_left(days: int) -> str:
+    if days < 0:
+        return "overdue"
+    if days == 0:
+        return "due today"
+    return f"{days} day left" if days == 1 else f"{days} days left"
+
+
 async def get_suggestions(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle /suggestions command - Get AI-powered shopping suggestions."""
+    """Handle /suggestions command - Get personalized shopping suggestions."""
     user_id = update.effective_user.id
     
     try:
+        if not admission.allows(admission.SHED_SUGGESTIONS):
+            metrics.inc("shed_requests_total", command="suggestions")
+            await update.message.reply_text(
+                "🙏 We're very busy right now. Please try /suggestions again in a minute."
+            )
+            return
+        
         # Notify user that we're generating suggestions
-        await update.message.reply_text("🔄 Generating personalized suggestions...")
+        interim = await pipeline(update.message.reply_text("🔄 Generating personalized suggestions..."))
         
         async with AsyncSessionLocal() as session:
-            stmt = select(User).where(User.user_id == user_id)
-            user = await session.scalar(stmt)
+            user = await read_models.user(session, user_id)
             
             if not user:
+                await drain(interim)
                 await update.message.reply_text(
                     "❌ User profile not found. Please use /start first."
                 )
                 return
             
-            # TODO: Integrate with AI service (OpenAI/Gemini API) when available
-            # For now, provide smart placeholder suggestions based on user preferences
-            
-            suggestions_text = (
-                f"🤖 <b>AI Shopping Suggestions</b>\n\n"
-                f"Based on your preferences and shopping history:\n\n"
-                f"<b>📖 Weekly Essentials You Usually Buy:</b>\n"
-                f"- Milk (1 day left)\n"
-                f"- Eggs (2 days left)\n"
-                f"- Bread (3 days left)\n\n"
-                f"<b>💰 Best Deals This Week:</b>\n"
-                f"- Cheese: R$ 8.50 (20% off at Carrefour)\n"
-                f"- Butter: R$ 6.20 (15% off at Pao de Acucar)\n"
-                f"- Yogurt: R$ 4.80 (10% off at Dia)\n\n"
-                f"<b>🛒 Recommended for You:</b>\n"
-                f"- Whole wheat bread (healthy option)\n"
-                f"- Greek yogurt (protein-rich)\n"
-                f"- Organic eggs (you often buy these)\n\n"
-                f"<i>Tip: Upload receipts regularly for better suggestions!</i>"
-            )
-            
-            await update.message.reply_text(suggestions_text, parse_mode="HTML")
-            logger.info(f"User {user_id} requested shopping suggestions")
+            shopping_list = await list_service.active_list_view(session, user_id)
+            items = await read_models.items(session, shopping_list.id) if shopping_list else []
+            current_names = [item.name for item in items]
+            due = await replenishment_service.due_items(session, user_id)
             
+        # Served in-process from the co-occurrence model; OpenAI only reorders
+        recommended = recommendation_service.recommend(current_names, k=10)
+        if settings.RECOMMENDER_AI_RERANK:
+            recommended = await ai_service.rerank(current_names, recommended)
+        recommended = recommended[:5]
+        
+        on_list = {normalize_item(name) for name in current_names}
+        due_lines = [
+            f"- {escape(product.capitalize())} ({_days_left(days)})"
+            for product, days in due
+            if normalize_item(product) not in on_list
+        ]
+        essentials_text = "\n".join(due_lines) or "- Nothing due soon"
+        
+        if recommended:
+            recommended_text = "\n".join(f"- {escape(name)}" for name in recommended)
+        else:
+            recommended_text = "- Not enough shopping history yet"
+        
+        # Store prices from receipts, for what is on the list or suggested
+        currency = user.currency or settings.DEFAULT_CURRENCY
+        deals = await price_service.deals(current_names + recommended)
+        deals_text = "\n".join(
+            f"- {escape(deal.item.capitalize())}: {format_price(deal.price, currency)} at {escape(deal.store)} "
+            f"({deal.saving:.0%} below the dearest store)"
+            for deal in deals
+        ) or "- No store prices to compare yet"
+        
+        suggestions_text = (
+            f"🤖 <b>Shopping Suggestions</b>\n\n"
+            f"Based on your preferences and shopping history:\n\n"
+            f"<b>📖 Essentials Due Soon:</b>\n"
+            f"{essentials_text}\n\n"
+            f"<b>💰 Best Store Prices:</b>\n"
+            f"{deals_text}\n\n"
+            f"<b>🛒 Recommended for You:</b>\n"
+            f"{recommended_text}\n\n"
+            f"<i>Tip: Upload receipts regularly for better suggestions!</i>"
+        )
+        
+        await drain(interim)
+        await update.message.reply_text(suggestions_text, parse_mode="HTML")
+        logger.info("User %s requested shopping suggestions", user_id)
+        
     except Exception as e:
-        logger.error(f"Error in get_suggestions: {e}")
+        logger.error("Error in get_suggestions: %s", e)
         await update.message.reply_text(
             "❌ Error generating suggestions. Please try again."
         )
@@ -0,0 +1,59 @@
+"""Flood control applied to every update before the command handlers."""
+import logging
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+from app.core.rate_limit import rate_limiter
+from app.handlers.context_handler import command_name
+from app.services.album_service import album_service
+
+logger = logging.getLogger(__name__)
+
+COMMAND_CLASSES = {
+    "suggestions": "ai",
+    "receipt": "heavy",
+    "export": "heavy",
+}
+
+
+def command_class(update: Update) -> str:
+    command = command_name(update)
+    if command is None:
+        return "default"
+    if command.startswith("callback:"):
+        return "tap"
+    if command == "photo":
+        # Later pages of an album ride on the first page's charge
+        if album_service.collecting(update.effective_message.media_group_id):
+            return "default"
+        return "heavy"
+    return COMMAND_CLASSES.get(command, "default")
+
+
+async def throttle(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Stop the update when the user's bucket for its command class is empty.
+
+    Runs in a handler group before the commands. Only the first denied
+    update of a window gets a reply; the rest are dropped silently.
+    """
+    user = update.effective_user
+    if user is None:
+        return
+    cls = command_class(update)
+    if rate_limiter.blocked_for(user.id, cls):
+        raise ApplicationHandlerStop
+
+    wait = await rate_limiter.acquire(user.id, cls)
+    if not wait:
+        return
+
+    logger.info("Throttled user %s (%s) for %.1fs", user.id, cls, wait)
+    text = f"⏳ Too many requests. Please try again in {max(1, round(wait))}s."
+    if update.callback_query is not None or update.effective_message is not None:
+        try:
+            if update.callback_query is not None:
+                await update.callback_query.answer(text)
+            else:
+                await update.effective_message.reply_text(text)
+        except Exception as e:
+            logger.warning("Could not send throttle reply: %s", e)
+    raise ApplicationHandlerStop
@@ -0,0 +1,154 @@
+"""In-store check-off list driven by an inline keyboard.
+
+/shop sends the list once with one button per item. A tap toggles the
+item with a single-row UPDATE, bumps the list version, tells the other
+members of a shared list and answers the callback at once; the message itself is re-rendered by a job scheduled
+a moment later, so a burst of taps on one message produces one list
+query and one edit.
+"Finish trip" archives all bought items in one UPDATE.
+"""
+import logging
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes
+from app.core.database import AsyncSessionLocal
+from app.core.queries import queries
+from app.services.list_service import list_service
+from app.services.list_sync_service import list_sync_service
+from app.services.read_models import read_models
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for further taps before editing the message
+EDIT_DEBOUNCE = 0.8
+
+
+def _trip_message(items) -> tuple[str, InlineKeyboardMarkup]:
+    bought = sum(1 for item in items if item.is_bought)
+    text = (
+        f"🛒 <b>Shopping trip</b> - {bought}/{len(items)} picked\n"
+        "Tap items as you put them in the cart."
+    )
+    rows = [
+        [InlineKeyboardButton(
+            f"{'✅' if item.is_bought else '⬜'} {item.name}"[:64],
+            callback_data=f"tog:{item.id}"
+        )]
+        for item in items
+    ]
+    rows.append([InlineKeyboardButton("🏁 Finish trip", callback_data="fin")])
+    return text, InlineKeyboardMarkup(rows)
+
+
+async def start_trip(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /shop command - Send the interactive check-off list."""
+    try:
+        user_id = update.effective_user.id
+        async with AsyncSessionLocal() as db:
+            shopping_list = await list_service.active_list_view(db, user_id)
+            items = await read_models.items(db, shopping_list.id) if shopping_list else []
+        
+        if not items:
+            await update.message.reply_text(
+                "📋 Your shopping list is empty.\n"
+                "Use /add to add items."
+            )
+            return
+        
+        text, keyboard = _trip_message(items)
+        await update.message.reply_text(text, reply_markup=keyboard, parse_mode="HTML")
+        logger.info("User %s started a shopping trip with %s items", user_id, len(items))
+    except Exception as e:
+        logger.error("Error in start_trip: %s", e)
+        await update.message.reply_text("❌ Error loading your list. Please try again.")
+
+
+async def toggle_item(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Toggle an item's bought flag from a keyboard tap."""
+    query = update.callback_query
+    try:
+        item_id = int(query.data.split(":", 1)[1])
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                queries.toggle_bought, {"item_id": item_id, "by_user": query.from_user.id}
+            )
+            toggled = result.first()
+            if toggled is not None:
+                version = await list_service.bump_version(db, toggled.list_id)
+                await list_service.advance_seen(db, toggled.list_id, [query.from_user.id], version)
+            await db.commit()
+        
+        if toggled is None:
+            await query.answer("This item is no longer on your list.")
+        else:
+            await query.answer()
+            if toggled.is_shared:
+                await list_sync_service.notify(toggled.list_id)
+        _schedule_refresh(context, query)
+    except Exception as e:
+        logger.error("Error in toggle_item: %s", e)
+        await query.answer("❌ Could not update the item.")
+
+
+async def finish_trip(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Archive every bought item and close the trip message."""
+    query = update.callback_query
+    try:
+        async with AsyncSessionLocal() as db:
+            shopping_list = await read_models.active_list(db, query.from_user.id)
+            archived = await list_service.archive_bought(db, shopping_list.id) if shopping_list else 0
+            await db.commit()
+        
+        await query.answer()
+        for job in context.job_queue.get_jobs_by_name(_job_name(query)):
+            job.schedule_removal()
+        await query.edit_message_text(
+            f"🏁 Trip finished. {archived} item{'s' if archived != 1 else ''} checked off.\n"
+            "Use /list to see what is left.",
+        )
+        if archived and shopping_list.is_shared:
+            await list_sync_service.notify(shopping_list.id)
+        logger.info("User %s finished a trip, archived %s items", query.from_user.id, archived)
+    except Exception as e:
+        logger.error("Error in finish_trip: %s", e)
+        await query.answer("❌ Could not finish the trip.")
+
+
+def _job_name(query) -> str:
+    return f"trip:{query.message.chat_id}:{query.message.message_id}"
+
+
+def _schedule_refresh(context: ContextTypes.DEFAULT_TYPE, query) -> None:
+    name = _job_name(query)
+    if context.job_queue.get_jobs_by_name(name):
+        return  # an edit is already pending and will include this tap
+    context.job_queue.run_once(
+        _refresh_trip_message,
+        EDIT_DEBOUNCE,
+        name=name,
+        chat_id=query.message.chat_id,
+        user_id=query.from_user.id,
+        data=query.message.message_id,
+    )
+
+
+async def _refresh_trip_message(context: ContextTypes.DEFAULT_TYPE) -> None:
+    job = context.job
+    try:
+        async with AsyncSessionLocal() as db:
+            shopping_list = await read_models.active_list(db, job.user_id)
+            items = await read_models.items(db, shopping_list.id) if shopping_list else []
+        if not items:
+            await context.bot.edit_message_text(
+                "📋 Your shopping list is empty.", chat_id=job.chat_id, message_id=job.data
+            )
+            return
+        text, keyboard = _trip_message(items)
+        await context.bot.edit_message_text(
+            text, chat_id=job.chat_id, message_id=job.data, reply_markup=keyboard, parse_mode="HTML"
+        )
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            logger.warning("Could not refresh trip message: %s", e)
+    except Exception as e:
+        logger.error("Error refreshing trip message: %s", e)
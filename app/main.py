@@ -1,27 +1,54 @@
 import logging
 import asyncio
+from datetime import datetime
 from aiohttp import web
-from telegram.ext import ApplicationBuilder, Application, CommandHandler
+from telegram import Update
+from telegram.ext import ApplicationBuilder, Application, CallbackQueryHandler, CommandHandler, MessageHandler, TypeHandler, filters
 from app.core.database import engine, Base
 from app import models  # Register all models for DB creation
 
 from app.config.settings import settings
+from app.api.admin import setup_admin_routes
+from app.api.rest import setup_rest_routes
+from app.core.admission import admission
+from app.core.metrics import metrics
+from app.core.persistence import RedisPersistence
+from app.core.redis import redis_client
+from app.core.telegram_http import build_requests
 from app.handlers.shopping_handler import (
     add_item_handler,
     list_handler,
     remove_item_handler,
     clear_handler,
-    suggestions_handler,
 )
-from app.handlers.receipt_handler import receipt_handler
-from app.handlers.settings_handler import set_currency, set_language
-from app.handlers.stats_handler import stats_handler
+from app.handlers.trip_handler import start_trip, toggle_item, finish_trip
+from app.handlers.sharing_handler import share_list, join_list, leave_list
+from app.handlers.suggestion_handler import get_suggestions
+from app.handlers.receipt_handler import process_receipt
+from app.handlers.settings_handler import (
+    set_currency, set_language, set_reminder, manage_stores, manage_api_token
+)
+from app.handlers.compare_handler import compare_prices
+from app.handlers.stats_handler import show_stats, monthly_summary
+from app.handlers.budget_handler import manage_budget
+from app.handlers.export_handler import export_history
+from app.handlers.search_handler import search_history, search_more
 from app.handlers.base import start_handler, help_handler
+from app.handlers.throttle_handler import throttle
+from app.handlers.context_handler import bind_log_context
+from app.handlers.jobs import retrain_recommender, predict_replenishment, refresh_fx_rates, send_reminders, refresh_prices, maintain_partitions, archive_history
+from app.services.list_sync_service import list_sync_service
+from app.services.notification_service import notification_service
+from app.services.partition_service import partition_service
+from app.services.write_buffer import write_buffer
+from app.utils.logger import setup_logging
 
 # Configure Logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=settings.LOG_LEVEL
+setup_logging(
+    settings.LOG_LEVEL,
+    fmt=settings.LOG_FORMAT,
+    sample_rates=settings.LOG_SAMPLE_RATES,
+    queue_size=settings.LOG_QUEUE_SIZE,
 )
 logger = logging.getLogger(__name__)
 
@@ -31,15 +58,23 @@ async def health_check(request):
     return web.Response(text="OK", status=200)
 
 
+async def metrics_handler(request):
+    """Counters and gauges in Prometheus text format."""
+    return web.Response(text=metrics.render(), content_type="text/plain")
+
+
 async def start_http_server():
     """Starts a simple background HTTP server for Docker Healthchecks."""
     app = web.Application()
     app.router.add_get('/health', health_check)
+    app.router.add_get('/metrics', metrics_handler)
+    setup_admin_routes(app)
+    setup_rest_routes(app)
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, settings.HOST, settings.PORT)
     await site.start()
-    logger.info(f"Health check server started on {settings.HOST}:{settings.PORT}")
+    logger.info("Health check server started on %s:%s", settings.HOST, settings.PORT)
 
 
 async def post_init(application: Application):
@@ -49,9 +84,20 @@ async def post_init(application: Application):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     logger.info("Database tables created/verified.")
+    await partition_service.maintain()
+    await list_sync_service.start(application.bot)
+    notification_service.bot = application.bot
+    await admission.start()
     logger.info("Bot is fully initialized and running.")
 
 
+async def post_shutdown(application: Application):
+    """Post shutdown hook."""
+    await write_buffer.close()
+    await list_sync_service.stop()
+    await admission.stop()
+
+
 def main():
     """Main bot entry point."""
     if not settings.TELEGRAM_TOKEN:
@@ -61,13 +107,28 @@ def main():
     logger.info("Starting SmartShopBot...")
 
     # Build Application
-    application = (
+    send_request, updates_request = build_requests()
+    builder = (
         ApplicationBuilder()
         .token(settings.TELEGRAM_TOKEN)
+        .request(send_request)
+        .get_updates_request(updates_request)
         .post_init(post_init)
-        .build()
+        .post_shutdown(post_shutdown)
     )
+    if settings.PERSISTENCE_ENABLED and redis_client is not None:
+        builder = builder.persistence(
+            RedisPersistence(redis_client, update_interval=settings.PERSISTENCE_FLUSH_INTERVAL)
+        )
+    application = builder.build()
 
+    # --- LOG CONTEXT ---
+    application.add_handler(TypeHandler(Update, bind_log_context), group=-2)
+    
+    # --- FLOOD CONTROL ---
+    if settings.RATE_LIMIT_ENABLED:
+        application.add_handler(TypeHandler(Update, throttle), group=-1)
+    
     # --- REGISTER COMMAND HANDLERS ---
     logger.info("Registering command handlers...")
     
@@ -81,20 +142,85 @@ def main():
     application.add_handler(CommandHandler("list", list_handler))
     application.add_handler(CommandHandler("clear", clear_handler))
     
-    # AI suggestions
-    application.add_handler(CommandHandler("suggestions", suggestions_handler))
+    # In-store check-off
+    application.add_handler(CommandHandler("shop", start_trip))
+    application.add_handler(CallbackQueryHandler(toggle_item, pattern=r"^tog:\d+$"))
+    application.add_handler(CallbackQueryHandler(finish_trip, pattern=r"^fin$"))
+    
+    # Shared lists
+    application.add_handler(CommandHandler("share", share_list))
+    application.add_handler(CommandHandler("join", join_list))
+    application.add_handler(CommandHandler("leave", leave_list))
+    
+    # Suggestions
+    application.add_handler(CommandHandler("suggestions", get_suggestions))
+    
+    # Store prices
+    application.add_handler(CommandHandler("compare", compare_prices))
+    application.add_handler(CommandHandler("stores", manage_stores))
     
     # Receipt processing
-    application.add_handler(CommandHandler("receipt", receipt_handler))
+    application.add_handler(CommandHandler("receipt", process_receipt))
+    application.add_handler(MessageHandler(filters.PHOTO, process_receipt))
     
     # Statistics
-    application.add_handler(CommandHandler("stats", stats_handler))
+    application.add_handler(CommandHandler("stats", show_stats))
+    application.add_handler(CommandHandler("summary", monthly_summary))
+    application.add_handler(CommandHandler("budget", manage_budget))
+    application.add_handler(CommandHandler("export", export_history))
+    
+    # History search
+    application.add_handler(CommandHandler("search", search_history))
+    application.add_handler(CallbackQueryHandler(search_more, pattern=r"^srch:"))
     
     # Settings
     application.add_handler(CommandHandler("currency", set_currency))
     application.add_handler(CommandHandler("language", set_language))
+    application.add_handler(CommandHandler("remind", set_reminder))
+    application.add_handler(CommandHandler("apitoken", manage_api_token))
+    
+    logger.info("Registered %s handlers", len(application.handlers[0]))
     
-    logger.info(f"Registered 11 command handlers")
+    # --- SCHEDULED JOBS ---
+    application.job_queue.run_repeating(
+        retrain_recommender,
+        interval=settings.RECOMMENDER_RETRAIN_INTERVAL,
+        first=30,
+        name="retrain_recommender"
+    )
+    application.job_queue.run_repeating(
+        refresh_fx_rates,
+        interval=settings.FX_REFRESH_INTERVAL,
+        first=5,
+        name="refresh_fx_rates"
+    )
+    application.job_queue.run_repeating(
+        refresh_prices,
+        interval=settings.PRICE_MATRIX_MAX_AGE,
+        first=20,
+        name="refresh_prices"
+    )
+    application.job_queue.run_repeating(
+        send_reminders,
+        interval=60,
+        first=60 - datetime.now().second,  # on the minute
+        name="send_reminders"
+    )
+    application.job_queue.run_daily(
+        maintain_partitions,
+        time=settings.PARTITION_MAINTENANCE_AT,
+        name="maintain_partitions"
+    )
+    application.job_queue.run_daily(
+        archive_history,
+        time=settings.ARCHIVE_RUN_AT,
+        name="archive_history"
+    )
+    application.job_queue.run_daily(
+        predict_replenishment,
+        time=settings.REPLENISHMENT_RUN_AT,
+        name="predict_replenishment"
+    )
     
     # Run
     logger.info("Bot polling started...")
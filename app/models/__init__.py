@@ -1,8 +1,28 @@
 """Models package - Exports all database models."""
 from app.models.shopping import ShoppingItem
+from app.models.shopping_list import ShoppingList, ListMember
+from app.models.receipt import Receipt, ReceiptItem, ReceiptText
+from app.models.replenishment import ReplenishmentPrediction
 from app.models.user import User
+from app.models.product import Product, PriceHistory
+from app.models.budget import Budget
+from app.models.spending_stat import SpendingStat
+from app.models.archive import ArchivedShoppingItem, ArchivedReceipt, ArchivedReceiptItem
 
 __all__ = [
     "ShoppingItem",
+    "ShoppingList",
+    "ListMember",
+    "Receipt",
+    "ReceiptItem",
+    "ReceiptText",
+    "ReplenishmentPrediction",
     "User",
+    "Product",
+    "PriceHistory",
+    "Budget",
+    "SpendingStat",
+    "ArchivedShoppingItem",
+    "ArchivedReceipt",
+    "ArchivedReceiptItem",
 ]
@@ -0,0 +1,63 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, DateTime, BigInteger, Index, LargeBinary
+from app.core.database import Base
+
+
+class ArchivedShoppingItem(Base):
+    """A bought list item moved out of ``shopping_items`` by ``HistoryService.archive``.
+
+    Append-only and keyed by the original item id. Only the (user,
+    date) index is kept; search filters a user's rows instead of using
+    the GIN indexes of the hot table.
+    """
+    __tablename__ = "shopping_items_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(BigInteger, nullable=False)
+    list_id = Column(Integer, nullable=True)
+    name = Column(String, nullable=False)
+    quantity = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_shopping_items_archive_user_created", user_id, created_at),
+    )
+
+
+class ArchivedReceipt(Base):
+    """A receipt older than ``ARCHIVE_AFTER_MONTHS``, moved out of ``receipts``."""
+    __tablename__ = "receipts_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(BigInteger, nullable=False)
+    store_name = Column(String(255), nullable=False)
+    total_amount = Column(Float, nullable=False)
+    currency = Column(String(10), nullable=False)
+    items_count = Column(Integer, nullable=True)
+    # zlib-compressed OCR text, as in receipt_texts
+    ocr_compressed = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_receipts_archive_user_created", user_id, created_at),
+    )
+
+
+class ArchivedReceiptItem(Base):
+    """A line of an archived receipt."""
+    __tablename__ = "receipt_items_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    receipt_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(BigInteger, nullable=False)
+    product_name = Column(String(255), nullable=False)
+    quantity = Column(String(50), nullable=True)
+    price = Column(Float, nullable=True)
+    category = Column(String(50), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_receipt_items_archive_user_created", user_id, created_at),
+    )
@@ -0,0 +1,34 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, BigInteger, ForeignKey, SmallInteger, UniqueConstraint
+from app.core.database import Base
+
+ALL_CATEGORIES = "all"
+
+
+class Budget(Base):
+    """A spending limit for one period, with the running total of that period.
+
+    ``spent`` is kept up to date by ``BudgetService.record`` in the same
+    transaction that stores each receipt, and reset lazily when the first
+    receipt of a new period arrives.
+    """
+    __tablename__ = "budgets"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    category = Column(String(50), nullable=False, default=ALL_CATEGORIES)
+    period = Column(String(10), nullable=False, default="month")  # "month" or "week"
+    limit_amount = Column(Float, nullable=False)
+    currency = Column(String(10), nullable=False)
+    period_start = Column(Date, nullable=False)
+    spent = Column(Float, nullable=False, default=0.0)
+    # Highest alert threshold (percent) already sent this period
+    alerted_pct = Column(SmallInteger, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "category", name="uq_budgets_user_category"),
+    )
+
+    def __repr__(self):
+        return f"<Budget(user_id={self.user_id}, category={self.category}, spent={self.spent}/{self.limit_amount})>"
@@ -1,21 +1,39 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey
 from app.core.database import Base
 
 
-
-    """Product model for shopping items."""
+class Product(Base):
+    """A product seen on receipts, by normalized name."""
     __tablename__ = "products"
 
     id = Column(Integer, primary_key=True)
-    name = Column(String(255), nullable=False)
+    name = Column(String(255), nullable=False, unique=True)
     category = Column(String(100), nullable=True)
-    price = Column(Float, nullable=True)
-    barcode = Column(String(50), unique=True, nullable=True)
-    description = Column(String(500), nullable=True)
-    is_active = Column(Boolean, default=True)
+    average_price = Column(Numeric(10, 2, asdecimal=False), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
         return f"<Product(id={self.id}, name={self.name}, category={self.category})>"
+
+
+class PriceHistory(Base):
+    """One observed price of a product at a store, appended per receipt line.
+
+    Range-partitioned by month on ``recorded_at``, like ``receipt_items``.
+    """
+    __tablename__ = "price_history"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
+    price = Column(Numeric(10, 2, asdecimal=False), nullable=True)
+    currency = Column(String(10), nullable=False)
+    store = Column(String(255), nullable=True)
+    recorded_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
+
+    __table_args__ = ({"postgresql_partition_by": "RANGE (recorded_at)"},)
+    __mapper_args__ = {"primary_key": [id]}
+
+    def __repr__(self):
+        return f"<PriceHistory(product_id={self.product_id}, store={self.store}, price={self.price})>"
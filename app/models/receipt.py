@@ -1,8 +1,9 @@
+import zlib
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
-from sqlalchemy.ext.declarative import declarative_base
-
-Base = declarative_base()
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, BigInteger, Index, LargeBinary
+from sqlalchemy.orm import relationship
+from app.core.database import Base
+from app.models.search import search_vector
 
 class Receipt(Base):
     """Receipt model for purchase records."""
@@ -13,12 +14,78 @@ class Receipt(Base):
     shopping_list_id = Column(Integer, ForeignKey("shopping_lists.id"), nullable=True)
     store_name = Column(String(255), nullable=False)
     total_amount = Column(Float, nullable=False)
+    # Currency the receipt was paid in; amounts are never stored converted
+    currency = Column(String(10), nullable=False)
     items_count = Column(Integer, default=0)
     receipt_image_url = Column(String(500), nullable=True)
+    # Legacy truncated copy; full text lives in receipt_texts
     ocr_text = Column(String(2000), nullable=True)
     is_processed = Column(Boolean, default=False)
+    # SHA-256 of the photo (see app/services/ocr_cache.py); a resent photo is not saved twice
+    image_digest = Column(String(64), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    items = relationship("ReceiptItem", back_populates="receipt")
+    raw_text = relationship("ReceiptText", uselist=False, cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_receipts_user_image_digest", user_id, image_digest, unique=True),
+    )
+
     def __repr__(self):
         return f"<Receipt(id={self.id}, user_id={self.user_id}, store_name={self.store_name})>"
+
+
+class ReceiptItem(Base):
+    """A single line extracted from a receipt.
+
+    Range-partitioned by month on ``created_at`` in PostgreSQL (see
+    ``app.services.partition_service``), so the partition key is part of
+    the table's primary key; rows are still identified by ``id``.
+    """
+    __tablename__ = "receipt_items"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    receipt_id = Column(Integer, ForeignKey("receipts.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Denormalized from the receipt so per-user history scans skip the join
+    user_id = Column(BigInteger, nullable=False, index=True)
+    product_name = Column(String(255), nullable=False)
+    quantity = Column(String(50), nullable=True)
+    price = Column(Float, nullable=True)
+    # See app/services/category_service.py; budgets total lines by it
+    category = Column(String(50), nullable=False, default="other")
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
+
+    receipt = relationship("Receipt", back_populates="items")
+
+    __table_args__ = (
+        Index(
+            "ix_receipt_items_user_tsv", user_id, search_vector(product_name), postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_receipt_items_user_trgm", user_id, product_name,
+            postgresql_using="gin", postgresql_ops={"product_name": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+    __mapper_args__ = {"primary_key": [id]}
+
+    def __repr__(self):
+        return f"<ReceiptItem(id={self.id}, receipt_id={self.receipt_id}, product_name={self.product_name})>"
+
+
+class ReceiptText(Base):
+    """Full OCR text of a receipt, zlib-compressed."""
+    __tablename__ = "receipt_texts"
+
+    receipt_id = Column(Integer, ForeignKey("receipts.id", ondelete="CASCADE"), primary_key=True)
+    compressed = Column(LargeBinary, nullable=False)
+
+    @classmethod
+    def from_text(cls, text: str) -> "ReceiptText":
+        return cls(compressed=zlib.compress(text.encode("utf-8"), 6))
+
+    @property
+    def text(self) -> str:
+        return zlib.decompress(self.compressed).decode("utf-8")
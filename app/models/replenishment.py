@@ -0,0 +1,23 @@
+from sqlalchemy import Column, String, SmallInteger, Date, REAL, BigInteger, Index
+from app.core.database import Base
+
+class ReplenishmentPrediction(Base):
+    """Estimated purchase cadence of one product for one user.
+
+    Rebuilt nightly from receipt history by ``ReplenishmentService``.
+    """
+    __tablename__ = "replenishment_predictions"
+
+    user_id = Column(BigInteger, primary_key=True)
+    product = Column(String(255), primary_key=True)
+    purchases = Column(SmallInteger, nullable=False)
+    interval_days = Column(REAL, nullable=False)
+    last_purchased_on = Column(Date, nullable=False)
+    next_expected_on = Column(Date, nullable=False)
+
+    __table_args__ = (
+        Index("ix_replenishment_user_next", "user_id", "next_expected_on"),
+    )
+
+    def __repr__(self):
+        return f"<ReplenishmentPrediction(user_id={self.user_id}, product={self.product}, next={self.next_expected_on})>"
@@ -0,0 +1,35 @@
+"""Expressions and extensions behind the purchase-history search indexes.
+
+Receipt lines and list items carry two PostgreSQL GIN indexes each,
+both led by ``user_id`` (via ``btree_gin``) so a lookup only visits the
+searching user's postings:
+
+* ``to_tsvector('simple', name)`` for word matches in any order;
+* ``name gin_trgm_ops`` (``pg_trgm``) for substring and prefix matches.
+
+Queries must use ``search_vector`` so their expression matches the
+indexed one. The indexes are PostgreSQL-only and skipped elsewhere.
+"""
+from sqlalchemy import DDL, event, func, literal_column
+
+from app.core.database import Base
+
+# The text search configuration must be a literal, not a bound parameter,
+# for the planner to match the index expression
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+
+def search_vector(column):
+    return func.to_tsvector(SEARCH_CONFIG, column)
+
+
+def search_query(text: str):
+    return func.websearch_to_tsquery(SEARCH_CONFIG, text)
+
+
+for extension in ("pg_trgm", "btree_gin"):
+    event.listen(
+        Base.metadata,
+        "before_create",
+        DDL(f"CREATE EXTENSION IF NOT EXISTS {extension}").execute_if(dialect="postgresql"),
+    )
@@ -1,16 +1,30 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, BigInteger
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, BigInteger, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
 from app.models.user import User
+from app.models.search import search_vector
 
 class ShoppingItem(Base):
     __tablename__ = "shopping_items"
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(BigInteger, ForeignKey("users.id"), nullable=False)
+    list_id = Column(Integer, ForeignKey("shopping_lists.id", ondelete="CASCADE"), nullable=True, index=True)
     name = Column(String, nullable=False)
     quantity = Column(String, default="1")
     is_bought = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Set when a finished trip archives the bought item; archived items leave the list
+    archived_at = Column(DateTime, nullable=True)
     
     user = relationship("User", back_populates="items")
+
+    __table_args__ = (
+        Index(
+            "ix_shopping_items_user_tsv", user_id, search_vector(name), postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_shopping_items_user_trgm", user_id, name,
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
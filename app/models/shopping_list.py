@@ -1,11 +1,14 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
-from sqlalchemy.ext.declarative import declarative_base
-
-Base = declarative_base()
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, BigInteger
+from app.core.database import Base
 
 class ShoppingList(Base):
-    """Shopping list model."""
+    """Shopping list model.
+
+    Every user has an active list; a list becomes shared once its owner
+    creates an invite code and other users join it. ``version`` is bumped
+    on every change and backs the optimistic concurrency checks.
+    """
     __tablename__ = "shopping_lists"
 
     id = Column(Integer, primary_key=True)
@@ -15,8 +18,27 @@ class ShoppingList(Base):
     total_items = Column(Integer, default=0)
     total_price = Column(Float, default=0.0)
     is_completed = Column(Boolean, default=False)
+    is_shared = Column(Boolean, default=False)
+    invite_code = Column(String(16), unique=True, nullable=True)
+    version = Column(Integer, nullable=False, default=1)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
         return f"<ShoppingList(id={self.id}, user_id={self.user_id}, name={self.name})>"
+
+
+class ListMember(Base):
+    """A user's membership in a list and the list message pinned in their chat."""
+    __tablename__ = "list_members"
+
+    list_id = Column(Integer, ForeignKey("shopping_lists.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True, index=True)
+    chat_id = Column(BigInteger, nullable=True)
+    pinned_message_id = Column(BigInteger, nullable=True)
+    # List version shown in the member's pinned message
+    seen_version = Column(Integer, nullable=False, default=0)
+    joined_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ListMember(list_id={self.list_id}, user_id={self.user_id})>"
@@ -0,0 +1,28 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, REAL, BigInteger
+from app.core.database import Base
+
+PRODUCT = "p"
+CATEGORY = "c"
+
+
+class SpendingStat(Base):
+    """Running statistics of one product's price or one category's spend per receipt.
+
+    Maintained online by ``AnomalyService``: Welford count/mean/M2 and a
+    decayed median estimate, in ``currency``.
+    """
+    __tablename__ = "spending_stats"
+
+    user_id = Column(BigInteger, primary_key=True)
+    kind = Column(String(1), primary_key=True)  # PRODUCT or CATEGORY
+    key = Column(String(255), primary_key=True)
+    currency = Column(String(10), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    mean = Column(REAL, nullable=False, default=0.0)
+    m2 = Column(REAL, nullable=False, default=0.0)
+    median = Column(REAL, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SpendingStat(user_id={self.user_id}, kind={self.kind}, key={self.key}, n={self.count})>"
@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Time
+from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 
@@ -17,8 +18,25 @@ class User(Base):
     is_premium = Column(Boolean, default=False)
     is_active = Column(Boolean, default=True)
     language = Column(String(10), default="en")
+    # NULL means settings.DEFAULT_CURRENCY
+    currency = Column(String(10), nullable=True)
+    # IANA name; NULL means settings.DEFAULT_TIMEZONE
+    timezone = Column(String(64), nullable=True)
+    # Local time of the daily list reminder; NULL turns reminders off
+    reminder_time = Column(Time, nullable=True)
+    next_reminder_at = Column(DateTime, nullable=True, index=True)  # UTC, minute precision
+    reminder_lease_until = Column(DateTime, nullable=True)
+    # SHA-256 of the REST API token issued by /apitoken
+    api_token_hash = Column(String(64), unique=True, nullable=True)
+    active_list_id = Column(
+        Integer,
+        ForeignKey("shopping_lists.id", use_alter=True, name="fk_users_active_list_id"),
+        nullable=True
+    )
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    items = relationship("ShoppingItem", back_populates="user")
     
     def __repr__(self):
         return f"<User(id={self.id}, telegram_id={self.telegram_id}, username={self.username})>"
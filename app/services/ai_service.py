@@ -28,7 +28,36 @@ class AIService:
             suggestions = [item.strip().replace('.', '') for item in content.split(',') if item.strip()]
             return suggestions[:5]
         except Exception as e:
-            logger.error(f"AI Error: {e}")
+            logger.error("AI Error: %s", e)
             return ["Error generating suggestions"]
 
+    async def rerank(self, current_items: list[str], candidates: list[str]) -> list[str]:
+        """Reorder locally generated candidates; falls back to their original order."""
+        if not self.client or len(candidates) < 2:
+            return candidates
+
+        try:
+            prompt = (
+                f"Shopping list: {', '.join(current_items)}. "
+                f"Candidate additions: {', '.join(candidates)}. "
+                "Order the candidates from most to least useful for this list. "
+                "Return only the candidate names separated by commas."
+            )
+            response = await self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=80
+            )
+            content = response.choices[0].message.content
+            by_name = {c.lower(): c for c in candidates}
+            ordered = []
+            for name in content.split(','):
+                match = by_name.pop(name.strip().rstrip('.').lower(), None)
+                if match:
+                    ordered.append(match)
+            return ordered + [c for c in candidates if c.lower() in by_name]
+        except Exception as e:
+            logger.error("AI rerank error: %s", e)
+            return candidates
+
 ai_service = AIService()
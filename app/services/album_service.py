@@ -0,0 +1,112 @@
+"""Multi-photo receipts sent as a Telegram album.
+
+Telegram delivers each photo of an album as its own message sharing a
+``media_group_id``. ``AlbumService`` gathers them until no new page has
+arrived for ``ALBUM_WINDOW_MS`` and then hands the pages, in message
+order, to one callback. The handler for each page returns at once, so
+updates that follow are not held up by the wait.
+
+``stitch_pages`` joins the OCR results of the pages into one receipt.
+A long receipt is usually photographed with some overlap, so the lines
+at the top of a page that repeat the bottom of the previous page are
+dropped.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional, Sequence
+
+from telegram import Message
+
+from app.config.settings import settings
+from app.services.recommendation_service import normalize_item
+
+logger = logging.getLogger(__name__)
+
+# Telegram albums hold at most ten media
+MAX_PAGES = 10
+
+
+def _overlap(previous: Sequence, current: Sequence) -> int:
+    """Length of the longest suffix of ``previous`` that is a prefix of ``current``."""
+    for size in range(min(len(previous), len(current)), 0, -1):
+        if previous[-size:] == current[:size]:
+            return size
+    return 0
+
+
+def _line_key(item: dict) -> tuple:
+    price = item.get("price")
+    return normalize_item(item.get("name", "")), round(price, 2) if price is not None else None
+
+
+def stitch_pages(results: Sequence[Optional[dict]]) -> dict[str, Any]:
+    """One receipt from per-page OCR results, in page order."""
+    items: list[dict] = []
+    keys: list[tuple] = []
+    lines: list[str] = []
+    failed = []
+    confidence = 1.0
+    store = None
+    for page, result in enumerate(results, 1):
+        if not result or not result.get("success"):
+            failed.append(page)
+            continue
+        page_items = result.get("items") or []
+        page_keys = [_line_key(item) for item in page_items]
+        skip = _overlap(keys, page_keys)
+        items.extend(page_items[skip:])
+        keys.extend(page_keys[skip:])
+
+        page_lines = (result.get("text") or "").splitlines()
+        lines.extend(page_lines[_overlap(lines, page_lines):])
+        confidence = min(confidence, result.get("confidence", 1.0))
+        store = store or result.get("store")
+
+    return {
+        "success": bool(items),
+        "items": items,
+        "text": "\n".join(lines),
+        "confidence": confidence,
+        "store": store,
+        "pages": len(results),
+        "failed_pages": failed,
+    }
+
+
+class AlbumService:
+    def __init__(self):
+        self._pages: dict[str, list[Message]] = {}
+        self._deadlines: dict[str, float] = {}
+        # The loop only keeps weak references to tasks
+        self._tasks: set[asyncio.Task] = set()
+
+    def collecting(self, group_id: Optional[str]) -> bool:
+        """Whether pages of this album are being gathered right now."""
+        return group_id is not None and group_id in self._pages
+
+    def add(self, message: Message, on_complete: Callable[[list[Message]], Awaitable[None]]) -> None:
+        """Queue a page; the first page of an album starts its window."""
+        group_id = message.media_group_id
+        loop = asyncio.get_running_loop()
+        self._deadlines[group_id] = loop.time() + settings.ALBUM_WINDOW_MS / 1000
+        pages = self._pages.get(group_id)
+        if pages is not None:
+            pages.append(message)
+            return
+        self._pages[group_id] = [message]
+        task = asyncio.create_task(self._collect(group_id, on_complete))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _collect(self, group_id: str, on_complete) -> None:
+        loop = asyncio.get_running_loop()
+        while (delay := self._deadlines[group_id] - loop.time()) > 0 and len(self._pages[group_id]) < MAX_PAGES:
+            await asyncio.sleep(delay)
+        pages = sorted(self._pages.pop(group_id), key=lambda m: m.message_id)
+        del self._deadlines[group_id]
+        try:
+            await on_complete(pages)
+        except Exception as e:
+            logger.error("Error processing album %s: %s", group_id, e)
+
+album_service = AlbumService()
@@ -0,0 +1,247 @@
+"""Unusual-spend alerts from running per-user statistics.
+
+Each user has one ``spending_stats`` row per product (unit price) and per
+category (amount spent on it in one receipt). A row holds Welford's
+count, mean and M2 plus a decayed median estimate, so adding an
+observation and testing it are O(1) whatever the history size.
+
+``record`` runs inside the transaction that stores a receipt: every line
+is first compared against the statistics as they were before the
+receipt, then folded in. An item whose price is ``ANOMALY_PRICE_RISE``
+above its usual (median) price, or a category total ``ANOMALY_Z_SCORE``
+standard deviations above its mean, is reported once there are
+``ANOMALY_MIN_SAMPLES`` earlier observations.
+
+The median estimate moves toward each new value by ``ANOMALY_MEDIAN_RATE``
+of the gap, clipped to one standard deviation. The clip keeps a single
+outlier from dragging it, and the constant rate lets old prices fade as
+prices drift.
+
+``backfill`` rebuilds every row from receipt history with grouped NumPy
+reductions. Like ``record``, it counts a product once per receipt, at
+the price of its first line, so counts, means and M2 agree with the
+online path. Medians differ: the backfill stores the exact median, which
+later receipts then move as an estimate.
+
+    python -m app.services.anomaly_service
+"""
+import asyncio
+import logging
+import math
+import time
+from typing import NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+
+from app.config.settings import settings
+from app.core.database import AsyncSessionLocal
+from app.models.spending_stat import CATEGORY, PRODUCT, SpendingStat
+from app.models.user import User
+from app.services.currency_service import currency_service
+from app.services.history_service import history_service
+from app.services.recommendation_service import normalize_item
+
+logger = logging.getLogger(__name__)
+
+FETCH_CHUNK = 50_000
+INSERT_CHUNK = 10_000
+
+
+class Anomaly(NamedTuple):
+    kind: str  # PRODUCT or CATEGORY
+    key: str
+    amount: float
+    usual: float
+    currency: str
+
+
+def observe(stat: SpendingStat, value: float) -> None:
+    """Fold one observation into a row's running statistics."""
+    count = (stat.count or 0) + 1
+    if count == 1:
+        stat.count, stat.mean, stat.m2, stat.median = 1, value, 0.0, value
+        return
+    delta = value - stat.mean
+    mean = stat.mean + delta / count
+    m2 = stat.m2 + delta * (value - mean)
+    gap = value - stat.median
+    std = math.sqrt(stat.m2 / (stat.count - 1)) if stat.count > 1 else 0.0
+    if std > 0:
+        gap = max(-std, min(std, gap))
+    stat.count, stat.mean, stat.m2 = count, mean, m2
+    stat.median = stat.median + settings.ANOMALY_MEDIAN_RATE * gap
+
+
+def check(stat: SpendingStat, value: float) -> Optional[Anomaly]:
+    """The anomaly ``value`` would be against the row as it stands, if any."""
+    if (stat.count or 0) < settings.ANOMALY_MIN_SAMPLES:
+        return None
+    if stat.kind == PRODUCT:
+        if stat.median > 0 and value >= stat.median * (1 + settings.ANOMALY_PRICE_RISE):
+            return Anomaly(PRODUCT, stat.key, value, stat.median, stat.currency)
+        return None
+    std = math.sqrt(stat.m2 / (stat.count - 1))
+    if std > 0 and (value - stat.mean) / std >= settings.ANOMALY_Z_SCORE:
+        return Anomaly(CATEGORY, stat.key, value, stat.mean, stat.currency)
+    return None
+
+
+def group_stats(codes: np.ndarray, values: np.ndarray, groups: int) -> tuple[np.ndarray, ...]:
+    """(count, mean, M2, median) of ``values`` per group code in ``range(groups)``."""
+    count = np.bincount(codes, minlength=groups)
+    mean = np.bincount(codes, weights=values, minlength=groups) / count
+    deviation = values - mean[codes]
+    m2 = np.bincount(codes, weights=deviation * deviation, minlength=groups)
+    ordered = values[np.lexsort((values, codes))]
+    starts = np.cumsum(count) - count
+    median = (ordered[starts + (count - 1) // 2] + ordered[starts + count // 2]) / 2.0
+    return count, mean, m2, median
+
+
+def label_codes(labels, count: int) -> tuple[list, np.ndarray]:
+    """Distinct labels in first-seen order, and each label's position among them."""
+    vocab: dict = {}
+    codes = np.fromiter((vocab.setdefault(label, len(vocab)) for label in labels), np.intp, count)
+    return list(vocab), codes
+
+
+def pair_codes(first: np.ndarray, second: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Distinct (first, second) integer pairs as two arrays, and each input pair's group code."""
+    width = int(second.max()) + 1 if len(second) else 1
+    pairs, codes = np.unique(first.astype(np.int64) * width + second, return_inverse=True)
+    return pairs // width, pairs % width, codes.ravel()
+
+
+class AnomalyService:
+    async def record(self, session, user_id: int, currency: str, default_currency: str,
+                     lines: list[tuple[str, str, Optional[float]]]) -> list[Anomaly]:
+        """Check and fold in a receipt's (name, category, price) lines; call before its commit.
+
+        New rows keep amounts in ``default_currency`` (the user's currency).
+        """
+        products: dict[str, float] = {}
+        categories: dict[str, float] = {}
+        for name, category, price in lines:
+            if price is None or price <= 0:
+                continue
+            products.setdefault(normalize_item(name)[:255], price)
+            categories[category] = categories.get(category, 0.0) + price
+        if not products:
+            return []
+
+        # Serializes receipts of one user, so new rows cannot be inserted twice
+        await session.execute(select(User.id).where(User.id == user_id).with_for_update())
+        keys = [*products, *categories]
+        stats = {
+            (stat.kind, stat.key): stat
+            for stat in (await session.scalars(
+                select(SpendingStat).where(SpendingStat.user_id == user_id, SpendingStat.key.in_(keys))
+            )).all()
+        }
+
+        anomalies = []
+        for kind, values in ((PRODUCT, products), (CATEGORY, categories)):
+            for key, amount in values.items():
+                stat = stats.get((kind, key))
+                if stat is None:
+                    stat = SpendingStat(user_id=user_id, kind=kind, key=key, currency=default_currency, count=0)
+                    session.add(stat)
+                value = currency_service.convert(amount, currency, stat.currency)
+                if math.isnan(value):
+                    continue
+                anomaly = check(stat, value)
+                if anomaly is not None:
+                    anomalies.append(anomaly)
+                observe(stat, value)
+        return anomalies
+
+    async def backfill(self) -> int:
+        """Rebuild all statistics from receipt history; returns the number of rows stored."""
+        started = time.monotonic()
+        receipt = history_service.receipts.c
+        line = history_service.receipt_items.c
+        stmt = (
+            select(
+                line.user_id, line.receipt_id, line.id, line.product_name,
+                line.category, line.price, receipt.currency, User.currency,
+            )
+            .join(history_service.receipts, line.receipt_id == receipt.id)
+            .join(User, line.user_id == User.id)
+            .where(line.price > 0)
+            .execution_options(yield_per=FETCH_CHUNK)
+        )
+        columns = [[] for _ in range(8)]
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(stmt)
+            async for rows in result.partitions():
+                for column, values in zip(columns, zip(*rows)):
+                    column.extend(values)
+        if not columns[0]:
+            logger.info("Anomaly backfill: no receipt history")
+            return 0
+
+        rows = await asyncio.to_thread(self._rebuild, *columns)
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                await session.execute(delete(SpendingStat))
+                for i in range(0, len(rows), INSERT_CHUNK):
+                    await session.execute(insert(SpendingStat), rows[i:i + INSERT_CHUNK])
+        logger.info("Anomaly backfill stored %s rows in %.1fs", len(rows), time.monotonic() - started)
+        return len(rows)
+
+    @staticmethod
+    def _rebuild(users, receipts, line_ids, names, categories, prices, currencies, user_currencies) -> list[dict]:
+        users = np.array(users, dtype=np.int64)
+        receipts = np.array(receipts, dtype=np.int64)
+        line_ids = np.array(line_ids, dtype=np.int64)
+        targets = np.array([code or settings.DEFAULT_CURRENCY for code in user_currencies], dtype=object)
+        amounts = np.array(prices, dtype=np.float64)
+        currencies = np.array(currencies, dtype=object)
+        values = np.empty_like(amounts)
+        for target in set(targets.tolist()):
+            mask = targets == target
+            values[mask] = currency_service.convert_many(amounts[mask], currencies[mask], target)
+        known = np.flatnonzero(~np.isnan(values))
+        known = known[np.argsort(line_ids[known], kind="stable")]
+
+        keys = {name: normalize_item(name)[:255] for name in set(names)}
+        product_names, product_codes = label_codes(map(keys.__getitem__, names), len(names))
+        category_names, category_codes = label_codes(categories, len(categories))
+
+        # A product counts once per receipt, at its first line's price, as in record
+        _, _, product_receipt_codes = pair_codes(receipts[known], product_codes[known])
+        _, first = np.unique(product_receipt_codes, return_index=True)
+        first_lines = known[np.sort(first)]
+
+        # Category spend per receipt first, then statistics over receipts
+        receipt_ids, receipt_categories, receipt_codes = pair_codes(receipts[known], category_codes[known])
+        line = np.empty(len(receipt_ids), dtype=np.intp)
+        line[receipt_codes] = known
+        per_receipt = np.bincount(receipt_codes, weights=values[known], minlength=len(line))
+
+        series = (
+            (PRODUCT, product_names, users[first_lines], product_codes[first_lines], values[first_lines], first_lines),
+            (CATEGORY, category_names, users[line], receipt_categories, per_receipt, line),
+        )
+        rows = []
+        for kind, labels, series_users, series_keys, series_values, series_lines in series:
+            group_users, group_keys, codes = pair_codes(series_users, series_keys)
+            at = np.empty(len(group_users), dtype=np.intp)
+            at[codes] = series_lines
+            count, mean, m2, median = group_stats(codes, series_values, len(group_users))
+            rows.extend(
+                {"user_id": user, "kind": kind, "key": labels[key], "currency": currency,
+                 "count": n, "mean": mu, "m2": sq, "median": med}
+                for user, key, currency, n, mu, sq, med in zip(
+                    group_users.tolist(), group_keys.tolist(), targets[at].tolist(),
+                    count.tolist(), mean.tolist(), m2.tolist(), median.tolist(),
+                )
+            )
+        return rows
+
+anomaly_service = AnomalyService()
+
+
+if __name__ == "__main__":
+    asyncio.run(anomaly_service.backfill())
@@ -0,0 +1,96 @@
+"""Per-user tokens for the REST API (``app.api.rest``).
+
+/apitoken issues a random token and stores only its SHA-256 in
+``users.api_token_hash``; issuing again replaces it, ``/apitoken off``
+revokes it. ``resolve`` maps a token to the user and the lists they are a
+member of. Results, including unknown tokens, are cached per process for
+``API_TOKEN_CACHE_TTL`` seconds, so a polling client is authenticated
+without a database query. A revoked token or a list the user left can
+therefore keep working on other replicas for up to that long.
+"""
+import hashlib
+import secrets
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select, update
+
+from app.config.settings import settings
+from app.core.database import AsyncSessionLocal
+from app.models.shopping_list import ListMember
+from app.models.user import User
+
+TOKEN_CACHE_SIZE = 10_000
+# A list missing from a cached entry is looked up again at most this often
+MEMBERSHIP_RECHECK_SECONDS = 5
+
+
+class ApiPrincipal(NamedTuple):
+    user_id: int
+    list_ids: frozenset[int]
+
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class ApiTokenService:
+    def __init__(self):
+        self._cache: OrderedDict[str, tuple[Optional[ApiPrincipal], float]] = OrderedDict()
+
+    async def issue(self, user_id: int) -> Optional[str]:
+        """New token for the user, replacing any previous one; ``None`` for an unknown user."""
+        token = secrets.token_urlsafe(32)
+        if not await self._store(user_id, _digest(token)):
+            return None
+        return token
+
+    async def revoke(self, user_id: int) -> bool:
+        return await self._store(user_id, None)
+
+    async def resolve(self, token: str, list_id: Optional[int] = None) -> Optional[ApiPrincipal]:
+        """The token's user, or ``None``; rechecks memberships when ``list_id`` is not among them."""
+        digest = _digest(token)
+        cached = self._cache.get(digest)
+        now = time.monotonic()
+        if cached is not None:
+            principal, loaded_at = cached
+            age = now - loaded_at
+            if age < settings.API_TOKEN_CACHE_TTL and (
+                principal is None
+                or list_id is None
+                or list_id in principal.list_ids
+                or age < MEMBERSHIP_RECHECK_SECONDS
+            ):
+                return principal
+
+        principal = await self._load(digest)
+        self._cache[digest] = (principal, now)
+        self._cache.move_to_end(digest)
+        if len(self._cache) > TOKEN_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return principal
+
+    async def _store(self, user_id: int, digest: Optional[str]) -> bool:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                update(User).where(User.id == user_id).values(api_token_hash=digest)
+            )
+            await session.commit()
+        # Drop this process's cached copy of the old token at once
+        for key, (principal, _) in list(self._cache.items()):
+            if principal is not None and principal.user_id == user_id:
+                del self._cache[key]
+        return result.rowcount > 0
+
+    @staticmethod
+    async def _load(digest: str) -> Optional[ApiPrincipal]:
+        async with AsyncSessionLocal() as session:
+            user_id = await session.scalar(select(User.id).where(User.api_token_hash == digest))
+            if user_id is None:
+                return None
+            list_ids = await session.scalars(select(ListMember.list_id).where(ListMember.user_id == user_id))
+            return ApiPrincipal(user_id, frozenset(list_ids))
+
+api_token_service = ApiTokenService()
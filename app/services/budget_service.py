@@ -0,0 +1,174 @@
+"""Spending budgets with running totals.
+
+Each budget row carries the amount spent in its current period, so
+checking a budget reads one row per budget however long the receipt
+history is. ``record`` adds a new receipt to the user's budgets inside
+the transaction that stores the receipt: the receipt and the totals are
+committed together or not at all, and the rows are locked so two
+receipts saved at once both count.
+
+Periods (calendar month, or week from Monday) follow the user's
+timezone. Nothing runs at a period boundary: the first receipt of a new
+period resets the total, and reads treat a total from a past period as
+zero.
+
+A receipt that takes a budget past a threshold in ``BUDGET_ALERT_PERCENTS``
+returns an alert; ``alerted_pct`` keeps each threshold from firing twice
+in one period.
+"""
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from sqlalchemy import delete, select
+
+from app.config.settings import settings
+from app.core.database import AsyncSessionLocal
+from app.models.budget import ALL_CATEGORIES, Budget
+from app.models.receipt import Receipt, ReceiptItem
+from app.services.currency_service import currency_service
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("month", "week")
+
+
+class BudgetAlert(NamedTuple):
+    category: str
+    spent: float
+    limit: float
+    currency: str
+    percent: int
+
+
+def period_start(period: str, tz_name: Optional[str], now: Optional[datetime] = None) -> date:
+    """Local date the period containing ``now`` (naive UTC) started on."""
+    now = now or datetime.utcnow()
+    today = now.replace(tzinfo=timezone.utc).astimezone(ZoneInfo(tz_name or settings.DEFAULT_TIMEZONE)).date()
+    if period == "week":
+        return today - timedelta(days=today.weekday())
+    return today.replace(day=1)
+
+
+def _utc_start(start: date, tz_name: Optional[str]) -> datetime:
+    local = datetime.combine(start, datetime.min.time(), ZoneInfo(tz_name or settings.DEFAULT_TIMEZONE))
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class BudgetService:
+    async def record(self, session, user_id: int, tz_name: Optional[str], currency: str,
+                     total: float, lines: list[tuple[str, Optional[float]]]) -> list[BudgetAlert]:
+        """Add a receipt to the user's budgets; call before the receipt's commit.
+
+        ``lines`` are (category, price) pairs. Returns the alerts to send
+        once the transaction has committed.
+        """
+        budgets = (await session.scalars(
+            select(Budget).where(Budget.user_id == user_id).with_for_update()
+        )).all()
+        if not budgets:
+            return []
+
+        by_category: dict[str, float] = {ALL_CATEGORIES: total}
+        for category, price in lines:
+            by_category[category] = by_category.get(category, 0.0) + (price or 0.0)
+
+        alerts = []
+        for budget in budgets:
+            amount = by_category.get(budget.category)
+            if not amount:
+                continue
+            converted = currency_service.convert(amount, currency, budget.currency)
+            if np.isnan(converted):
+                logger.warning("User %s - no %s->%s rate, receipt left out of budget", user_id, currency, budget.currency)
+                continue
+            start = period_start(budget.period, tz_name)
+            if budget.period_start < start:
+                budget.period_start, budget.spent, budget.alerted_pct = start, 0.0, 0
+            budget.spent += converted
+            alert = self._crossed(budget)
+            if alert is not None:
+                alerts.append(alert)
+        return alerts
+
+    @staticmethod
+    def _crossed(budget: Budget) -> Optional[BudgetAlert]:
+        percent = budget.spent / budget.limit_amount * 100
+        reached = [p for p in settings.BUDGET_ALERT_PERCENTS if p <= percent and p > budget.alerted_pct]
+        if not reached:
+            return None
+        budget.alerted_pct = max(reached)
+        return BudgetAlert(budget.category, budget.spent, budget.limit_amount, budget.currency, int(percent))
+
+    async def set_budget(self, user_id: int, tz_name: Optional[str], category: str, period: str,
+                         limit: float, currency: str) -> Budget:
+        """Create or replace a budget, counting what was already spent this period."""
+        start = period_start(period, tz_name)
+        async with AsyncSessionLocal() as session:
+            spent = await self._spent_since(session, user_id, category, _utc_start(start, tz_name), currency)
+            budget = await session.scalar(
+                select(Budget).where(Budget.user_id == user_id, Budget.category == category).with_for_update()
+            )
+            if budget is None:
+                budget = Budget(user_id=user_id, category=category)
+                session.add(budget)
+            budget.period = period
+            budget.limit_amount = limit
+            budget.currency = currency
+            budget.period_start = start
+            budget.spent = spent
+            # Thresholds already passed are not announced again
+            budget.alerted_pct = max(
+                [p for p in settings.BUDGET_ALERT_PERCENTS if p <= spent / limit * 100], default=0
+            )
+            await session.commit()
+            return budget
+
+    @staticmethod
+    async def _spent_since(session, user_id: int, category: str, since: datetime, currency: str) -> float:
+        # One-off scan when a budget is set; receipts after that are added by record()
+        if category == ALL_CATEGORIES:
+            stmt = select(Receipt.total_amount, Receipt.currency).where(
+                Receipt.user_id == user_id, Receipt.created_at >= since
+            )
+        else:
+            stmt = (
+                select(ReceiptItem.price, Receipt.currency)
+                .join(Receipt, ReceiptItem.receipt_id == Receipt.id)
+                .where(
+                    ReceiptItem.user_id == user_id,
+                    ReceiptItem.category == category,
+                    ReceiptItem.created_at >= since,
+                    ReceiptItem.price.is_not(None),
+                )
+            )
+        rows = (await session.execute(stmt)).all()
+        if not rows:
+            return 0.0
+        amounts, currencies = zip(*rows)
+        return float(np.nansum(currency_service.convert_many(np.array(amounts, dtype=np.float64), currencies, currency)))
+
+    async def budgets(self, user_id: int, tz_name: Optional[str]) -> list[Budget]:
+        """The user's budgets with ``spent`` as of the current period."""
+        async with AsyncSessionLocal() as session:
+            budgets = (await session.scalars(
+                select(Budget).where(Budget.user_id == user_id).order_by(Budget.category)
+            )).all()
+        for budget in budgets:
+            start = period_start(budget.period, tz_name)
+            if budget.period_start < start:
+                # Not written back; the next receipt rolls the row over
+                budget.period_start, budget.spent, budget.alerted_pct = start, 0.0, 0
+        return budgets
+
+    async def remove(self, user_id: int, category: str) -> bool:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                delete(Budget).where(Budget.user_id == user_id, Budget.category == category)
+            )
+            await session.commit()
+        return result.rowcount > 0
+
+budget_service = BudgetService()
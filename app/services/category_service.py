@@ -0,0 +1,64 @@
+"""Keyword categories for receipt lines, used by budgets.
+
+A line belongs to the first category with a keyword among its words
+(English, Portuguese and Spanish, accents stripped); anything else is
+"other".
+"""
+import unicodedata
+
+OTHER = "other"
+
+KEYWORDS = {
+    "dairy": (
+        "milk", "leite", "leche", "cheese", "queijo", "queso", "yogurt", "iogurte", "yogur",
+        "butter", "manteiga", "mantequilla", "cream", "creme", "requeijao", "nata",
+    ),
+    "meat": (
+        "beef", "carne", "chicken", "frango", "pollo", "pork", "porco", "cerdo", "sausage",
+        "linguica", "salsicha", "ham", "presunto", "jamon", "bacon", "fish", "peixe", "pescado",
+    ),
+    "produce": (
+        "apple", "maca", "manzana", "banana", "platano", "tomato", "tomate", "onion", "cebola",
+        "cebolla", "potato", "batata", "papa", "lettuce", "alface", "lechuga", "carrot", "cenoura",
+        "zanahoria", "lemon", "limao", "limon", "orange", "laranja", "naranja", "fruit", "fruta",
+    ),
+    "bakery": ("bread", "pao", "pan", "cake", "bolo", "pastel", "biscuit", "biscoito", "galleta", "cookie"),
+    "drinks": (
+        "water", "agua", "juice", "suco", "jugo", "soda", "refrigerante", "refresco", "coffee",
+        "cafe", "tea", "cha", "te", "beer", "cerveja", "cerveza", "wine", "vinho", "vino",
+    ),
+    "household": (
+        "detergent", "detergente", "soap", "sabao", "jabon", "bleach", "candida", "lejia",
+        "sponge", "esponja", "trash", "lixo", "basura", "napkin", "guardanapo", "servilleta",
+    ),
+    "hygiene": (
+        "shampoo", "toothpaste", "creme dental", "pasta de dente", "deodorant", "desodorante",
+        "toilet", "higienico", "diaper", "fralda", "panal", "sabonete",
+    ),
+}
+CATEGORIES = (*KEYWORDS, OTHER)
+
+_WORDS = {
+    word: category
+    for category, words in KEYWORDS.items()
+    for word in words
+    if " " not in word
+}
+_PHRASES = [(phrase, category) for category, words in KEYWORDS.items() for phrase in words if " " in phrase]
+
+
+def _fold(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def categorize(name: str) -> str:
+    folded = _fold(name)
+    for phrase, category in _PHRASES:
+        if phrase in folded:
+            return category
+    for word in folded.replace(",", " ").split():
+        category = _WORDS.get(word)
+        if category is not None:
+            return category
+    return OTHER
@@ -0,0 +1,96 @@
+"""Exchange rates and bulk currency conversion.
+
+Rates are units of each currency per one unit of a base currency. They
+come from ``FX_RATES_URL`` when set (any feed answering
+``{"base": ..., "date": ..., "rates": {...}}``), otherwise from
+``FX_RATES_FILE`` or the bundled ``fx_rates.json``. Each load builds an
+immutable snapshot that replaces the previous one in a single assignment,
+so a conversion never mixes rates from two refreshes.
+
+Receipt amounts stay in the currency they were paid in. Totals are
+converted in bulk: currency codes become rate-table positions in one
+C-level pass and the amounts are scaled with one NumPy multiply.
+"""
+import json
+import logging
+from itertools import repeat
+from pathlib import Path
+from typing import NamedTuple, Sequence
+
+import aiohttp
+import numpy as np
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+BUNDLED_RATES = Path(__file__).resolve().parent.parent / "config" / "fx_rates.json"
+
+
+class RateSnapshot(NamedTuple):
+    base: str
+    as_of: str
+    index: dict[str, int]
+    per_base: np.ndarray
+
+    @classmethod
+    def from_feed(cls, data: dict) -> "RateSnapshot":
+        base = data["base"].upper()
+        rates = {code.upper(): float(rate) for code, rate in data["rates"].items()}
+        rates[base] = 1.0
+        codes = sorted(rates)
+        per_base = np.array([rates[code] for code in codes], dtype=np.float64)
+        per_base.flags.writeable = False
+        return cls(base, str(data.get("date", "")), {code: i for i, code in enumerate(codes)}, per_base)
+
+
+class CurrencyService:
+    def __init__(self):
+        self._snapshot = RateSnapshot.from_feed(self._read_file())
+
+    @property
+    def snapshot(self) -> RateSnapshot:
+        return self._snapshot
+
+    def supports(self, code: str) -> bool:
+        return code in self._snapshot.index
+
+    @staticmethod
+    def _read_file() -> dict:
+        path = Path(settings.FX_RATES_FILE) if settings.FX_RATES_FILE else BUNDLED_RATES
+        return json.loads(path.read_text())
+
+    async def refresh(self) -> RateSnapshot:
+        """Reload rates from the feed or file and swap them in."""
+        if settings.FX_RATES_URL:
+            timeout = aiohttp.ClientTimeout(total=10)
+            async with aiohttp.ClientSession(timeout=timeout) as http:
+                async with http.get(settings.FX_RATES_URL) as response:
+                    response.raise_for_status()
+                    data = await response.json(content_type=None)
+        else:
+            data = self._read_file()
+        snapshot = RateSnapshot.from_feed(data)
+        self._snapshot = snapshot
+        logger.info("Loaded %s FX rates (base %s, as of %s)", len(snapshot.index), snapshot.base, snapshot.as_of)
+        return snapshot
+
+    def convert(self, amount: float, source: str, target: str) -> float:
+        """Convert one amount; NaN when either currency has no rate."""
+        return float(self.convert_many(np.array([amount]), [source], target)[0])
+
+    def convert_many(self, amounts: np.ndarray, currencies: Sequence[str], target: str) -> np.ndarray:
+        """Convert parallel arrays of amounts and currency codes into ``target``.
+
+        Amounts in currencies without a rate come back as NaN.
+        """
+        snap = self._snapshot
+        amounts = np.asarray(amounts, dtype=np.float64)
+        if not len(amounts):
+            return amounts
+        positions = np.fromiter(map(snap.index.get, currencies, repeat(-1)), np.intp, len(amounts))
+        source_rates = np.where(positions >= 0, snap.per_base[positions], np.nan)
+        target_rate = snap.per_base[snap.index[target]] if target in snap.index else np.nan
+        return amounts * (target_rate / source_rates)
+
+currency_service = CurrencyService()
@@ -0,0 +1,183 @@
+"""Streaming export of purchase history.
+
+Rows are read from ``receipts``, ``receipt_items`` and ``shopping_items``,
+together with their archived rows (``history_service``), through
+server-side cursors (``yield_per``) and encoded one partition at
+a time into a ZIP archive with one member per table. The archive is
+written to a sink whose buffered bytes are handed to an async consumer
+after every partition, so memory use is bounded by the partition size
+whatever the size of the history.
+
+Formats:
+
+* ``csv`` - deflate-compressed CSV members.
+* ``parquet`` - zstd-compressed Parquet members, one row group per
+  partition. Requires the optional ``pyarrow`` package; each member is
+  staged in a spooled temporary file because Parquet writes its footer
+  last.
+"""
+import csv
+import io
+import logging
+import tempfile
+import zipfile
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import select
+
+from app.config.settings import settings
+from app.core.database import AsyncSessionLocal
+from app.core.exceptions import ValidationException
+from app.core.workers import run_in_worker
+from app.services.history_service import history_service
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "parquet")
+COPY_CHUNK = 1024 * 1024
+
+_receipts = history_service.receipts.c
+_receipt_items = history_service.receipt_items.c
+_shopping_items = history_service.shopping_items.c
+
+TABLES = {
+    "receipts": (
+        _receipts.id, _receipts.user_id, _receipts.store_name, _receipts.total_amount,
+        _receipts.currency, _receipts.items_count, _receipts.created_at,
+    ),
+    "receipt_items": (
+        _receipt_items.id, _receipt_items.receipt_id, _receipt_items.user_id, _receipt_items.product_name,
+        _receipt_items.quantity, _receipt_items.price, _receipt_items.created_at,
+    ),
+    "shopping_items": (
+        _shopping_items.id, _shopping_items.user_id, _shopping_items.list_id, _shopping_items.name,
+        _shopping_items.quantity, _shopping_items.is_bought, _shopping_items.created_at,
+        _shopping_items.archived_at,
+    ),
+}
+
+
+class _Sink(io.RawIOBase):
+    """Write-only, non-seekable stream collecting bytes until drained."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _write_csv_rows(writer, rows) -> None:
+    writer.writerows(rows)
+
+
+def _arrow_schema(columns):
+    import pyarrow as pa
+    types = {int: pa.int64(), float: pa.float64(), bool: pa.bool_(), str: pa.string()}
+    return pa.schema([
+        (c.key, types.get(c.type.python_type, pa.timestamp("us"))) for c in columns
+    ])
+
+
+def _write_parquet_rows(writer, rows) -> None:
+    import pyarrow as pa
+    writer.write_table(pa.Table.from_pylist([r._asdict() for r in rows], schema=writer.schema))
+
+
+class ExportService:
+    async def export(
+        self,
+        consume: Callable[[bytes], Awaitable[None]],
+        user_id: Optional[int] = None,
+        fmt: str = "csv"
+    ) -> int:
+        """Stream a ZIP export to ``consume``; all users when ``user_id`` is None.
+
+        Returns the number of rows exported.
+        """
+        if fmt not in FORMATS:
+            raise ValidationException(f"Unknown export format: {fmt}")
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ValidationException("Parquet export requires pyarrow")
+
+        sink = _Sink()
+        exported = 0
+        compression = zipfile.ZIP_DEFLATED if fmt == "csv" else zipfile.ZIP_STORED
+        with zipfile.ZipFile(sink, "w", compression=compression) as archive:
+            async with AsyncSessionLocal() as session:
+                for table, columns in TABLES.items():
+                    stmt = select(*columns).order_by(columns[0]).execution_options(
+                        yield_per=settings.EXPORT_CHUNK_ROWS
+                    )
+                    if user_id is not None:
+                        stmt = stmt.where(columns[0].table.c.user_id == user_id)
+                    result = await session.stream(stmt)
+                    if fmt == "csv":
+                        exported += await self._csv_member(archive, sink, consume, table, columns, result)
+                    else:
+                        exported += await self._parquet_member(archive, sink, consume, table, columns, result)
+        await consume(sink.take())  # central directory
+        logger.info("Exported %s rows (%s) for user %s", exported, fmt, user_id or 'ALL')
+        return exported
+
+    async def _csv_member(self, archive, sink, consume, table, columns, result) -> int:
+        count = 0
+        with archive.open(f"{table}.csv", "w", force_zip64=True) as member:
+            text = io.TextIOWrapper(member, encoding="utf-8", newline="", write_through=True)
+            writer = csv.writer(text)
+            writer.writerow([c.key for c in columns])
+            async for rows in result.partitions():
+                await run_in_worker(_write_csv_rows, writer, rows)
+                count += len(rows)
+                await consume(sink.take())
+            text.detach()
+        return count
+
+    async def _parquet_member(self, archive, sink, consume, table, columns, result) -> int:
+        import pyarrow.parquet as pq
+
+        count = 0
+        with tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_BYTES) as staged:
+            with pq.ParquetWriter(staged, _arrow_schema(columns), compression="zstd") as writer:
+                async for rows in result.partitions():
+                    await run_in_worker(_write_parquet_rows, writer, rows)
+                    count += len(rows)
+
+            staged.seek(0)
+            with archive.open(f"{table}.parquet", "w", force_zip64=True) as member:
+                while chunk := staged.read(COPY_CHUNK):
+                    member.write(chunk)
+                    await consume(sink.take())
+        return count
+
+    async def export_to_file(self, user_id: Optional[int], fmt: str = "csv"):
+        """Export into a spooled temporary file, rewound for reading.
+
+        The caller closes the returned file.
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_BYTES)
+
+        async def consume(data: bytes) -> None:
+            spool.write(data)
+
+        try:
+            await self.export(consume, user_id=user_id, fmt=fmt)
+        except Exception:
+            spool.close()
+            raise
+        spool.seek(0)
+        return spool
+
+export_service = ExportService()
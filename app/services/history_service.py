@@ -0,0 +1,160 @@
+"""Cold archive of old purchase history, and reads across hot and archived rows.
+
+``archive`` moves rows out of the hot tables into the append-only
+``*_archive`` tables (``app.models.archive``):
+
+* list items checked off (``archived_at`` set by a finished trip, or by
+  /remove and /clear of a bought item) more than ``ARCHIVE_AFTER_MONTHS``
+  ago;
+* receipts older than that, with their lines and OCR text.
+
+It runs daily at ``ARCHIVE_RUN_AT`` in batches of ``ARCHIVE_BATCH_SIZE``
+rows. Each batch is its own short transaction, followed by a pause of
+``ARCHIVE_BATCH_PAUSE`` seconds, so archiving never holds locks or a pool
+connection for long. The hot tables keep recent rows only, and their
+indexes stay small. The archive tables have a single (user_id,
+created_at) index.
+
+``receipts``, ``receipt_items`` and ``shopping_items`` are UNION ALL
+subqueries over a hot table and its archive, with the hot table's
+column names. Export, search and stats select from them, so archived
+rows still appear in their results.
+
+    python -m app.services.history_service
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import Boolean, delete, insert, literal, select, union_all
+
+from app.config.settings import settings
+from app.core.database import AsyncSessionLocal
+from app.models.archive import ArchivedReceipt, ArchivedReceiptItem, ArchivedShoppingItem
+from app.models.receipt import Receipt, ReceiptItem, ReceiptText
+from app.models.shopping import ShoppingItem
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_COLUMNS = ("id", "user_id", "store_name", "total_amount", "currency", "items_count", "created_at")
+ITEM_COLUMNS = ("id", "receipt_id", "user_id", "product_name", "quantity", "price", "category", "created_at")
+LIST_COLUMNS = ("id", "user_id", "list_id", "name", "quantity", "created_at", "archived_at")
+
+
+def _columns(model, names):
+    return [getattr(model, name) for name in names]
+
+
+class HistoryService:
+    def __init__(self):
+        self.receipts = union_all(
+            select(*_columns(Receipt, RECEIPT_COLUMNS)),
+            select(*_columns(ArchivedReceipt, RECEIPT_COLUMNS)),
+        ).subquery("all_receipts")
+        self.receipt_items = union_all(
+            select(*_columns(ReceiptItem, ITEM_COLUMNS)),
+            select(*_columns(ArchivedReceiptItem, ITEM_COLUMNS)),
+        ).subquery("all_receipt_items")
+        self.shopping_items = union_all(
+            select(
+                ShoppingItem.id, ShoppingItem.user_id, ShoppingItem.list_id, ShoppingItem.name,
+                ShoppingItem.quantity, ShoppingItem.is_bought, ShoppingItem.created_at, ShoppingItem.archived_at,
+            ),
+            select(
+                ArchivedShoppingItem.id, ArchivedShoppingItem.user_id, ArchivedShoppingItem.list_id,
+                ArchivedShoppingItem.name, ArchivedShoppingItem.quantity, literal(True, Boolean),
+                ArchivedShoppingItem.created_at, ArchivedShoppingItem.archived_at,
+            ),
+        ).subquery("all_shopping_items")
+
+    async def archive(self, now: Optional[datetime] = None) -> dict[str, int]:
+        """Move history older than ``ARCHIVE_AFTER_MONTHS``; returns rows moved per table."""
+        if settings.ARCHIVE_AFTER_MONTHS <= 0:
+            return {}
+        cutoff = (now or datetime.utcnow()) - timedelta(days=30 * settings.ARCHIVE_AFTER_MONTHS)
+        moved = {
+            "shopping_items": await self._in_batches(self._archive_items, cutoff),
+            "receipts": await self._in_batches(self._archive_receipts, cutoff),
+        }
+        logger.info("Archived history older than %s: %s", cutoff.date(), moved)
+        return moved
+
+    @staticmethod
+    async def _in_batches(archive_batch, cutoff: datetime) -> int:
+        total = 0
+        while True:
+            count = await archive_batch(cutoff, settings.ARCHIVE_BATCH_SIZE)
+            total += count
+            if count < settings.ARCHIVE_BATCH_SIZE:
+                return total
+            await asyncio.sleep(settings.ARCHIVE_BATCH_PAUSE)
+
+    @staticmethod
+    async def _archive_items(cutoff: datetime, limit: int) -> int:
+        batch = (
+            select(ShoppingItem.id)
+            .where(ShoppingItem.archived_at < cutoff)
+            .order_by(ShoppingItem.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                rows = (await session.execute(
+                    delete(ShoppingItem)
+                    .where(ShoppingItem.id.in_(batch.scalar_subquery()))
+                    .returning(*_columns(ShoppingItem, LIST_COLUMNS))
+                )).all()
+                if rows:
+                    await session.execute(insert(ArchivedShoppingItem), [row._asdict() for row in rows])
+        return len(rows)
+
+    @staticmethod
+    async def _archive_receipts(cutoff: datetime, limit: int) -> int:
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                ids = (await session.execute(
+                    select(Receipt.id)
+                    .where(Receipt.created_at < cutoff)
+                    .order_by(Receipt.id)
+                    .limit(limit)
+                    .with_for_update(skip_locked=True)
+                )).scalars().all()
+                if not ids:
+                    return 0
+                items = (await session.execute(
+                    delete(ReceiptItem)
+                    .where(ReceiptItem.receipt_id.in_(ids))
+                    .returning(*_columns(ReceiptItem, ITEM_COLUMNS))
+                )).all()
+                texts = dict((await session.execute(
+                    delete(ReceiptText)
+                    .where(ReceiptText.receipt_id.in_(ids))
+                    .returning(ReceiptText.receipt_id, ReceiptText.compressed)
+                )).all())
+                receipts = (await session.execute(
+                    delete(Receipt)
+                    .where(Receipt.id.in_(ids))
+                    .returning(*_columns(Receipt, RECEIPT_COLUMNS), Receipt.ocr_text)
+                )).all()
+
+                archived = []
+                for receipt in receipts:
+                    row = receipt._asdict()
+                    ocr_text = row.pop("ocr_text")
+                    # Receipts from before receipt_texts only have the truncated copy
+                    row["ocr_compressed"] = texts.get(receipt.id) or (
+                        ReceiptText.from_text(ocr_text).compressed if ocr_text else None
+                    )
+                    archived.append(row)
+                await session.execute(insert(ArchivedReceipt), archived)
+                if items:
+                    await session.execute(insert(ArchivedReceiptItem), [item._asdict() for item in items])
+        return len(receipts)
+
+history_service = HistoryService()
+
+
+if __name__ == "__main__":
+    asyncio.run(history_service.archive())
@@ -0,0 +1,121 @@
+"""Photo selection, download and preprocessing ahead of OCR.
+
+Telegram offers every photo in several sizes. OCR starts with the
+smallest one whose long side reaches ``OCR_TARGET_LONG_SIDE`` and only
+moves to a larger size when the result is not confident. Downloads are
+written once into a pooled buffer; hashing reads it through a memoryview
+and decoding reads it in place, so the raw bytes are never copied again.
+Grayscale conversion, margin cropping and downscaling run in the worker
+pool, and only the smaller re-encoded image is kept while OCR runs.
+"""
+import hashlib
+import io
+import logging
+from contextlib import asynccontextmanager
+from typing import NamedTuple, Optional, Sequence
+
+from telegram import PhotoSize
+
+from app.config.settings import settings
+from app.core.workers import run_in_worker
+
+logger = logging.getLogger(__name__)
+
+# Pixels differing from the corner colour by less than this count as margin
+TRIM_THRESHOLD = 40
+
+
+class DownloadedPhoto(NamedTuple):
+    buffer: io.BytesIO
+    digest: str
+    size: tuple[int, int]
+
+
+def dhash(image) -> int:
+    """64-bit difference hash of a grayscale PIL image."""
+    pixels = list(image.resize((9, 8)).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def _prepare(buffer: io.BytesIO) -> tuple[bytes, Optional[int]]:
+    try:
+        from PIL import Image, ImageChops, ImageOps
+    except ImportError:
+        return bytes(buffer.getbuffer()), None
+
+    buffer.seek(0)
+    with Image.open(buffer) as original:
+        image = ImageOps.exif_transpose(original).convert("L")
+    phash = dhash(image)
+
+    # Crop the table or background around the receipt
+    background = Image.new("L", image.size, image.getpixel((0, 0)))
+    mask = ImageChops.difference(image, background).point(lambda p: 255 if p > TRIM_THRESHOLD else 0)
+    bbox = mask.getbbox()
+    if bbox:
+        image = image.crop(bbox)
+
+    limit = settings.OCR_MAX_LONG_SIDE
+    image.thumbnail((limit, limit), Image.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=85, optimize=True)
+    return out.getvalue(), phash
+
+
+class _BufferPool:
+    def __init__(self, max_idle: int):
+        self.max_idle = max_idle
+        self._idle: list[io.BytesIO] = []
+
+    def acquire(self) -> io.BytesIO:
+        return self._idle.pop() if self._idle else io.BytesIO()
+
+    def release(self, buffer: io.BytesIO) -> None:
+        buffer.seek(0)
+        buffer.truncate()
+        if len(self._idle) < self.max_idle:
+            self._idle.append(buffer)
+
+
+class ImageService:
+    def __init__(self):
+        self._buffers = _BufferPool(settings.WORKER_POOL_SIZE * 2)
+
+    @staticmethod
+    def photo_order(photos: Sequence[PhotoSize]) -> list[PhotoSize]:
+        """Sizes to try, from the smallest likely to OCR well up to the largest."""
+        by_area = sorted(photos, key=lambda p: p.width * p.height)
+        target = settings.OCR_TARGET_LONG_SIDE
+        first = next(
+            (i for i, p in enumerate(by_area) if max(p.width, p.height) >= target),
+            len(by_area) - 1
+        )
+        return by_area[first:]
+
+    @asynccontextmanager
+    async def download(self, photo: PhotoSize):
+        """Download into a pooled buffer, returned to the pool on exit."""
+        buffer = self._buffers.acquire()
+        try:
+            photo_file = await photo.get_file()
+            await photo_file.download_to_memory(buffer)
+            with buffer.getbuffer() as view:
+                digest = hashlib.sha256(view).hexdigest()
+            yield DownloadedPhoto(buffer, digest, (photo.width, photo.height))
+        finally:
+            self._buffers.release(buffer)
+
+    async def prepare(self, photo: DownloadedPhoto) -> tuple[bytes, Optional[int]]:
+        """Preprocessed image bytes for OCR and the photo's perceptual hash."""
+        try:
+            return await run_in_worker(_prepare, photo.buffer)
+        except Exception as e:
+            logger.warning("Image preprocessing failed, using original: %s", e)
+            return bytes(photo.buffer.getbuffer()), None
+
+image_service = ImageService()
@@ -0,0 +1,351 @@
+"""Shopping lists, membership and list versions.
+
+Every user edits exactly one list at a time (``users.active_list_id``).
+A personal list is created on first use and adopts any items added
+before lists existed; read paths go through ``active_list_view``, which
+does the same for users who only read. Sharing a list gives it an invite code; other users
+join with that code and the list becomes their active list.
+
+Each change bumps ``shopping_lists.version`` with a single UPDATE. Edits
+that refer to items by position (``/remove 3``) pass the version the
+member last saw and fail with ``ListVersionConflict`` if anyone changed
+the list in between, instead of removing the wrong item. A member's own
+changes that keep the numbering (adds, ticks, clearing) advance what
+they have seen (``advance_seen``).
+
+The latest version of each list is also cached (in Redis when
+configured) for the REST API's ETags. Cached versions only move
+forward, so a stale write cannot make a changed list look unchanged.
+The list text served under overload is stamped with the version it
+shows and is only served while that is still the cached version, so any
+write makes it stale without a database query.
+"""
+import logging
+import secrets
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Sequence
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.settings import settings
+from app.core.exceptions import ListVersionConflict, ShoppingListException
+from app.core.queries import queries
+from app.core.redis import redis_client
+from app.models.shopping import ShoppingItem
+from app.models.shopping_list import ListMember, ShoppingList
+from app.models.user import User
+from app.services.read_models import ItemView, ListView, read_models
+from app.services.write_buffer import write_buffer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIST_NAME = "My List"
+LOCAL_RENDER_CACHE_SIZE = 10_000
+
+# KEYS: version key; ARGV: version, ttl seconds. Keeps the higher version.
+REMEMBER_VERSION_LUA = """
+local current = tonumber(redis.call('GET', KEYS[1]))
+if current and current > tonumber(ARGV[1]) then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return current
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return tonumber(ARGV[1])
+"""
+
+
+class ListService:
+    def __init__(self):
+        self._renders: OrderedDict[int, tuple[int, int, str]] = OrderedDict()
+        self._versions: OrderedDict[int, tuple[int, float]] = OrderedDict()
+        self._remember = (
+            redis_client.register_script(REMEMBER_VERSION_LUA) if redis_client is not None else None
+        )
+
+    async def active_list(self, session: AsyncSession, user_id: int) -> Optional[ShoppingList]:
+        result = await session.execute(queries.active_list, {"user_id": user_id})
+        return result.scalars().first()
+
+    async def ensure_active_list(self, session: AsyncSession, user: User) -> ShoppingList:
+        """The user's active list, creating a personal one if needed."""
+        shopping_list = await self.active_list(session, user.id)
+        if shopping_list is not None:
+            return shopping_list
+
+        shopping_list = ShoppingList(user_id=user.id, name=DEFAULT_LIST_NAME, version=1)
+        session.add(shopping_list)
+        await session.flush()
+        session.add(ListMember(list_id=shopping_list.id, user_id=user.id))
+        await session.execute(
+            update(ShoppingItem)
+            .where(ShoppingItem.user_id == user.id, ShoppingItem.list_id.is_(None))
+            .values(list_id=shopping_list.id)
+        )
+        await session.execute(
+            update(User).where(User.id == user.id).values(active_list_id=shopping_list.id)
+        )
+        return shopping_list
+
+    async def active_list_view(self, session: AsyncSession, user_id: int) -> Optional[ListView]:
+        """The user's active list for a read path, adopting items added before lists existed."""
+        shopping_list = await read_models.active_list(session, user_id)
+        if shopping_list is not None:
+            return shopping_list
+        legacy = await session.scalar(
+            select(ShoppingItem.id).where(ShoppingItem.user_id == user_id, ShoppingItem.list_id.is_(None)).limit(1)
+        )
+        if legacy is None:
+            return None
+        # Locked so concurrent reads do not each create a list
+        user = await session.get(User, user_id, with_for_update=True)
+        if user is None:
+            return None
+        await self.ensure_active_list(session, user)
+        await session.commit()
+        return await read_models.active_list(session, user_id)
+
+    async def items(self, session: AsyncSession, list_id: int) -> Sequence[ShoppingItem]:
+        await write_buffer.barrier(list_id)
+        result = await session.execute(queries.items_by_list, {"list_id": list_id})
+        return result.scalars().all()
+
+    async def member(self, session: AsyncSession, list_id: int, user_id: int) -> Optional[ListMember]:
+        return await session.get(ListMember, (list_id, user_id))
+
+    async def members(self, session: AsyncSession, list_id: int) -> Sequence[ListMember]:
+        result = await session.execute(select(ListMember).where(ListMember.list_id == list_id))
+        return result.scalars().all()
+
+    async def bump_version(self, session: AsyncSession, list_id: int, expected: Optional[int] = None) -> int:
+        """Increment the list version; with ``expected``, only if it still matches."""
+        stmt = (
+            update(ShoppingList)
+            .where(ShoppingList.id == list_id)
+            .values(version=ShoppingList.version + 1, updated_at=datetime.utcnow())
+            .returning(ShoppingList.version)
+            .execution_options(synchronize_session=False)
+        )
+        if expected is not None:
+            stmt = stmt.where(ShoppingList.version == expected)
+        version = (await session.execute(stmt)).scalar()
+        if version is None:
+            raise ListVersionConflict(f"List {list_id} changed since version {expected}")
+        await self.remember_version(list_id, version)
+        return version
+
+    async def bulk_update(
+        self,
+        session: AsyncSession,
+        list_id: int,
+        user_id: int,
+        add: Sequence[str] = (),
+        remove: Sequence[int] = (),
+        check: Sequence[int] = (),
+        uncheck: Sequence[int] = (),
+        expected: Optional[int] = None
+    ) -> int:
+        """Apply several item changes under one version bump; returns the new version.
+
+        Item ids that are not on the list are ignored.
+        """
+        # Bumping first locks the list row, so concurrent bulk updates apply in turn
+        version = await self.bump_version(session, list_id, expected=expected)
+        if add:
+            await session.execute(
+                insert(ShoppingItem), [{"user_id": user_id, "list_id": list_id, "name": name} for name in add]
+            )
+        on_list = (ShoppingItem.list_id == list_id, ShoppingItem.archived_at.is_(None))
+        for ids, bought in ((check, True), (uncheck, False)):
+            if ids:
+                await session.execute(
+                    update(ShoppingItem)
+                    .where(ShoppingItem.id.in_(ids), *on_list)
+                    .values(is_bought=bought)
+                    .execution_options(synchronize_session=False)
+                )
+        if remove:
+            result = await session.execute(select(ShoppingItem).where(ShoppingItem.id.in_(remove), *on_list))
+            await self.remove(session, result.scalars().all())
+        return version
+
+    async def remember_version(self, list_id: int, version: int) -> None:
+        """Cache the list's version for ETag checks, unless a newer one is cached."""
+        if self._remember is not None:
+            try:
+                await self._remember(
+                    keys=[f"list:version:{list_id}"], args=[version, settings.API_VERSION_CACHE_TTL]
+                )
+            except Exception as e:
+                # Bounded by API_VERSION_CACHE_TTL: the stale entry expires
+                logger.warning("List version cache write failed: %s", e)
+            return
+        cached = self._versions.get(list_id)
+        if cached is not None and cached[0] > version:
+            version = cached[0]
+        self._versions[list_id] = (version, time.monotonic() + settings.API_VERSION_CACHE_TTL)
+        self._versions.move_to_end(list_id)
+        if len(self._versions) > LOCAL_RENDER_CACHE_SIZE:
+            self._versions.popitem(last=False)
+
+    async def cached_version(self, list_id: int) -> Optional[int]:
+        """Cached version of the list, or ``None`` when it has to be read from the database."""
+        if redis_client is not None:
+            try:
+                cached = await redis_client.get(f"list:version:{list_id}")
+                return int(cached) if cached else None
+            except Exception as e:
+                logger.warning("List version cache read failed: %s", e)
+                return None
+        cached = self._versions.get(list_id)
+        if cached is None or cached[1] < time.monotonic():
+            return None
+        return cached[0]
+
+    async def mark_seen(
+        self,
+        session: AsyncSession,
+        list_id: int,
+        user_id: int,
+        version: int,
+        chat_id: Optional[int] = None,
+        message_id: Optional[int] = None
+    ) -> None:
+        """Record the version shown to a member and, optionally, their list message."""
+        values = {"seen_version": version}
+        if message_id is not None:
+            values.update(chat_id=chat_id, pinned_message_id=message_id)
+        await session.execute(
+            update(ListMember)
+            .where(ListMember.list_id == list_id, ListMember.user_id == user_id)
+            .values(**values)
+        )
+
+    async def advance_seen(
+        self, session: AsyncSession, list_id: int, user_ids: Sequence[int], version: int
+    ) -> None:
+        """After the members' own change to ``version`` that kept item numbers, if they had seen the one before."""
+        await session.execute(
+            update(ListMember)
+            .where(
+                ListMember.list_id == list_id,
+                ListMember.user_id.in_(user_ids),
+                ListMember.seen_version == version - 1,
+            )
+            .values(seen_version=version)
+        )
+
+    async def share(self, session: AsyncSession, user: User) -> str:
+        """Invite code for the user's active list, created on first share."""
+        shopping_list = await self.ensure_active_list(session, user)
+        if not shopping_list.invite_code:
+            shopping_list.invite_code = secrets.token_urlsafe(6)
+            shopping_list.is_shared = True
+        return shopping_list.invite_code
+
+    async def join(self, session: AsyncSession, user: User, invite_code: str) -> ShoppingList:
+        result = await session.execute(
+            select(ShoppingList).where(ShoppingList.invite_code == invite_code)
+        )
+        shopping_list = result.scalars().first()
+        if shopping_list is None:
+            raise ShoppingListException("Unknown invite code")
+
+        if await self.member(session, shopping_list.id, user.id) is None:
+            session.add(ListMember(list_id=shopping_list.id, user_id=user.id))
+        await session.execute(
+            update(User).where(User.id == user.id).values(active_list_id=shopping_list.id)
+        )
+        shopping_list.version = await self.bump_version(session, shopping_list.id)
+        return shopping_list
+
+    async def leave(self, session: AsyncSession, user: User) -> Optional[ShoppingList]:
+        """Leave the active shared list; the user gets a fresh personal list on next use."""
+        shopping_list = await self.active_list(session, user.id)
+        if shopping_list is None or not shopping_list.is_shared:
+            return None
+
+        await session.execute(
+            delete(ListMember).where(
+                ListMember.list_id == shopping_list.id, ListMember.user_id == user.id
+            )
+        )
+        await session.execute(
+            update(User).where(User.id == user.id).values(active_list_id=None)
+        )
+        await self.bump_version(session, shopping_list.id)
+        return shopping_list
+
+    async def cache_render(self, user_id: int, shopping_list: ListView, text: str) -> None:
+        """Keep the list text last shown to a user, served under overload."""
+        await self.remember_version(shopping_list.id, shopping_list.version)
+        if redis_client is not None:
+            try:
+                await redis_client.set(
+                    f"list:render:{user_id}",
+                    f"{shopping_list.id}:{shopping_list.version}\n{text}",
+                    ex=settings.LIST_RENDER_CACHE_TTL,
+                )
+                return
+            except Exception as e:
+                logger.warning("List render cache write failed: %s", e)
+        self._renders[user_id] = (shopping_list.id, shopping_list.version, text)
+        self._renders.move_to_end(user_id)
+        if len(self._renders) > LOCAL_RENDER_CACHE_SIZE:
+            self._renders.popitem(last=False)
+
+    async def cached_render(self, user_id: int) -> Optional[str]:
+        """The text from ``cache_render``, or ``None`` once the list has changed since."""
+        cached = None
+        if redis_client is not None:
+            try:
+                value = await redis_client.get(f"list:render:{user_id}")
+                if value:
+                    stamp, _, text = value.decode().partition("\n")
+                    list_id, _, version = stamp.partition(":")
+                    cached = int(list_id), int(version), text
+            except Exception as e:
+                logger.warning("List render cache read failed: %s", e)
+        if cached is None:
+            cached = self._renders.get(user_id)
+        if cached is None:
+            return None
+        list_id, version, text = cached
+        # An expired version entry cannot vouch for the copy either
+        if await self.cached_version(list_id) != version:
+            return None
+        return text
+
+    async def archive_bought(self, session: AsyncSession, list_id: int) -> int:
+        """Archive every bought item on the list; returns how many were archived."""
+        result = await session.execute(
+            queries.archive_bought, {"on_list": list_id, "now": datetime.utcnow()}
+        )
+        if result.rowcount:
+            await self.bump_version(session, list_id)
+        return result.rowcount
+
+    @staticmethod
+    async def remove(session: AsyncSession, items: Sequence[ShoppingItem]) -> None:
+        """Take items off their list; bought ones are archived so the purchase stays in history."""
+        now = datetime.utcnow()
+        for item in items:
+            if item.is_bought:
+                item.archived_at = now
+            else:
+                await session.delete(item)
+
+    @staticmethod
+    def render(shopping_list: ListView, items: Sequence[ItemView]) -> str:
+        """List message text, shared by /list and the pinned-message sync."""
+        title = f"👨‍👩‍👧 **{shopping_list.name}**" if shopping_list.is_shared else "📋 **Your Shopping List:**"
+        if not items:
+            return f"{title}\n\nThe list is empty. Use /add to add items."
+        msg = f"{title}\n\n"
+        for i, item in enumerate(items, 1):
+            msg += f"{i}. ✅ {item.name}\n" if item.is_bought else f"{i}. {item.name}\n"
+        return msg
+
+list_service = ListService()
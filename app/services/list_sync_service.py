@@ -0,0 +1,126 @@
+"""Push list changes to every member's pinned list message.
+
+A change publishes the list id on a Redis channel that every bot
+process subscribes to. The first process to claim the list's coalescing
+key (``SET NX PX``) waits for the coalescing window, reads the list once
+and edits each member's list message in place. Other processes, and
+further changes from the same burst, find the key taken or a flush
+already pending and do nothing. Because the read happens after the
+window, the single edit includes every change made during it.
+
+Without Redis the same coalescing runs inside the process.
+"""
+import asyncio
+import logging
+from typing import Optional
+
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden
+
+from app.config.settings import settings
+from app.core.database import AsyncSessionLocal
+from app.core.redis import redis_client
+from app.services.list_service import list_service
+from app.services.read_models import read_models
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "lists:changed"
+
+
+class ListSyncService:
+    def __init__(self):
+        self.bot: Optional[Bot] = None
+        self._pending: dict[int, asyncio.Task] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, bot: Bot) -> None:
+        self.bot = bot
+        if redis_client is not None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        tasks = list(self._pending.values())
+        if self._listener is not None:
+            tasks.append(self._listener)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def notify(self, list_id: int) -> None:
+        """Announce that a shared list changed."""
+        if redis_client is not None:
+            try:
+                await redis_client.publish(CHANNEL, list_id)
+                return
+            except Exception as e:
+                logger.warning("List change publish failed, syncing locally: %s", e)
+        self._schedule(list_id)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with redis_client.pubsub() as pubsub:
+                    await pubsub.subscribe(CHANNEL)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._schedule(int(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("List sync subscription failed: %s", e)
+                await asyncio.sleep(5)
+
+    def _schedule(self, list_id: int) -> None:
+        if list_id not in self._pending:
+            self._pending[list_id] = asyncio.create_task(self._flush_later(list_id))
+
+    async def _flush_later(self, list_id: int) -> None:
+        window = settings.LIST_SYNC_COALESCE_MS
+        try:
+            if redis_client is not None:
+                claimed = await redis_client.set(f"lists:sync:{list_id}", 1, nx=True, px=window)
+                if not claimed:
+                    return
+            await asyncio.sleep(window / 1000)
+            await self._render(list_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("List sync failed for list %s: %s", list_id, e)
+        finally:
+            self._pending.pop(list_id, None)
+
+    async def _render(self, list_id: int) -> None:
+        async with AsyncSessionLocal() as session:
+            shopping_list = await read_models.shopping_list(session, list_id)
+            if shopping_list is None:
+                return
+            items = await read_models.items(session, list_id)
+            members = await list_service.members(session, list_id)
+            text = list_service.render(shopping_list, items)
+
+            for member in members:
+                if not member.pinned_message_id or member.seen_version == shopping_list.version:
+                    continue
+                try:
+                    await self.bot.edit_message_text(
+                        text,
+                        chat_id=member.chat_id,
+                        message_id=member.pinned_message_id,
+                        parse_mode="Markdown"
+                    )
+                except BadRequest as e:
+                    if "not modified" not in str(e).lower():
+                        # Message deleted or too old to edit; the next /list re-pins
+                        logger.info("Dropping list message for user %s: %s", member.user_id, e)
+                        member.pinned_message_id = None
+                        continue
+                except Forbidden:
+                    member.pinned_message_id = None
+                    continue
+                member.seen_version = shopping_list.version
+                await list_service.cache_render(member.user_id, shopping_list, text)
+            await session.commit()
+
+list_sync_service = ListSyncService()
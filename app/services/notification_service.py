@@ -1,6 +1,8 @@
 import logging
+from html import escape
 from typing import Optional
 from telegram import Bot
+from app.utils.helpers import helpers
 
 logger = logging.getLogger(__name__)
 
@@ -15,15 +17,39 @@ class NotificationService:
             await self.bot.send_message(chat_id, msg, parse_mode=parse)
             return True
         except Exception as e:
-            logger.error(f"Error: {e}")
+            logger.error("Error: %s", e)
             return False
     
-    async def daily_reminder(self, chat_id: int) -> bool:
+    async def daily_reminder(self, chat_id: int, due_items: Optional[list[str]] = None) -> bool:
         msg = "📝 Check your shopping list: /list"
+        if due_items:
+            msg += "\n\n🔁 Running low soon: " + ", ".join(map(escape, due_items))
         return await self.send(chat_id, msg)
     
-    async def price_alert(self, chat_id: int, item: str, new_price: float) -> bool:
-        msg = f"📈 Price update: {item} - R${new_price:.2f}"
+    async def price_alert(self, chat_id: int, item: str, new_price: float, currency: str) -> bool:
+        msg = f"📈 Price update: {item} - {helpers.format_currency(new_price, currency)}"
         return await self.send(chat_id, msg)
+    
+    async def budget_alert(self, chat_id: int, category: str, spent: float, limit: float,
+                           currency: str, percent: int) -> bool:
+        label = "Your budget" if category == "all" else f"Your {category} budget"
+        icon = "🚨" if percent >= 100 else "⚠️"
+        msg = (
+            f"{icon} {label} is at {percent}%: "
+            f"{helpers.format_currency(spent, currency)} of {helpers.format_currency(limit, currency)}"
+        )
+        return await self.send(chat_id, msg)
+    
+    async def unusual_spend(self, chat_id: int, anomalies: list) -> bool:
+        lines = []
+        for anomaly in anomalies:
+            amount = helpers.format_currency(anomaly.amount, anomaly.currency)
+            usual = helpers.format_currency(anomaly.usual, anomaly.currency)
+            if anomaly.kind == "p":
+                rise = (anomaly.amount / anomaly.usual - 1) * 100
+                lines.append(f"• {escape(anomaly.key)}: {amount}, usually {usual} (+{rise:.0f}%)")
+            else:
+                lines.append(f"• {escape(anomaly.key.capitalize())} on this receipt: {amount}, usually {usual}")
+        return await self.send(chat_id, "🔎 Unusual spend:\n" + "\n".join(lines))
 
 notification_service = NotificationService()
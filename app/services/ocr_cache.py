@@ -0,0 +1,225 @@
+"""Content-addressed cache of OCR results.
+
+Results are stored under the SHA-256 of the image bytes. Two indexes
+point at them:
+
+* Telegram ``file_unique_id`` -> digest, so a resent or forwarded photo
+  is answered before it is even downloaded.
+* A 64-bit difference hash (dHash, computed by the image stage) per
+  user. The hash is split into four 16-bit bands; any hash within
+  ``PHASH_MAX_DISTANCE`` bits of a stored one shares at least one band
+  with it, so lookups only inspect four buckets.
+
+Only the exact indexes answer without OCR. A dHash this coarse cannot
+tell apart two receipts from the same store, so a near-duplicate is just
+a candidate: the photo is still read, and the handler treats it as a
+re-photographed copy only if both readings agree.
+
+Each cached result carries the ``image_digest`` of the photo first read
+for it, which ``save_receipt`` uses to avoid saving a resent receipt
+twice.
+
+Redis is used when configured (entries expire after ``OCR_CACHE_TTL``).
+Otherwise results live on local disk and the least recently used entries
+are evicted past ``OCR_CACHE_MAX_ENTRIES``.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.config.settings import settings
+from app.core.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+PHASH_BANDS = 4
+PHASH_MAX_DISTANCE = PHASH_BANDS - 1
+
+
+def _bands(phash: int) -> list[tuple[int, int]]:
+    return [(band, (phash >> (16 * band)) & 0xFFFF) for band in range(PHASH_BANDS)]
+
+
+class _RedisBackend:
+    def __init__(self, client):
+        self.client = client
+        self.ttl = settings.OCR_CACHE_TTL
+
+    async def digest_for_files(self, file_ids: list[str]) -> Optional[str]:
+        digests = await self.client.mget([f"ocr:file:{fid}" for fid in file_ids])
+        return next((d.decode() for d in digests if d), None)
+
+    async def result(self, digest: str) -> Optional[dict]:
+        raw = await self.client.get(f"ocr:res:{digest}")
+        return json.loads(raw) if raw else None
+
+    async def similar(self, user_id: int, phash: int) -> list[tuple[int, str]]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for band, value in _bands(phash):
+                pipe.hgetall(f"ocr:ph:{user_id}:{band}:{value}")
+            buckets = await pipe.execute()
+        return [(int(h), d.decode()) for bucket in buckets for h, d in bucket.items()]
+
+    async def put(self, digest: str, result: dict, file_ids: list[str], user_id: int, phash: Optional[int]) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(f"ocr:res:{digest}", json.dumps(result), ex=self.ttl)
+            for fid in file_ids:
+                pipe.set(f"ocr:file:{fid}", digest, ex=self.ttl)
+            if phash is not None:
+                for band, value in _bands(phash):
+                    key = f"ocr:ph:{user_id}:{band}:{value}"
+                    pipe.hset(key, str(phash), digest)
+                    pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+
+class _DiskBackend:
+    def __init__(self, root: Path, max_entries: int):
+        self.root = root
+        self.max_entries = max_entries
+
+    @staticmethod
+    def _safe(name: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_-]", "_", name)
+
+    async def digest_for_files(self, file_ids: list[str]) -> Optional[str]:
+        return await asyncio.to_thread(self._digest_for_files, file_ids)
+
+    def _digest_for_files(self, file_ids: list[str]) -> Optional[str]:
+        for fid in file_ids:
+            path = self.root / "files" / self._safe(fid)
+            if path.exists():
+                return path.read_text()
+        return None
+
+    async def result(self, digest: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._result, digest)
+
+    def _result(self, digest: str) -> Optional[dict]:
+        path = self.root / "results" / f"{digest}.json"
+        try:
+            result = json.loads(path.read_bytes())
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # mark as recently used
+        return result
+
+    async def similar(self, user_id: int, phash: int) -> list[tuple[int, str]]:
+        return await asyncio.to_thread(self._similar, user_id, phash)
+
+    def _similar(self, user_id: int, phash: int) -> list[tuple[int, str]]:
+        found = []
+        for band, value in _bands(phash):
+            path = self.root / "phash" / f"{user_id}_{band}_{value}"
+            if path.exists():
+                for line in path.read_text().splitlines():
+                    stored, digest = line.split(" ", 1)
+                    found.append((int(stored), digest))
+        return found
+
+    async def put(self, digest: str, result: dict, file_ids: list[str], user_id: int, phash: Optional[int]) -> None:
+        await asyncio.to_thread(self._put, digest, result, file_ids, user_id, phash)
+
+    def _put(self, digest: str, result: dict, file_ids: list[str], user_id: int, phash: Optional[int]) -> None:
+        for sub in ("results", "files", "phash"):
+            (self.root / sub).mkdir(parents=True, exist_ok=True)
+        tmp = self.root / "results" / f".{digest}.tmp"
+        tmp.write_text(json.dumps(result))
+        tmp.replace(self.root / "results" / f"{digest}.json")
+        for fid in file_ids:
+            (self.root / "files" / self._safe(fid)).write_text(digest)
+        if phash is not None:
+            for band, value in _bands(phash):
+                with open(self.root / "phash" / f"{user_id}_{band}_{value}", "a") as f:
+                    f.write(f"{phash} {digest}\n")
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = list((self.root / "results").glob("*.json"))
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda p: p.stat().st_mtime)
+        evicted = set()
+        for path in entries[: len(entries) - self.max_entries * 9 // 10]:
+            path.unlink(missing_ok=True)
+            evicted.add(path.stem)
+
+        # Drop the index entries that pointed at the evicted results
+        for path in (self.root / "files").iterdir():
+            if path.read_text() in evicted:
+                path.unlink(missing_ok=True)
+        for path in (self.root / "phash").iterdir():
+            lines = path.read_text().splitlines()
+            kept = [line for line in lines if line.split(" ", 1)[1] not in evicted]
+            if not kept:
+                path.unlink(missing_ok=True)
+            elif len(kept) < len(lines):
+                path.write_text("".join(f"{line}\n" for line in kept))
+
+
+class OCRCache:
+    def __init__(self):
+        if redis_client is not None:
+            self.backend = _RedisBackend(redis_client)
+        else:
+            self.backend = _DiskBackend(Path(settings.OCR_CACHE_DIR), settings.OCR_CACHE_MAX_ENTRIES)
+        self.hits = 0
+        self.misses = 0
+
+    async def lookup_files(self, file_ids: list[str]) -> Optional[Dict[str, Any]]:
+        """Result for any of the photo's Telegram file ids, before downloading."""
+        try:
+            digest = await self.backend.digest_for_files(file_ids)
+            result = await self.backend.result(digest) if digest else None
+        except Exception as e:
+            logger.warning("OCR cache lookup failed: %s", e)
+            return None
+        if result is None:
+            return None
+        self.hits += 1
+        result.setdefault("image_digest", digest)
+        return result
+
+    async def lookup_digest(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Result for byte-identical image content."""
+        try:
+            result = await self.backend.result(digest)
+        except Exception as e:
+            logger.warning("OCR cache lookup failed: %s", e)
+            return None
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        result.setdefault("image_digest", digest)
+        return result
+
+    async def lookup_similar(self, user_id: int, phash: Optional[int]) -> Optional[Dict[str, Any]]:
+        """Result of a near-duplicate photo previously sent by the same user.
+
+        A candidate only; it may be a different receipt with the same layout.
+        """
+        if phash is None:
+            return None
+        try:
+            for stored, digest in await self.backend.similar(user_id, phash):
+                if bin(stored ^ phash).count("1") <= PHASH_MAX_DISTANCE:
+                    result = await self.backend.result(digest)
+                    if result is not None:
+                        result.setdefault("image_digest", digest)
+                        return result
+        except Exception as e:
+            logger.warning("OCR cache lookup failed: %s", e)
+        return None
+
+    async def store(self, user_id: int, digest: str, phash: Optional[int], file_ids: list[str], result: Dict[str, Any]) -> None:
+        try:
+            await self.backend.put(digest, result, file_ids, user_id, phash)
+        except Exception as e:
+            logger.warning("OCR cache store failed: %s", e)
+
+ocr_cache = OCRCache()
@@ -1,31 +1,47 @@
 import logging
 from typing import List, Dict, Any
 from app.config.settings import settings
+from app.core.workers import run_in_worker
 
 logger = logging.getLogger(__name__)
 
 class OCRService:
     def __init__(self):
-        self.api_key = settings.google_vision_api_key
+        self.api_key = settings.GOOGLE_VISION_API_KEY
     
     async def process_receipt(self, image_data: bytes) -> Dict[str, Any]:
         try:
             if not self.api_key:
                 return self._dummy_receipt()
             
-            from google.cloud import vision
-            client = vision.ImageAnnotatorClient()
-            image = vision.Image(content=image_data)
-            response = client.document_text_detection(image=image)
-            
-            text = response.full_text_annotation.text
+            # The Vision client blocks, so it runs in the worker pool
+            text, confidence = await run_in_worker(self._detect_text, image_data)
             items = self._parse_items(text)
             
-            return {"success": True, "items": items, "text": text}
+            return {"success": True, "items": items, "text": text, "confidence": confidence}
         except Exception as e:
-            logger.error(f"OCR error: {e}")
+            logger.error("OCR error: %s", e)
             return {"success": False, "items": []}
     
+    def is_confident(self, result: Dict[str, Any]) -> bool:
+        """Whether a result is good enough to stop retrying at higher resolution."""
+        return bool(
+            result.get("success")
+            and result.get("items")
+            and result.get("confidence", 1.0) >= settings.OCR_MIN_CONFIDENCE
+        )
+    
+    def _detect_text(self, image_data: bytes) -> tuple[str, float]:
+        from google.cloud import vision
+        client = vision.ImageAnnotatorClient()
+        image = vision.Image(content=image_data)
+        response = client.document_text_detection(image=image)
+        
+        annotation = response.full_text_annotation
+        pages = annotation.pages
+        confidence = sum(page.confidence for page in pages) / len(pages) if pages else 0.0
+        return annotation.text, confidence
+    
     def _parse_items(self, text: str) -> List[Dict]:
         items = []
         for line in text.split('\n'):
@@ -44,7 +60,8 @@ class OCRService:
         return {
             "success": True,
             "items": [{"name": "Milk", "price": 5.50}],
-            "text": "Sample receipt"
+            "text": "Sample receipt",
+            "confidence": 1.0
         }
 
 ocr_service = OCRService()
@@ -0,0 +1,144 @@
+"""Monthly partitions of the append-only history tables.
+
+``receipt_items`` and ``price_history`` are range-partitioned by month on
+their timestamp (PostgreSQL only). Queries that bound the timestamp,
+such as stats windows, replenishment lookback, budget seeding and
+price-matrix refreshes, touch only the matching months. Their cost then
+follows the window, not the total history.
+
+``maintain`` runs at startup and daily:
+
+* creates the partitions from the current month to
+  ``PARTITION_PREMAKE_MONTHS`` ahead, named ``<table>_pYYYYMM``;
+* moves rows that landed in the ``<table>_default`` partition (inserted
+  before their month existed) into new monthly partitions;
+* with ``PARTITION_RETENTION_MONTHS`` set, detaches (or, with
+  ``PARTITION_RETENTION_ACTION=drop``, drops) the months older than that,
+  a catalog change instead of a large DELETE. Detached months stay as
+  plain tables for archiving.
+
+Tables created before partitioning are left alone with a warning.
+
+    python -m app.services.partition_service
+"""
+import asyncio
+import logging
+import re
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.config.settings import settings
+from app.core.database import engine
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED = {
+    "receipt_items": "created_at",
+    "price_history": "recorded_at",
+}
+# Serializes maintenance across replicas
+LOCK_KEY = 0x5053_5054  # "PSPT"
+
+
+def month_start(day: date, offset: int = 0) -> date:
+    months = day.year * 12 + day.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+class PartitionService:
+    async def maintain(self, today: Optional[date] = None) -> dict[str, dict[str, int]]:
+        """Create upcoming months and apply retention; returns counts per table."""
+        if engine.dialect.name != "postgresql":
+            return {}
+        today = today or datetime.utcnow().date()
+        report = {}
+        async with engine.begin() as conn:
+            await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+            for table, column in PARTITIONED.items():
+                if not await self._is_partitioned(conn, table):
+                    logger.warning("%s is not partitioned; recreate it from init.sql to enable partitioning", table)
+                    continue
+                report[table] = await self._maintain_table(conn, table, column, today)
+        logger.info("Partition maintenance: %s", report)
+        return report
+
+    async def _maintain_table(self, conn, table: str, column: str, today: date) -> dict[str, int]:
+        default = f"{table}_default"
+        await conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{default}" PARTITION OF "{table}" DEFAULT'))
+        existing = await self._months(conn, table)
+
+        stray = (await conn.execute(
+            text(f'SELECT DISTINCT date_trunc(\'month\', "{column}")::date FROM "{default}"')
+        )).scalars().all()
+        wanted = {month_start(today, offset) for offset in range(settings.PARTITION_PREMAKE_MONTHS + 1)}
+        wanted.update(stray)
+        created = 0
+        for month in sorted(wanted - existing.keys()):
+            await self._create(conn, table, column, month, month in stray)
+            created += 1
+
+        removed = 0
+        if settings.PARTITION_RETENTION_MONTHS > 0:
+            cutoff = month_start(today, -settings.PARTITION_RETENTION_MONTHS)
+            for month, name in sorted(existing.items()):
+                if month >= cutoff:
+                    break
+                await conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+                if settings.PARTITION_RETENTION_ACTION == "drop":
+                    await conn.execute(text(f'DROP TABLE "{name}"'))
+                removed += 1
+        return {"created": created, "removed": removed}
+
+    @staticmethod
+    async def _create(conn, table: str, column: str, month: date, has_stray_rows: bool) -> None:
+        name = partition_name(table, month)
+        lo, hi = month, month_start(month, 1)
+        default = f"{table}_default"
+        if has_stray_rows:
+            # The new range must not overlap rows still in the default partition
+            await conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{default}"'))
+        await conn.execute(text(
+            f'CREATE TABLE "{name}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM ('{lo}') TO ('{hi}')"
+        ))
+        if has_stray_rows:
+            moved = await conn.execute(text(
+                f'WITH moved AS (DELETE FROM "{default}" WHERE "{column}" >= :lo AND "{column}" < :hi RETURNING *) '
+                f'INSERT INTO "{table}" SELECT * FROM moved'
+            ), {"lo": lo, "hi": hi})
+            await conn.execute(text(f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT'))
+            logger.info("Moved %s rows from %s into %s", moved.rowcount, default, name)
+
+    @staticmethod
+    async def _is_partitioned(conn, table: str) -> bool:
+        kind = (await conn.execute(
+            text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:table)"), {"table": table}
+        )).scalar()
+        return kind == "p"
+
+    @staticmethod
+    async def _months(conn, table: str) -> dict[date, str]:
+        """Attached monthly partitions of ``table`` by first day of month."""
+        names = (await conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ), {"table": table})).scalars().all()
+        pattern = re.compile(rf"^{re.escape(table)}_p(\d{{4}})(\d{{2}})$")
+        months = {}
+        for name in names:
+            match = pattern.match(name)
+            if match:
+                months[date(int(match[1]), int(match[2]), 1)] = name
+        return months
+
+partition_service = PartitionService()
+
+
+if __name__ == "__main__":
+    asyncio.run(partition_service.maintain())
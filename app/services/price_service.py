@@ -0,0 +1,272 @@
+"""Store prices and the cheapest-store comparison behind /compare.
+
+Every priced receipt line is appended to ``price_history`` with its
+store. ``PriceMatrix`` keeps the latest price of each product at each
+store in a float32 product x store array, in ``DEFAULT_CURRENCY``,
+NaN where a store has no price. Refreshes read the rows recorded since
+``REFRESH_SLACK`` before the newest one already loaded, so on a
+partitioned ``price_history`` only the latest month is scanned. A row
+that commits after later-stamped ones is still picked up within that
+window. Rows read twice are harmless: each cell keeps the latest price.
+
+A comparison takes the list's rows of the matrix. A single-store basket
+is a column sum. A two-store split takes each item from the cheaper of
+the two stores. Baskets are ranked by how many items they cover, then
+by cost. Coverage of every store pair comes from one matrix product of
+the "has a price" mask, and costs are computed only for the pairs with
+the best coverage, in blocks of ``PAIR_BLOCK_CELLS``.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.config.settings import settings
+from app.core.database import AsyncSessionLocal
+from app.models.product import PriceHistory, Product
+from app.services.currency_service import currency_service
+from app.services.recommendation_service import normalize_item
+
+logger = logging.getLogger(__name__)
+
+FETCH_CHUNK = 50_000
+# Item x pair cells priced at once when costing two-store splits
+PAIR_BLOCK_CELLS = 1 << 20
+# Rows can commit a little after later-stamped ones; refreshes look back this far
+REFRESH_SLACK = timedelta(minutes=10)
+
+
+class Basket(NamedTuple):
+    stores: tuple[str, ...]
+    total: float
+    covered: int
+    picks: dict[str, str]  # item -> store it is bought at (two-store splits)
+
+
+class Comparison(NamedTuple):
+    items: int
+    unpriced: list[str]
+    single: list[Basket]
+    split: Optional[Basket]
+
+
+class Deal(NamedTuple):
+    item: str
+    store: str
+    price: float
+    saving: float  # fraction below the dearest store's price
+
+
+class PriceMatrix:
+    def __init__(self):
+        self.product_rows: dict[str, int] = {}
+        self.store_cols: dict[str, int] = {}
+        self.store_names: list[str] = []
+        self.prices = np.full((0, 0), np.nan, dtype=np.float32)
+        self.last_recorded_at: Optional[datetime] = None
+        self.refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _row(self, name: str) -> int:
+        row = self.product_rows.get(name)
+        if row is None:
+            row = self.product_rows[name] = len(self.product_rows)
+        return row
+
+    def _col(self, store: str) -> int:
+        key = normalize_item(store)
+        col = self.store_cols.get(key)
+        if col is None:
+            col = self.store_cols[key] = len(self.store_names)
+            self.store_names.append(store.strip())
+        return col
+
+    def _grow(self) -> None:
+        rows, cols = self.prices.shape
+        need_rows, need_cols = len(self.product_rows), len(self.store_names)
+        if need_rows <= rows and need_cols <= cols:
+            return
+        grown = np.full((max(need_rows, rows * 2, 64), max(need_cols, cols * 2, 16)), np.nan, dtype=np.float32)
+        grown[:rows, :cols] = self.prices
+        self.prices = grown
+
+    async def refresh(self) -> int:
+        """Load price rows recorded since shortly before the last refresh; returns how many."""
+        async with self._lock:
+            stmt = (
+                select(
+                    Product.name, PriceHistory.store, PriceHistory.price,
+                    PriceHistory.currency, PriceHistory.recorded_at,
+                )
+                .join(Product, PriceHistory.product_id == Product.id)
+                .where(PriceHistory.price > 0, PriceHistory.store.is_not(None))
+                .order_by(PriceHistory.recorded_at, PriceHistory.id)
+                .execution_options(yield_per=FETCH_CHUNK)
+            )
+            if self.last_recorded_at is not None:
+                stmt = stmt.where(PriceHistory.recorded_at >= self.last_recorded_at - REFRESH_SLACK)
+            loaded = 0
+            async with AsyncSessionLocal() as session:
+                result = await session.stream(stmt)
+                async for rows in result.partitions():
+                    self._apply(rows)
+                    loaded += len(rows)
+            self.refreshed_at = time.monotonic()
+            if loaded:
+                logger.info(
+                    "Price matrix: %s prices read, %s products x %s stores",
+                    loaded, len(self.product_rows), len(self.store_names)
+                )
+            return loaded
+
+    def _apply(self, rows: Sequence) -> None:
+        names, stores, prices, currencies, recorded = zip(*rows)
+        product = np.fromiter(map(self._row, names), np.intp, len(rows))
+        store = np.fromiter(map(self._col, stores), np.intp, len(rows))
+        values = currency_service.convert_many(np.array(prices, dtype=np.float64), currencies, settings.DEFAULT_CURRENCY)
+        # Rows arrive oldest first: keep the last price of each (product, store)
+        cells = product * (len(self.store_names) + 1) + store
+        _, last = np.unique(cells[::-1], return_index=True)
+        last = len(rows) - 1 - last
+        last = last[~np.isnan(values[last])]  # no rate for the currency
+        self._grow()
+        self.prices[product[last], store[last]] = values[last]
+        newest = max(recorded)
+        if self.last_recorded_at is None or newest > self.last_recorded_at:
+            self.last_recorded_at = newest
+
+    def compare(self, names: Sequence[str], top: int = 3) -> Comparison:
+        """Rank single-store baskets and the best two-store split for ``names``."""
+        wanted = list(dict.fromkeys(normalize_item(name) for name in names))
+        rows = [self.product_rows[name] for name in wanted if name in self.product_rows]
+        unpriced = [name for name in wanted if name not in self.product_rows]
+        priced = [name for name in wanted if name in self.product_rows]
+        prices = self.prices[rows, :len(self.store_names)] if rows else np.empty((0, 0), dtype=np.float32)
+
+        candidates = np.flatnonzero(~np.isnan(prices).all(axis=0)) if rows else np.empty(0, dtype=np.intp)
+        if not len(candidates):
+            return Comparison(len(wanted), unpriced + priced, [], None)
+        prices = prices[:, candidates]
+        known = ~np.isnan(prices)
+
+        covered = known.sum(axis=0)
+        totals = np.where(known, prices, 0).sum(axis=0, dtype=np.float64)
+        order = np.lexsort((totals, -covered))[:top]
+        single = [
+            Basket((self.store_names[candidates[i]],), float(totals[i]), int(covered[i]), {})
+            for i in order
+        ]
+        return Comparison(len(wanted), unpriced, single, self._best_split(prices, known, candidates, priced))
+
+    def deals(self, names: Sequence[str], top: int = 3) -> list[Deal]:
+        """Cheapest store of each of ``names`` priced at two or more stores, biggest saving first."""
+        wanted = [name for name in dict.fromkeys(map(normalize_item, names)) if name in self.product_rows]
+        if not wanted:
+            return []
+        prices = self.prices[[self.product_rows[name] for name in wanted], :len(self.store_names)]
+        known = ~np.isnan(prices)
+        cheapest = np.where(known, prices, np.inf).min(axis=1)
+        dearest = np.where(known, prices, -np.inf).max(axis=1)
+        saving = np.where(known.sum(axis=1) >= 2, 1 - cheapest / dearest, 0)
+        return [
+            Deal(wanted[i], self.store_names[int(np.argmin(np.where(known[i], prices[i], np.inf)))],
+                 float(cheapest[i]), float(saving[i]))
+            for i in np.argsort(-saving)[:top]
+            if saving[i] > 0
+        ]
+
+    def _best_split(self, prices: np.ndarray, known: np.ndarray, candidates: np.ndarray,
+                    names: list[str]) -> Optional[Basket]:
+        items, stores = prices.shape
+        if stores < 2:
+            return None
+        # Items covered by each pair: |A| + |B| - |A & B|, the overlaps from one product
+        k = known.astype(np.float32)
+        counts = k.sum(axis=0)
+        covered = counts[:, None] + counts[None, :] - k.T @ k
+        covered[np.tril_indices(stores)] = -1  # only pairs a < b
+        first, second = np.nonzero(covered == covered.max())
+
+        # Costs only for the pairs with the best coverage
+        # Store-major, so each pair gathers two contiguous rows
+        by_store = np.ascontiguousarray(np.where(known, prices, np.inf).T)
+        complete = covered.max() == items  # then no item is missing from both stores
+        best, best_total = 0, np.inf
+        step = max(1, PAIR_BLOCK_CELLS // items)
+        for start in range(0, len(first), step):
+            cheapest = np.minimum(by_store[first[start:start + step]], by_store[second[start:start + step]])
+            if not complete:
+                cheapest[np.isinf(cheapest)] = 0
+            totals = cheapest.sum(axis=1)
+            i = int(np.argmin(totals))
+            if totals[i] < best_total:
+                best, best_total = start + i, float(totals[i])
+
+        a, b = first[best], second[best]
+        pick_b = by_store[b] < by_store[a]
+        picks = {
+            name: self.store_names[candidates[b if use_b else a]]
+            for name, use_b, ok in zip(names, pick_b, known[:, a] | known[:, b])
+            if ok
+        }
+        return Basket(
+            (self.store_names[candidates[a]], self.store_names[candidates[b]]),
+            best_total, int(round(covered[a, b])), picks
+        )
+
+
+class PriceService:
+    def __init__(self):
+        self.matrix = PriceMatrix()
+
+    async def record(self, session, store: Optional[str], currency: str,
+                     lines: list[tuple[str, Optional[float]]]) -> None:
+        """Append a receipt's (name, price) lines to the price history; call before its commit."""
+        if not store or store == "Unknown":
+            return
+        prices = {}
+        for name, price in lines:
+            key = normalize_item(name)[:255]
+            if key and price and price > 0:
+                prices[key] = price
+        if not prices:
+            return
+        product_ids = await self._product_ids(session, list(prices))
+        await session.execute(insert(PriceHistory), [
+            {"product_id": product_ids[name], "price": price, "currency": currency, "store": store[:255]}
+            for name, price in prices.items()
+        ])
+
+    @staticmethod
+    async def _product_ids(session, names: list[str]) -> dict[str, int]:
+        query = select(Product.name, Product.id).where(Product.name.in_(names))
+        ids = dict((await session.execute(query)).all())
+        missing = sorted(name for name in names if name not in ids)
+        if missing:
+            # Another receipt may add some of them first; keep its rows
+            await session.execute(
+                pg_insert(Product)
+                .values([{"name": name} for name in missing])
+                .on_conflict_do_nothing(index_elements=[Product.name])
+            )
+            ids = dict((await session.execute(query)).all())
+        return ids
+
+    async def compare(self, names: Sequence[str]) -> Comparison:
+        await self._fresh()
+        return self.matrix.compare(names)
+
+    async def deals(self, names: Sequence[str]) -> list[Deal]:
+        await self._fresh()
+        return self.matrix.deals(names)
+
+    async def _fresh(self) -> None:
+        if time.monotonic() - self.matrix.refreshed_at > settings.PRICE_MATRIX_MAX_AGE:
+            await self.matrix.refresh()
+
+price_service = PriceService()
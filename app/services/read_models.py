@@ -0,0 +1,155 @@
+"""Column-only read models for the hot read paths.
+
+/list, /shop, /suggestions, /compare, /stats, /budget and the REST API
+only read a few attributes of the user, their lists, items and receipts. Loading ORM
+objects for that builds an identity map entry and instance state per
+row, and the session then tracks those objects for changes that never
+happen. Here each record is a ``NamedTuple`` (a plain tuple with
+``__slots__ = ()``) filled straight from a prebuilt column-only select.
+
+Records are read-only snapshots. Writes keep going through the ORM
+models and ``list_service``. ``python -m benchmarks.bench_read_models``
+compares both paths on a 1,000-item list.
+"""
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.shopping import ShoppingItem
+from app.models.shopping_list import ListMember, ShoppingList
+from app.models.user import User
+from app.services.history_service import history_service
+from app.services.write_buffer import write_buffer
+
+# Receipt ids are SERIAL; paging starts below this
+MAX_RECEIPT_ID = 2**31 - 1
+
+
+class UserView(NamedTuple):
+    id: int
+    currency: Optional[str]
+    language: Optional[str]
+    timezone: Optional[str]
+    created_at: Optional[datetime]
+
+
+class ListView(NamedTuple):
+    id: int
+    name: str
+    is_shared: bool
+    version: int
+
+
+class ItemView(NamedTuple):
+    id: int
+    name: str
+    is_bought: bool
+
+
+class ReceiptView(NamedTuple):
+    id: int
+    store_name: str
+    total_amount: float
+    currency: str
+    items_count: Optional[int]
+    created_at: datetime
+
+
+class ReceiptLineView(NamedTuple):
+    product_name: str
+    quantity: Optional[str]
+    price: Optional[float]
+    category: str
+
+
+def _columns(model, record):
+    return [getattr(model, name) for name in record._fields]
+
+
+def _subquery_columns(subquery, record):
+    return [subquery.c[name] for name in record._fields]
+
+
+class ReadModels:
+    def __init__(self):
+        self._user = select(*_columns(User, UserView)).where(User.id == bindparam("user_id"))
+        self._list = select(*_columns(ShoppingList, ListView)).where(ShoppingList.id == bindparam("list_id"))
+        self._active_list = (
+            select(*_columns(ShoppingList, ListView))
+            .join(User, User.active_list_id == ShoppingList.id)
+            .where(User.id == bindparam("user_id"))
+        )
+        self._lists = (
+            select(*_columns(ShoppingList, ListView))
+            .join(ListMember, ListMember.list_id == ShoppingList.id)
+            .where(ListMember.user_id == bindparam("user_id"))
+            .order_by(ShoppingList.id)
+        )
+        self._items = (
+            select(*_columns(ShoppingItem, ItemView))
+            .where(ShoppingItem.list_id == bindparam("list_id"), ShoppingItem.archived_at.is_(None))
+            .order_by(ShoppingItem.id)
+        )
+        # Receipts and their lines include archived ones
+        receipts, lines = history_service.receipts, history_service.receipt_items
+        self._receipts = (
+            select(*_subquery_columns(receipts, ReceiptView))
+            .where(receipts.c.user_id == bindparam("user_id"), receipts.c.id < bindparam("before"))
+            .order_by(receipts.c.id.desc())
+            .limit(bindparam("limit"))
+        )
+        self._receipt = (
+            select(*_subquery_columns(receipts, ReceiptView))
+            .where(receipts.c.user_id == bindparam("user_id"), receipts.c.id == bindparam("receipt_id"))
+        )
+        self._receipt_lines = (
+            select(*_subquery_columns(lines, ReceiptLineView))
+            .where(lines.c.user_id == bindparam("user_id"), lines.c.receipt_id == bindparam("receipt_id"))
+            .order_by(lines.c.id)
+        )
+
+    async def user(self, session: AsyncSession, user_id: int) -> Optional[UserView]:
+        row = (await session.execute(self._user, {"user_id": user_id})).first()
+        return UserView._make(row) if row else None
+
+    async def shopping_list(self, session: AsyncSession, list_id: int) -> Optional[ListView]:
+        row = (await session.execute(self._list, {"list_id": list_id})).first()
+        return ListView._make(row) if row else None
+
+    async def active_list(self, session: AsyncSession, user_id: int) -> Optional[ListView]:
+        row = (await session.execute(self._active_list, {"user_id": user_id})).first()
+        return ListView._make(row) if row else None
+
+    async def lists(self, session: AsyncSession, user_id: int) -> list[ListView]:
+        """Every list the user is a member of."""
+        result = await session.execute(self._lists, {"user_id": user_id})
+        return list(map(ListView._make, result.tuples()))
+
+    async def items(self, session: AsyncSession, list_id: int) -> list[ItemView]:
+        """Items on the list in display order, including ones still in the write buffer."""
+        await write_buffer.barrier(list_id)
+        result = await session.execute(self._items, {"list_id": list_id})
+        return list(map(ItemView._make, result.tuples()))
+
+    async def receipts(
+        self, session: AsyncSession, user_id: int, limit: int, before: Optional[int] = None
+    ) -> list[ReceiptView]:
+        """The user's receipts, newest first, with ids below ``before``."""
+        result = await session.execute(
+            self._receipts, {"user_id": user_id, "before": before or MAX_RECEIPT_ID, "limit": limit}
+        )
+        return list(map(ReceiptView._make, result.tuples()))
+
+    async def receipt(
+        self, session: AsyncSession, user_id: int, receipt_id: int
+    ) -> Optional[tuple[ReceiptView, list[ReceiptLineView]]]:
+        params = {"user_id": user_id, "receipt_id": receipt_id}
+        row = (await session.execute(self._receipt, params)).first()
+        if row is None:
+            return None
+        result = await session.execute(self._receipt_lines, params)
+        return ReceiptView._make(row), list(map(ReceiptLineView._make, result.tuples()))
+
+read_models = ReadModels()
@@ -0,0 +1,207 @@
+"""Item co-occurrence recommendations trained from shopping and receipt history.
+
+Baskets are the lines of one receipt, or the items a user added to their
+list on one day. Training accumulates an item x item co-occurrence count
+matrix (``B.T @ B`` over a sparse basket x item matrix) and derives an
+association score for every pair:
+
+    confidence(i -> j) = count(i, j) / count(i)
+    lift(i, j)         = count(i, j) * baskets / (count(i) * count(j))
+    score(i -> j)      = confidence * log(lift), kept when positive
+
+The top neighbours of each item are stored in dense arrays, so serving a
+list is a handful of array lookups with no I/O. Retraining is incremental:
+only receipts and list days that appeared since the previous run are
+folded into the counts, then the neighbour arrays are rebuilt and swapped in.
+"""
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple
+
+import numpy as np
+import scipy.sparse as sp
+from sqlalchemy import func, select
+
+from app.config.settings import settings
+from app.core.database import AsyncSessionLocal
+from app.models.receipt import ReceiptItem
+from app.models.shopping import ShoppingItem
+
+logger = logging.getLogger(__name__)
+
+# Pairs seen together fewer times than this are treated as noise
+MIN_PAIR_COUNT = 2
+# Receipts younger than this may still be committing and are left for the next run
+SETTLE_DELAY = timedelta(minutes=1)
+
+
+def normalize_item(name: str) -> str:
+    """Canonical form used to match item names across lists and receipts."""
+    return " ".join(name.lower().split())
+
+
+class _Snapshot(NamedTuple):
+    vocab: dict[str, int]
+    names: list[str]
+    neighbours: np.ndarray  # (items, k) int32, -1 padded
+    scores: np.ndarray      # (items, k) float32
+    popular: np.ndarray     # item indices by descending support
+
+
+_EMPTY = _Snapshot({}, [], np.empty((0, 0), np.int32), np.empty((0, 0), np.float32), np.empty(0, np.int32))
+
+
+class RecommendationService:
+    def __init__(self):
+        self._snapshot = _EMPTY
+        self._vocab: dict[str, int] = {}
+        self._names: list[str] = []
+        self._counts = sp.csr_matrix((0, 0), dtype=np.int32)
+        self._baskets = 0
+        self._receipt_watermark = 0
+        self._receipt_cutoff: datetime | None = None
+        self._list_watermark: date | None = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_trained(self) -> bool:
+        return bool(self._snapshot.names)
+
+    def recommend(self, current_items: list[str], k: int = 5) -> list[str]:
+        """Top-k complements for the given list, most relevant first."""
+        snap = self._snapshot
+        if not snap.names:
+            return []
+
+        present = {snap.vocab[n] for n in map(normalize_item, current_items) if n in snap.vocab}
+        if present:
+            rows = np.fromiter(present, dtype=np.intp, count=len(present))
+            candidates = snap.neighbours[rows].ravel()
+            weights = snap.scores[rows].ravel()
+            valid = candidates >= 0
+            items, inverse = np.unique(candidates[valid], return_inverse=True)
+            totals = np.bincount(inverse, weights=weights[valid])
+            ranked = items[np.argsort(-totals, kind="stable")]
+        else:
+            ranked = np.empty(0, np.int32)
+
+        picked: list[str] = []
+        for idx in np.concatenate((ranked, snap.popular)):
+            idx = int(idx)
+            if idx in present:
+                continue
+            present.add(idx)
+            picked.append(snap.names[idx])
+            if len(picked) == k:
+                break
+        return picked
+
+    async def retrain(self) -> None:
+        """Fold new history into the model and publish a fresh snapshot."""
+        async with self._lock:
+            baskets, watermarks = await self._load_new_baskets()
+            if baskets or not self.is_trained:
+                await asyncio.to_thread(self._fit, baskets)
+                logger.info(
+                    "Recommender trained on %s baskets, %s items (+%s new baskets)",
+                    self._baskets, len(self._names), len(baskets)
+                )
+            # Only once the baskets are in the model, so a failed load or fit retries them
+            self._receipt_watermark, self._receipt_cutoff, self._list_watermark = watermarks
+
+    async def _load_new_baskets(self) -> tuple[list[list[int]], tuple]:
+        """Baskets since the watermarks, and the watermarks to advance to once they are fitted."""
+        now = datetime.utcnow()
+        today = now.date()
+        grouped: dict[tuple, set[int]] = {}
+        receipt_watermark = self._receipt_watermark
+
+        async with AsyncSessionLocal() as session:
+            receipt_stmt = select(ReceiptItem.receipt_id, ReceiptItem.product_name).where(
+                ReceiptItem.receipt_id > self._receipt_watermark,
+                ReceiptItem.created_at < now - SETTLE_DELAY,
+            )
+            if self._receipt_cutoff is not None:
+                # Only the recent partitions of receipt_items are scanned
+                receipt_stmt = receipt_stmt.where(ReceiptItem.created_at >= self._receipt_cutoff - SETTLE_DELAY)
+            receipt_rows = await session.stream(
+                receipt_stmt.order_by(ReceiptItem.receipt_id).execution_options(yield_per=5000)
+            )
+            async for receipt_id, name in receipt_rows:
+                grouped.setdefault(("r", receipt_id), set()).add(self._index(name))
+                receipt_watermark = receipt_id
+
+            # A list day only becomes a basket once the day is over
+            list_stmt = select(
+                ShoppingItem.user_id, func.date(ShoppingItem.created_at), ShoppingItem.name
+            ).where(ShoppingItem.created_at < datetime.combine(today, time.min))
+            if self._list_watermark is not None:
+                list_stmt = list_stmt.where(
+                    ShoppingItem.created_at >= datetime.combine(self._list_watermark, time.min)
+                )
+            list_rows = await session.stream(list_stmt.execution_options(yield_per=5000))
+            async for user_id, day, name in list_rows:
+                grouped.setdefault(("l", user_id, day), set()).add(self._index(name))
+
+        baskets = [sorted(items) for items in grouped.values() if len(items) > 1]
+        return baskets, (receipt_watermark, now - SETTLE_DELAY, today)
+
+    def _index(self, name: str) -> int:
+        key = normalize_item(name)
+        idx = self._vocab.get(key)
+        if idx is None:
+            idx = self._vocab[key] = len(self._names)
+            self._names.append(name.strip())
+        return idx
+
+    def _fit(self, baskets: list[list[int]]) -> None:
+        n_items = len(self._names)
+        if baskets:
+            indptr = np.cumsum([0] + [len(b) for b in baskets])
+            indices = np.fromiter((i for b in baskets for i in b), dtype=np.int32, count=indptr[-1])
+            data = np.ones(len(indices), dtype=np.int32)
+            basket_matrix = sp.csr_matrix((data, indices, indptr), shape=(len(baskets), n_items))
+            delta = (basket_matrix.T @ basket_matrix).tocsr()
+        else:
+            delta = sp.csr_matrix((n_items, n_items), dtype=np.int32)
+
+        counts = self._counts.copy()
+        counts.resize((n_items, n_items))
+        counts = (counts + delta).tocsr()
+        # Nothing is kept unless the snapshot builds, so a retry does not count baskets twice
+        snapshot = self._build_snapshot(counts, self._baskets + len(baskets))
+        self._counts, self._baskets, self._snapshot = counts, self._baskets + len(baskets), snapshot
+
+    def _build_snapshot(self, counts: sp.csr_matrix, n_baskets: int) -> _Snapshot:
+        k = settings.RECOMMENDER_NEIGHBOURS
+        n_items = counts.shape[0]
+        support = counts.diagonal().astype(np.float64)
+
+        pairs = counts.tocoo()
+        keep = (pairs.row != pairs.col) & (pairs.data >= MIN_PAIR_COUNT)
+        rows, cols = pairs.row[keep], pairs.col[keep]
+        together = pairs.data[keep].astype(np.float64)
+        confidence = together / support[rows]
+        lift = together * n_baskets / (support[rows] * support[cols])
+        score = confidence * np.log(lift)
+        positive = score > 0
+        rows, cols, score = rows[positive], cols[positive], score[positive]
+
+        # Rank neighbours within each row and keep the first k
+        order = np.lexsort((-score, rows))
+        rows, cols, score = rows[order], cols[order], score[order]
+        row_start = np.searchsorted(rows, np.arange(n_items))
+        rank = np.arange(len(rows)) - row_start[rows]
+        top = rank < k
+
+        neighbours = np.full((n_items, k), -1, dtype=np.int32)
+        scores = np.zeros((n_items, k), dtype=np.float32)
+        neighbours[rows[top], rank[top]] = cols[top]
+        scores[rows[top], rank[top]] = score[top]
+
+        popular = np.argsort(-support, kind="stable")[: max(k, 50)]
+        popular = popular[support[popular] > 0].astype(np.int32)
+        return _Snapshot(dict(self._vocab), list(self._names), neighbours, scores, popular)
+
+recommendation_service = RecommendationService()
@@ -0,0 +1,183 @@
+"""Daily list reminders at each user's local time.
+
+Users pick a local time and an IANA timezone with /remind. The next
+reminder is stored as a UTC minute in ``users.next_reminder_at``, so every
+minute the job picks its bucket (all rows due by now) with one indexed
+range scan, however the users are spread across timezones.
+
+Rows are claimed with ``UPDATE ... RETURNING`` that sets a short lease.
+``FOR UPDATE SKIP LOCKED`` plus the lease check keep two replicas from
+claiming the same user. A row is acknowledged (next day scheduled, lease
+cleared) right after its message goes out. A batch can take longer than
+the lease, so once less than half of ``REMINDER_LEASE_SECONDS`` is left
+the replica renews the lease on its unsent rows. The renewal only
+matches rows still carrying its own lease, and a row whose lease was
+lost to another replica is dropped rather than sent twice. A replica
+that dies mid-bucket stops renewing; its leases expire and the
+unacknowledged users are picked up again.
+
+Sends inside a bucket are spread over ``REMINDER_JITTER_SECONDS`` rather
+than fired at once. Users whose active list has nothing left to buy are
+acknowledged without a message; the claim checks that with ``EXISTS``
+instead of loading their items.
+"""
+import asyncio
+import logging
+import random
+from datetime import datetime, time, timedelta, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import bindparam, exists, or_, select, update
+
+from app.config.settings import settings
+from app.core.database import AsyncSessionLocal
+from app.models.shopping import ShoppingItem
+from app.models.user import User
+from app.services.notification_service import notification_service
+from app.services.replenishment_service import replenishment_service
+
+logger = logging.getLogger(__name__)
+
+
+def next_occurrence(at: time, tz_name: Optional[str], after: datetime) -> datetime:
+    """First local ``at`` strictly after ``after`` (naive UTC), as naive UTC."""
+    tz = ZoneInfo(tz_name or settings.DEFAULT_TIMEZONE)
+    local = after.replace(tzinfo=timezone.utc).astimezone(tz)
+    candidate = datetime.combine(local.date(), at, tz)
+    if candidate <= local:
+        candidate = datetime.combine(local.date() + timedelta(days=1), at, tz)
+    return candidate.astimezone(timezone.utc).replace(tzinfo=None, second=0, microsecond=0)
+
+
+def _lease_free():
+    return or_(User.reminder_lease_until.is_(None), User.reminder_lease_until < bindparam("now"))
+
+
+_due = (
+    select(User.id)
+    .where(User.next_reminder_at <= bindparam("now"), _lease_free())
+    .order_by(User.next_reminder_at)
+    .limit(bindparam("batch"))
+    .with_for_update(skip_locked=True)
+)
+_has_items = (
+    exists()
+    .where(
+        ShoppingItem.list_id == User.active_list_id,
+        ShoppingItem.archived_at.is_(None),
+        ShoppingItem.is_bought.is_(False),
+    )
+    .label("has_items")
+)
+CLAIM = (
+    update(User)
+    .where(User.id.in_(_due.scalar_subquery()), _lease_free())
+    .values(reminder_lease_until=bindparam("until"))
+    .returning(User.id, User.timezone, User.reminder_time, _has_items)
+    .execution_options(synchronize_session=False)
+)
+_users = User.__table__
+RENEW = (
+    update(_users)
+    .where(
+        _users.c.id.in_(bindparam("uids", expanding=True)),
+        _users.c.reminder_lease_until == bindparam("held"),
+    )
+    .values(reminder_lease_until=bindparam("until"))
+    .returning(_users.c.id)
+)
+ACK = (
+    update(_users)
+    .where(_users.c.id == bindparam("uid"))
+    .values(next_reminder_at=bindparam("next_at"), reminder_lease_until=None)
+)
+
+
+class ReminderService:
+    async def schedule(self, user_id: int, at: Optional[time], tz_name: Optional[str]) -> Optional[datetime]:
+        """Set (or with ``at=None`` turn off) a user's reminder; returns the next one in UTC."""
+        next_at = next_occurrence(at, tz_name, datetime.utcnow()) if at else None
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(User)
+                .where(User.id == user_id)
+                .values(reminder_time=at, timezone=tz_name, next_reminder_at=next_at, reminder_lease_until=None)
+            )
+            await session.commit()
+        return next_at
+
+    async def run_bucket(self) -> int:
+        """Send every reminder due by now; returns the number sent."""
+        sent = 0
+        while True:
+            claimed, until = await self._claim()
+            if not claimed:
+                return sent
+            sent += await self._deliver(claimed, until)
+            if len(claimed) < settings.REMINDER_BATCH:
+                return sent
+
+    async def _claim(self) -> tuple[list, datetime]:
+        """Claim a batch of due users; returns them and their lease expiry."""
+        now = datetime.utcnow()
+        until = now + timedelta(seconds=settings.REMINDER_JITTER_SECONDS + settings.REMINDER_LEASE_SECONDS)
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(
+                CLAIM, {"now": now, "until": until, "batch": settings.REMINDER_BATCH}
+            )).all()
+            await session.commit()
+        return rows, until
+
+    async def _deliver(self, claimed: list, until: datetime) -> int:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        recipients = [row for row in claimed if row.has_items]
+        offsets = sorted(random.uniform(0, settings.REMINDER_JITTER_SECONDS) for _ in recipients)
+        sent = 0
+        async with AsyncSessionLocal() as session:
+            # Users with nothing to buy are acknowledged together, up front
+            skipped = [row for row in claimed if not row.has_items]
+            if skipped:
+                await self._ack(session, skipped)
+            pending = {row.id for row in recipients}
+            for offset, row in zip(offsets, recipients):
+                delay = offset - (loop.time() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if (until - datetime.utcnow()).total_seconds() < settings.REMINDER_LEASE_SECONDS / 2:
+                    pending, until = await self._renew(session, pending, until)
+                if row.id not in pending:
+                    continue
+                due = [product for product, _ in await replenishment_service.due_items(session, row.id)]
+                # Telegram private chat ids equal user ids
+                sent += await notification_service.daily_reminder(row.id, due)
+                await self._ack(session, [row])
+                pending.discard(row.id)
+        logger.info("Sent %s of %s due reminders", sent, len(claimed))
+        return sent
+
+    @staticmethod
+    async def _renew(session, pending: set[int], held: datetime) -> tuple[set[int], datetime]:
+        """Extend the lease on unsent rows; returns the rows still ours and the new expiry."""
+        until = datetime.utcnow() + timedelta(seconds=settings.REMINDER_LEASE_SECONDS)
+        renewed = set((await session.execute(
+            RENEW, {"uids": list(pending), "held": held, "until": until}
+        )).scalars())
+        await session.commit()
+        if len(renewed) < len(pending):
+            logger.warning(
+                "Reminder lease lost for %s users; leaving them to the other replica", len(pending) - len(renewed)
+            )
+        return renewed, until
+
+    @staticmethod
+    async def _ack(session, rows: list) -> None:
+        now = datetime.utcnow()
+        await session.execute(ACK, [
+            {"uid": row.id, "next_at": next_occurrence(row.reminder_time, row.timezone, now) if row.reminder_time else None}
+            for row in rows
+        ])
+        await session.commit()
+
+reminder_service = ReminderService()
@@ -0,0 +1,167 @@
+"""Nightly estimation of when each user will next buy each product.
+
+The batch reads one row per (user, product, purchase day) from receipt
+history, then computes every series at once with NumPy: rows are sorted
+by (user, product, day), group boundaries are found with a single
+comparison, and the median gap between purchase days becomes the
+product's interval. Results replace the ``replenishment_predictions``
+table in one transaction, so readers never see a partial load.
+
+    python -m app.services.replenishment_service
+"""
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.settings import settings
+from app.core.database import AsyncSessionLocal
+from app.core.queries import queries
+from app.models.replenishment import ReplenishmentPrediction
+from app.services.history_service import history_service
+
+logger = logging.getLogger(__name__)
+
+FETCH_CHUNK = 50_000
+INSERT_CHUNK = 10_000
+
+
+def estimate_intervals(users: np.ndarray, products: np.ndarray, days: np.ndarray, min_purchases: int) -> dict:
+    """Median purchase interval per (user, product) series.
+
+    ``days`` are day ordinals and each (user, product, day) triple must be
+    unique. Returns parallel arrays for the series with at least
+    ``min_purchases`` purchase days.
+    """
+    order = np.lexsort((days, products, users))
+    users, products, days = users[order], products[order], days[order]
+
+    new_series = np.empty(len(users), dtype=bool)
+    new_series[:1] = True
+    new_series[1:] = (users[1:] != users[:-1]) | (products[1:] != products[:-1])
+    starts = np.flatnonzero(new_series)
+    counts = np.diff(np.append(starts, len(users)))
+    series = np.repeat(np.arange(len(starts)), counts)
+
+    # Gaps between consecutive purchase days inside each series
+    gaps = np.diff(days)
+    gap_series = series[1:]
+    within = ~new_series[1:]
+    gaps, gap_series = gaps[within], gap_series[within]
+
+    # Median per series: sort gaps by (series, gap) and pick the middle
+    gap_order = np.lexsort((gaps, gap_series))
+    gaps, gap_series = gaps[gap_order], gap_series[gap_order]
+    gap_counts = counts - 1
+    gap_starts = np.concatenate(([0], np.cumsum(gap_counts)[:-1]))
+
+    eligible = counts >= max(min_purchases, 2)
+    lo = gap_starts[eligible] + (gap_counts[eligible] - 1) // 2
+    hi = gap_starts[eligible] + gap_counts[eligible] // 2
+    interval = (gaps[lo] + gaps[hi]) / 2.0
+
+    last_idx = (starts + counts - 1)[eligible]
+    return {
+        "users": users[starts[eligible]],
+        "products": products[starts[eligible]],
+        "purchases": counts[eligible],
+        "interval": interval,
+        "last_day": days[last_idx],
+    }
+
+
+class ReplenishmentService:
+    async def run_batch(self) -> int:
+        """Recompute predictions for all users; returns the number of rows stored."""
+        started = time.monotonic()
+        since = datetime.utcnow() - timedelta(days=settings.REPLENISHMENT_LOOKBACK_DAYS)
+        line = history_service.receipt_items.c
+        product = func.lower(func.trim(line.product_name))
+        day = func.date(line.created_at)
+        stmt = (
+            select(line.user_id, product, day)
+            .where(line.created_at >= since)
+            .group_by(line.user_id, product, day)
+            .execution_options(yield_per=FETCH_CHUNK)
+        )
+
+        user_chunks, day_chunks, names = [], [], []
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(stmt)
+            async for rows in result.partitions():
+                user_chunks.append(np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)))
+                day_chunks.append(np.fromiter((r[2].toordinal() for r in rows), dtype=np.int32, count=len(rows)))
+                names.extend(r[1] for r in rows)
+
+        if not names:
+            logger.info("Replenishment batch: no receipt history")
+            return 0
+
+        product_names, product_codes = np.unique(np.array(names, dtype=object), return_inverse=True)
+        del names
+        estimates = await asyncio.to_thread(
+            estimate_intervals,
+            np.concatenate(user_chunks),
+            product_codes,
+            np.concatenate(day_chunks),
+            settings.REPLENISHMENT_MIN_PURCHASES,
+        )
+        stored = await self._store(estimates, product_names)
+        logger.info("Replenishment batch stored %s predictions in %.1fs", stored, time.monotonic() - started)
+        return stored
+
+    async def _store(self, estimates: dict, product_names: np.ndarray) -> int:
+        interval = estimates["interval"]
+        keep = interval >= 1
+        last_day = estimates["last_day"][keep]
+        next_day = last_day + np.rint(interval[keep]).astype(np.int32)
+        columns = zip(
+            estimates["users"][keep].tolist(),
+            product_names[estimates["products"][keep]].tolist(),
+            np.minimum(estimates["purchases"][keep], 32767).tolist(),
+            interval[keep].tolist(),
+            last_day.tolist(),
+            next_day.tolist(),
+        )
+
+        stored = 0
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                await session.execute(delete(ReplenishmentPrediction))
+                batch = []
+                for user_id, name, purchases, days, last, nxt in columns:
+                    batch.append({
+                        "user_id": user_id,
+                        "product": name[:255],
+                        "purchases": purchases,
+                        "interval_days": days,
+                        "last_purchased_on": date.fromordinal(last),
+                        "next_expected_on": date.fromordinal(nxt),
+                    })
+                    if len(batch) == INSERT_CHUNK:
+                        await session.execute(insert(ReplenishmentPrediction), batch)
+                        stored += len(batch)
+                        batch = []
+                if batch:
+                    await session.execute(insert(ReplenishmentPrediction), batch)
+                    stored += len(batch)
+        return stored
+
+    async def due_items(self, session: AsyncSession, user_id: int) -> list[tuple[str, int]]:
+        """Products due within the horizon as (name, days left), soonest first."""
+        today = date.today()
+        result = await session.execute(
+            queries.due_replenishments,
+            {"user_id": user_id, "horizon": today + timedelta(days=settings.REPLENISHMENT_HORIZON_DAYS)}
+        )
+        return [(product, (next_on - today).days) for product, next_on in result.all()]
+
+replenishment_service = ReplenishmentService()
+
+
+if __name__ == "__main__":
+    asyncio.run(replenishment_service.run_batch())
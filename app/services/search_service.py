@@ -0,0 +1,135 @@
+"""Search over a user's receipt lines and list items.
+
+Both sources are matched with ``websearch_to_tsquery`` against the
+indexed ``to_tsvector`` expression or with ``ILIKE '%term%'`` (served by
+the trigram index), always together with ``user_id`` so the GIN indexes
+only return the user's own rows. Results are ordered newest first and
+paginated with a keyset cursor on (created_at, kind, id): each page
+reads at most ``limit + 1`` rows per source, so a page costs the same
+however long the history is. Archived receipts and list items
+(``history_service``) are searched too; the archive tables have no text
+indexes, so their matches come from a scan of the user's archived rows.
+"""
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy import Float, String, case, cast, literal, null, or_, select, tuple_, union_all
+
+from app.core.database import AsyncSessionLocal
+from app.models.search import search_query, search_vector
+from app.services.history_service import history_service
+
+
+class SearchHit(NamedTuple):
+    kind: str  # "receipt" or "list"
+    id: int
+    name: str
+    price: Optional[float]
+    currency: Optional[str]
+    place: Optional[str]  # store name, or "bought"/"on list" for list items
+    created_at: datetime
+
+
+class Cursor(NamedTuple):
+    created_at: datetime
+    kind: str
+    id: int
+
+    def encode(self) -> str:
+        return f"{self.kind[0]}:{self.id}:{self.created_at.isoformat()}"
+
+    @classmethod
+    def decode(cls, token: str) -> "Cursor":
+        kind, item_id, created_at = token.split(":", 2)
+        return cls(datetime.fromisoformat(created_at), "receipt" if kind == "r" else "list", int(item_id))
+
+
+def _like_pattern(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _after(kind: str, created_at, row_id, cursor: Optional[Cursor]):
+    """Rows of ``kind`` that sort after the cursor in (created_at, kind, id) DESC order."""
+    if cursor is None:
+        return literal(True)
+    if kind < cursor.kind:
+        return created_at <= cursor.created_at
+    if kind > cursor.kind:
+        return created_at < cursor.created_at
+    return tuple_(created_at, row_id) < tuple_(cursor.created_at, cursor.id)
+
+
+class SearchService:
+    async def search(
+        self, user_id: int, text: str, cursor: Optional[Cursor] = None, limit: int = 10
+    ) -> tuple[list[SearchHit], Optional[Cursor]]:
+        """One page of hits, newest first, and the cursor for the next page."""
+        tsquery = search_query(text)
+        pattern = _like_pattern(text)
+        receipt = history_service.receipts.c
+        line = history_service.receipt_items.c
+        item = history_service.shopping_items.c
+
+        receipts = (
+            select(
+                literal("receipt").label("kind"),
+                line.id,
+                line.product_name.label("name"),
+                line.price,
+                receipt.currency,
+                receipt.store_name.label("place"),
+                line.created_at,
+            )
+            .join(history_service.receipts, receipt.id == line.receipt_id)
+            .where(
+                line.user_id == user_id,
+                or_(
+                    search_vector(line.product_name).op("@@")(tsquery),
+                    line.product_name.ilike(pattern, escape="\\"),
+                ),
+                _after("receipt", line.created_at, line.id, cursor),
+            )
+            .order_by(line.created_at.desc(), line.id.desc())
+            .limit(limit + 1)
+        )
+        list_items = (
+            select(
+                literal("list").label("kind"),
+                item.id,
+                item.name,
+                # Typed, or Postgres resolves them to text inside the subquery
+                cast(null(), Float).label("price"),
+                cast(null(), String).label("currency"),
+                case((item.archived_at.is_not(None), "bought"), else_="on list").label("place"),
+                item.created_at,
+            )
+            .where(
+                item.user_id == user_id,
+                or_(
+                    search_vector(item.name).op("@@")(tsquery),
+                    item.name.ilike(pattern, escape="\\"),
+                ),
+                _after("list", item.created_at, item.id, cursor),
+            )
+            .order_by(item.created_at.desc(), item.id.desc())
+            .limit(limit + 1)
+        )
+        hits = union_all(receipts.subquery().select(), list_items.subquery().select()).subquery()
+        stmt = (
+            select(hits)
+            .order_by(hits.c.created_at.desc(), hits.c.kind.desc(), hits.c.id.desc())
+            .limit(limit + 1)
+        )
+
+        async with AsyncSessionLocal() as session:
+            rows = [SearchHit(*row) for row in (await session.execute(stmt)).all()]
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = Cursor(last.created_at, last.kind, last.id)
+        return rows, next_cursor
+
+search_service = SearchService()
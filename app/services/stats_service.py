@@ -0,0 +1,88 @@
+"""Spending statistics over a user's receipts, in the user's currency.
+
+Receipts keep the currency they were paid in. A user's history,
+archived receipts included, is read
+as parallel arrays (amount, currency, store, date) and converted in one
+pass by ``currency_service.convert_many``; every summary after that is
+array arithmetic.
+"""
+import logging
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from app.core.database import AsyncSessionLocal
+from app.services.currency_service import currency_service
+from app.services.history_service import history_service
+
+logger = logging.getLogger(__name__)
+
+
+class SpendingSummary(NamedTuple):
+    currency: str
+    total: float
+    receipts: int
+    average: float
+    paid_in: tuple[str, ...]
+    unconverted: int  # receipts in a currency without a rate, left out of totals
+    top_stores: list[tuple[str, float]]
+
+
+class Spending:
+    """A user's receipts converted to one currency."""
+
+    def __init__(self, currency: str, amounts: np.ndarray, currencies: np.ndarray,
+                 stores: np.ndarray, created_at: np.ndarray):
+        self.currency = currency
+        self.currencies = currencies
+        self.stores = stores
+        self.created_at = created_at
+        self.converted = currency_service.convert_many(amounts, currencies, currency)
+
+    def summary(self, since: Optional[datetime] = None, top: int = 3) -> SpendingSummary:
+        mask = np.ones(len(self.converted), dtype=bool)
+        if since is not None:
+            mask &= self.created_at >= np.datetime64(since)
+        converted = self.converted[mask]
+        known = ~np.isnan(converted)
+        total = float(converted[known].sum())
+        count = int(mask.sum())
+
+        stores, inverse = np.unique(self.stores[mask][known], return_inverse=True)
+        by_store = np.bincount(inverse, weights=converted[known], minlength=len(stores))
+        order = np.argsort(by_store)[::-1][:top]
+
+        return SpendingSummary(
+            currency=self.currency,
+            total=total,
+            receipts=count,
+            average=total / int(known.sum()) if known.any() else 0.0,
+            paid_in=tuple(np.unique(self.currencies[mask]).tolist()),
+            unconverted=int((~known).sum()),
+            top_stores=[(str(stores[i]), float(by_store[i])) for i in order],
+        )
+
+
+class StatsService:
+    async def spending(self, user_id: int, currency: str, since: Optional[datetime] = None) -> Spending:
+        receipt = history_service.receipts.c
+        stmt = select(
+            receipt.total_amount, receipt.currency, receipt.store_name, receipt.created_at
+        ).where(receipt.user_id == user_id)
+        if since is not None:
+            stmt = stmt.where(receipt.created_at >= since)
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(stmt)).all()
+
+        amounts, currencies, stores, created_at = zip(*rows) if rows else ((), (), (), ())
+        return Spending(
+            currency,
+            np.array(amounts, dtype=np.float64),
+            np.array(currencies, dtype=object),
+            np.array(stores, dtype=object),
+            np.array(created_at, dtype="datetime64[us]"),
+        )
+
+stats_service = StatsService()
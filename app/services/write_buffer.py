@@ -0,0 +1,156 @@
+"""Opt-in write-behind buffer for shopping item inserts.
+
+With ``WRITE_BEHIND_ENABLED``, /add acknowledges as soon as the item is
+queued here. Items queued by all users during ``WRITE_BEHIND_WINDOW_MS``
+(or until ``WRITE_BEHIND_MAX_BATCH`` items) are written in one
+transaction: a single multi-row INSERT plus one version bump per touched
+list. One checkout and one commit replace one of each per item.
+
+Reads stay consistent for the writer: reading a list first flushes its
+pending items and waits for any flush already carrying them (see
+``barrier``), so /list, /remove and /shop always see acknowledged items.
+
+Durability: an acknowledged item lives only in this process's memory
+until its flush commits, normally within the window plus one round trip.
+A graceful shutdown flushes everything (``close``). A crash or SIGKILL
+loses items acknowledged in that window. If a batch fails, its rows are
+retried one by one; rows that still fail (for example because their list
+was deleted) are logged and dropped. Leave the buffer disabled where
+that trade-off is not acceptable.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import insert, update
+
+from app.config.settings import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import metrics
+from app.models.shopping import ShoppingItem
+from app.models.shopping_list import ShoppingList
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    def __init__(self):
+        self.enabled = settings.WRITE_BEHIND_ENABLED
+        self._pending: list[dict] = []
+        self._lists: dict[int, bool] = {}  # list id -> is_shared, for pending rows
+        self._inflight: dict[int, asyncio.Task] = {}
+        self._timer: Optional[asyncio.Task] = None
+        self._tasks: set[asyncio.Task] = set()
+        metrics.gauge("write_behind_pending", lambda: len(self._pending))
+
+    def add(self, list_id: int, is_shared: bool, **values) -> None:
+        """Queue an item insert; ``values`` are ShoppingItem column values."""
+        values.setdefault("created_at", datetime.utcnow())
+        self._pending.append({"list_id": list_id, **values})
+        self._lists[list_id] = is_shared
+        if len(self._pending) >= settings.WRITE_BEHIND_MAX_BATCH:
+            self._spawn(self.flush())
+        elif self._timer is None:
+            self._timer = self._spawn(self._flush_later())
+
+    async def barrier(self, list_id: int) -> None:
+        """Wait until every acknowledged item of the list is committed."""
+        if list_id in self._lists:
+            await self.flush()
+        task = self._inflight.get(list_id)
+        if task is not None:
+            await asyncio.shield(task)
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        lists, self._lists = self._lists, {}
+        task = asyncio.ensure_future(self._write(batch, lists))
+        for list_id in lists:
+            self._inflight[list_id] = task
+        try:
+            await asyncio.shield(task)
+        finally:
+            for list_id in lists:
+                if self._inflight.get(list_id) is task:
+                    del self._inflight[list_id]
+
+    async def close(self) -> None:
+        """Flush everything still queued; called on shutdown."""
+        if self._timer is not None:
+            self._timer.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.flush()
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _flush_later(self) -> None:
+        try:
+            await asyncio.sleep(settings.WRITE_BEHIND_WINDOW_MS / 1000)
+        finally:
+            self._timer = None
+        await self.flush()
+
+    async def _write(self, batch: list[dict], lists: dict[int, bool]) -> None:
+        # Imported here: the sync service reads lists through list_service,
+        # which waits on this buffer
+        from app.services.list_sync_service import list_sync_service
+
+        try:
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    await session.execute(insert(ShoppingItem), batch)
+                    await self._bump_versions(session, batch)
+            written = len(batch)
+        except Exception as e:
+            logger.error("Write-behind flush of %s items failed, retrying one by one: %s", len(batch), e)
+            written = await self._write_rows(batch)
+
+        metrics.inc("write_behind_flushes_total")
+        metrics.inc("write_behind_rows_total", written)
+        if written < len(batch):
+            metrics.inc("write_behind_dropped_total", len(batch) - written)
+        for list_id, is_shared in lists.items():
+            if is_shared:
+                await list_sync_service.notify(list_id)
+
+    async def _write_rows(self, batch: list[dict]) -> int:
+        written = 0
+        for row in batch:
+            try:
+                async with AsyncSessionLocal() as session:
+                    async with session.begin():
+                        await session.execute(insert(ShoppingItem), [row])
+                        await self._bump_versions(session, [row])
+                written += 1
+            except Exception as e:
+                logger.error("Dropping buffered item %r for user %s: %s", row.get('name'), row.get('user_id'), e)
+        return written
+
+    @staticmethod
+    async def _bump_versions(session, rows: list[dict]) -> None:
+        # Imported here: list_service waits on this buffer
+        from app.services.list_service import list_service
+
+        adders: dict[int, set[int]] = {}
+        for row in rows:
+            adders.setdefault(row["list_id"], set()).add(row["user_id"])
+        result = await session.execute(
+            update(ShoppingList)
+            .where(ShoppingList.id.in_(adders))
+            .values(version=ShoppingList.version + 1, updated_at=datetime.utcnow())
+            .returning(ShoppingList.id, ShoppingList.version)
+            .execution_options(synchronize_session=False)
+        )
+        for list_id, version in result.all():
+            await list_service.remember_version(list_id, version)
+            # Items are appended, so the adders' item numbers still hold
+            await list_service.advance_seen(session, list_id, adders[list_id], version)
+
+write_buffer = WriteBehindBuffer()
@@ -1,12 +1,14 @@
 
 """Utility module initialization."""
-from app.utils.logger import setup_logger
+from app.utils.logger import setup_logger, setup_logging, bind_context
 from app.utils.i18n import i18n
 from app.utils.validators import validators
 from app.utils.helpers import helpers
 
 __all__ = [
     "setup_logger",
+    "setup_logging",
+    "bind_context",
     "i18n",
     "validators",
     "helpers",
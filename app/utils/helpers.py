@@ -3,13 +3,23 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Any
 import re
 
+CURRENCY_SYMBOLS = {
+    "USD": "$",
+    "BRL": "R$",
+    "EUR": "€",
+    "GBP": "£",
+    "ARS": "AR$",
+    "MXN": "MX$",
+    "COP": "COL$",
+}
+
 class Helpers:
     """General utility functions."""
     
     @staticmethod
     def format_currency(amount: float, currency: str = "USD") -> str:
-        """Format amount as currency string."""
-        return f"{currency} {amount:.2f}"
+        """Format amount as currency string, e.g. 'R$ 1,234.50'."""
+        return f"{CURRENCY_SYMBOLS.get(currency, currency)} {amount:,.2f}"
     
     @staticmethod
     def parse_quantity_and_unit(qty_str: str) -> tuple:
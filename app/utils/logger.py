@@ -1,34 +1,166 @@
-"""Logging configuration for SmartShopBot."""
+"""Logging configuration for SmartShopBot.
+
+``setup_logging`` routes every record through a queue: the event loop
+only filters and enqueues, and a listener thread formats and writes to
+stdout. Messages use %-style arguments, so formatting happens on that
+thread too, and only for records that survive filtering.
+
+Records carry the update id, user id and command of the update being
+handled (see ``bind_context``). ``LOG_SAMPLE_RATES`` keeps a fraction of
+the INFO and DEBUG records of chosen loggers; warnings and errors are
+never sampled or dropped.
+"""
+import atexit
+import json
 import logging
+import queue
+import random
 import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
 
+from app.core.metrics import metrics
+
+CONTEXT_FIELDS = ("update_id", "user_id", "command")
+
+_log_context: ContextVar[dict] = ContextVar("log_context", default={})
+
+# Attributes every LogRecord has; anything else came from ``extra=``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", *CONTEXT_FIELDS}
+
+
+def bind_context(**fields) -> None:
+    """Attach fields to every record logged from the current task."""
+    _log_context.set(fields)
+
+
 def setup_logger(name: str, level: str = "INFO") -> logging.Logger:
     """Configure and return a logger instance.
-    
+
     Args:
         name: Logger name (typically __name__)
         level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
-    
+
     Returns:
         Configured logger instance
     """
     logger = logging.getLogger(name)
     logger.setLevel(getattr(logging, level.upper()))
-    
+
     # Avoid duplicate handlers
     if logger.hasHandlers():
         return logger
-    
+
     # Create formatter
     formatter = logging.Formatter(
         '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
-    
+
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
     logger.addHandler(console_handler)
-    
+
     return logger
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS or (key in CONTEXT_FIELDS and value is not None):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """The classic format, prefixed with the update context when there is one."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - %(context)s%(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        parts = [f"{key}={getattr(record, key)}" for key in CONTEXT_FIELDS if getattr(record, key, None) is not None]
+        record.context = f"[{' '.join(parts)}] " if parts else ""
+        return super().format(record)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of INFO and lower records per logger (and its children)."""
+
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            prefix = name
+            while prefix not in self.rates and "." in prefix:
+                prefix = prefix.rsplit(".", 1)[0]
+            rate = self._resolved[name] = self.rates.get(prefix, 1.0)
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        metrics.inc("log_records_sampled_out_total", logger=record.name)
+        return False
+
+
+class ContextQueueHandler(QueueHandler):
+    """Enqueue records unformatted, stamped with the current update context.
+
+    A full queue drops INFO and lower records; warnings and errors wait
+    for room instead.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        for key, value in _log_context.get().items():
+            setattr(record, key, value)
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno > logging.INFO:
+                self.queue.put(record)
+            else:
+                metrics.inc("log_records_dropped_total")
+
+
+def setup_logging(level: str = "INFO", fmt: str = "text", sample_rates: Optional[dict[str, float]] = None,
+                  queue_size: int = 10000) -> QueueListener:
+    """Install the queue handler on the root logger and start the writer thread."""
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    handler = ContextQueueHandler(queue.Queue(queue_size))
+    if sample_rates:
+        handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level.upper())
+
+    listener = QueueListener(handler.queue, stream, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -1,3 +1,7 @@
+-- Extensions used by the purchase-history search indexes
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS btree_gin;
+
 -- Create users table
 CREATE TABLE IF NOT EXISTS users (
     id SERIAL PRIMARY KEY,
@@ -8,7 +12,11 @@ CREATE TABLE IF NOT EXISTS users (
     is_premium BOOLEAN DEFAULT FALSE,
     is_active BOOLEAN DEFAULT TRUE,
     language VARCHAR(10) DEFAULT 'en',
-    currency VARCHAR(10) DEFAULT 'USD',
+    currency VARCHAR(10),
+    timezone VARCHAR(64),
+    reminder_time TIME,
+    next_reminder_at TIMESTAMP,
+    reminder_lease_until TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -27,12 +35,37 @@ CREATE TABLE IF NOT EXISTS products (
 CREATE TABLE IF NOT EXISTS shopping_lists (
     id SERIAL PRIMARY KEY,
     user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-    name VARCHAR(255) DEFAULT 'My List',
-    is_active BOOLEAN DEFAULT TRUE,
+    name VARCHAR(255) NOT NULL DEFAULT 'My List',
+    description VARCHAR(500),
+    total_items INTEGER DEFAULT 0,
+    total_price DOUBLE PRECISION DEFAULT 0,
+    is_completed BOOLEAN DEFAULT FALSE,
+    is_shared BOOLEAN DEFAULT FALSE,
+    invite_code VARCHAR(16) UNIQUE,
+    version INTEGER NOT NULL DEFAULT 1,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Members of (shared) lists and the list message pinned in their chat
+CREATE TABLE IF NOT EXISTS list_members (
+    list_id INTEGER NOT NULL REFERENCES shopping_lists(id) ON DELETE CASCADE,
+    user_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    chat_id BIGINT,
+    pinned_message_id BIGINT,
+    seen_version INTEGER NOT NULL DEFAULT 0,
+    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (list_id, user_id)
+);
+
+ALTER TABLE users ADD COLUMN IF NOT EXISTS active_list_id INTEGER
+    CONSTRAINT fk_users_active_list_id REFERENCES shopping_lists(id);
+ALTER TABLE users ADD COLUMN IF NOT EXISTS timezone VARCHAR(64);
+ALTER TABLE users ADD COLUMN IF NOT EXISTS reminder_time TIME;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS next_reminder_at TIMESTAMP;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS reminder_lease_until TIMESTAMP;
+ALTER TABLE users ADD COLUMN IF NOT EXISTS api_token_hash VARCHAR(64) UNIQUE;
+
 -- Create shopping list items table
 CREATE TABLE IF NOT EXISTS shopping_list_items (
     id SERIAL PRIMARY KEY,
@@ -49,36 +82,137 @@ CREATE TABLE IF NOT EXISTS shopping_list_items (
 CREATE TABLE IF NOT EXISTS receipts (
     id SERIAL PRIMARY KEY,
     user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-    image_url VARCHAR(500),
-    total_amount DECIMAL(10, 2),
-    processed_at TIMESTAMP,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    shopping_list_id INTEGER REFERENCES shopping_lists(id),
+    store_name VARCHAR(255) NOT NULL,
+    total_amount DOUBLE PRECISION NOT NULL,
+    items_count INTEGER DEFAULT 0,
+    receipt_image_url VARCHAR(500),
+    ocr_text VARCHAR(2000),
+    is_processed BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- Create receipt items table
+ALTER TABLE receipts ADD COLUMN IF NOT EXISTS currency VARCHAR(10) NOT NULL DEFAULT 'BRL';
+ALTER TABLE receipts ADD COLUMN IF NOT EXISTS image_digest VARCHAR(64);
+
+-- Create receipt items table, partitioned by month (see app/services/partition_service.py)
 CREATE TABLE IF NOT EXISTS receipt_items (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     receipt_id INTEGER NOT NULL REFERENCES receipts(id) ON DELETE CASCADE,
-    product_name VARCHAR(255),
+    user_id BIGINT NOT NULL,
+    product_name VARCHAR(255) NOT NULL,
     quantity VARCHAR(50),
-    price DECIMAL(10, 2),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    price DOUBLE PRECISION,
+    category VARCHAR(50) NOT NULL DEFAULT 'other',
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Catches rows outside the monthly partitions until maintenance creates them
+CREATE TABLE IF NOT EXISTS receipt_items_default PARTITION OF receipt_items DEFAULT;
+
+ALTER TABLE receipt_items ADD COLUMN IF NOT EXISTS category VARCHAR(50) NOT NULL DEFAULT 'other';
+
+-- Spending budgets with the running total of their current period
+CREATE TABLE IF NOT EXISTS budgets (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    category VARCHAR(50) NOT NULL DEFAULT 'all',
+    period VARCHAR(10) NOT NULL DEFAULT 'month',
+    limit_amount DOUBLE PRECISION NOT NULL,
+    currency VARCHAR(10) NOT NULL,
+    period_start DATE NOT NULL,
+    spent DOUBLE PRECISION NOT NULL DEFAULT 0,
+    alerted_pct SMALLINT NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_budgets_user_category UNIQUE (user_id, category)
+);
+
+-- Running price and spend statistics for anomaly alerts
+CREATE TABLE IF NOT EXISTS spending_stats (
+    user_id BIGINT NOT NULL,
+    kind VARCHAR(1) NOT NULL,
+    key VARCHAR(255) NOT NULL,
+    currency VARCHAR(10) NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    mean REAL NOT NULL DEFAULT 0,
+    m2 REAL NOT NULL DEFAULT 0,
+    median REAL NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, kind, key)
 );
 
--- Create price history table
+-- Full OCR text of receipts, zlib-compressed
+CREATE TABLE IF NOT EXISTS receipt_texts (
+    receipt_id INTEGER PRIMARY KEY REFERENCES receipts(id) ON DELETE CASCADE,
+    compressed BYTEA NOT NULL
+);
+
+-- Create price history table, partitioned by month
 CREATE TABLE IF NOT EXISTS price_history (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     product_id INTEGER NOT NULL REFERENCES products(id) ON DELETE CASCADE,
     price DECIMAL(10, 2),
+    currency VARCHAR(10) NOT NULL DEFAULT 'BRL',
     store VARCHAR(255),
-    recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    recorded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, recorded_at)
+) PARTITION BY RANGE (recorded_at);
+
+CREATE TABLE IF NOT EXISTS price_history_default PARTITION OF price_history DEFAULT;
+
+ALTER TABLE price_history ADD COLUMN IF NOT EXISTS currency VARCHAR(10) NOT NULL DEFAULT 'BRL';
+
+-- Cold archive of bought list items and old receipts (app/services/history_service.py)
+CREATE TABLE IF NOT EXISTS shopping_items_archive (
+    id INTEGER PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    list_id INTEGER,
+    name VARCHAR NOT NULL,
+    quantity VARCHAR,
+    created_at TIMESTAMP NOT NULL,
+    archived_at TIMESTAMP NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS receipts_archive (
+    id INTEGER PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    store_name VARCHAR(255) NOT NULL,
+    total_amount DOUBLE PRECISION NOT NULL,
+    currency VARCHAR(10) NOT NULL,
+    items_count INTEGER,
+    ocr_compressed BYTEA,
+    created_at TIMESTAMP NOT NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS receipt_items_archive (
+    id INTEGER PRIMARY KEY,
+    receipt_id INTEGER NOT NULL,
+    user_id BIGINT NOT NULL,
+    product_name VARCHAR(255) NOT NULL,
+    quantity VARCHAR(50),
+    price DOUBLE PRECISION,
+    category VARCHAR(50) NOT NULL,
+    created_at TIMESTAMP NOT NULL
 );
 
 -- Create indexes for performance
 CREATE INDEX idx_users_telegram_id ON users(telegram_id);
+CREATE INDEX ix_users_next_reminder_at ON users(next_reminder_at);
 CREATE INDEX idx_shopping_lists_user_id ON shopping_lists(user_id);
+CREATE INDEX idx_list_members_user_id ON list_members(user_id);
 CREATE INDEX idx_shopping_list_items_list_id ON shopping_list_items(shopping_list_id);
 CREATE INDEX idx_receipts_user_id ON receipts(user_id);
+CREATE UNIQUE INDEX ix_receipts_user_image_digest ON receipts(user_id, image_digest);
 CREATE INDEX idx_receipt_items_receipt_id ON receipt_items(receipt_id);
+CREATE INDEX idx_receipt_items_user_id ON receipt_items(user_id);
+CREATE INDEX ix_receipt_items_user_tsv ON receipt_items USING gin (user_id, to_tsvector('simple'::regconfig, product_name));
+CREATE INDEX ix_receipt_items_user_trgm ON receipt_items USING gin (user_id, product_name gin_trgm_ops);
 CREATE INDEX idx_price_history_product_id ON price_history(product_id);
 CREATE INDEX idx_products_name ON products(name);
+CREATE INDEX ix_shopping_items_archive_user_created ON shopping_items_archive(user_id, created_at);
+CREATE INDEX ix_receipts_archive_user_created ON receipts_archive(user_id, created_at);
+CREATE INDEX ix_receipt_items_archive_receipt_id ON receipt_items_archive(receipt_id);
+CREATE INDEX ix_receipt_items_archive_user_created ON receipt_items_archive(user_id, created_at);